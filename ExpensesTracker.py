@@ -1,586 +1,1568 @@
-import os
-from datetime import datetime, date
-
-### Global Variables ###
-current_balance = 0.0
-iniital_balance = 0.0
-transactions = []
-filename = ""
-
-### Main Functions ###
-def initialization():
-    """Initializes the expense tracker, handling first-time users and file creation."""
-    global current_balance, filename, transactions, initial_balance
-
-    while True:
-        print("\nWelcome to our Expense Tracker App!")
-        first_timer_user = input("Are you a first-time user? (Y/N): ").upper()
-        if first_timer_user == "Y":
-            while True:
-                try:
-                    initial_balance_str = input("Enter initial balance: ")
-                    initial_balance = float(initial_balance_str)
-                    if initial_balance < 0:
-                        raise ValueError("Initial balance cannot be negative.")
-                    current_balance = round(initial_balance, 2)
-                    break 
-                except ValueError as e:
-                    print(f"Invalid input: {e}. Please enter a positive number.")
-
-            filename = generate_filename()
-            transactions = [] # Initialize transactions as empty list for a new user
-            break
-            
-        elif first_timer_user == "N":
-            while True:
-                filename = input("Enter the name of your latest transaction file: ")
-                if os.path.isfile(filename):
-                    # Assign transactions from the loaded file
-                    current_balance, initial_balance, transactions = load_transactions(filename)
-                    break
-                else:
-                    print(f"File '{filename}' not found. Please try again.")
-            break
-        else:
-            print("Invalid input. Please enter 'Y' or 'N'.") 
-
-def main_menu():
-    global current_balance, filename, transactions
-
-    commands = {
-        "1": add_entry,
-        "2": delete_entry,  
-        "3": update_entry, 
-        "4": filter_entries,
-        "5": show_all_entries,
-        "6": income_expense_ratio
-    }
-
-    command_names = {
-        "1": "Add Entry",
-        "2": "Delete Entry",
-        "3": "Update Entry",
-        "4": "Filter Entries",
-        "5": "Show All Entries",
-        "6": "Income Expenses Ratio"
-    }
-
-    while True:
-        print("\n---------------------------------------------")
-        print("|      Welcome to Expense Tracker App!      |")  # Add your app title here
-        print("---------------------------------------------")
-        print("\nYour Current Balance: PHP ", format_currency(current_balance))  
-        print("\nMain Menu:")
-        for choice, command_name in command_names.items():
-            print(f"{choice}. {command_name}")
-        print("7. Exit")  
-
-        print("\nCommand Line:")
-        choice = input("Choose your command (1-7): ")  
-
-        if choice == "7":  
-            print("Exiting Expense Tracker App. Goodbye!")  # Exit message
-            break
-        elif choice in commands:
-            result = commands[choice](current_balance, transactions, filename)
-            
-            # Update values based on the result
-            if isinstance(result, tuple):
-                current_balance, transactions = result
-
-            # Update the file after any modifications
-            if choice in ["1", "2", "3"]: # Save to file only if add, delete, or update
-                save_transactions(filename, current_balance, initial_balance, transactions)
-        else:
-            print("Invalid choice. Please enter a number between 1 and 6.") 
-
-def add_entry(current_balance, transactions, filename):
-
-    while True:
-        entry_type = input("Income or Expense? (I/E): ").upper()
-        is_valid, error_message, _ = data_entry_validation(entry_type, "", "", "") 
-        if is_valid:
-            break
-        else:
-            print(error_message)
-    
-    while True:
-        date_string = input("Enter date (YYYY-MM-DD): ")
-        is_valid, error_message, _ = data_entry_validation(entry_type, date_string, "", "") 
-        if is_valid:
-            break
-        else:
-            print(error_message)
-    
-    while True:
-        try:
-            amount = float(input("Enter amount (up to 2 decimal places only): "))
-            is_valid, error_message, amount = data_entry_validation(entry_type, date_string, amount, "") 
-            if is_valid:
-                break
-            else:
-                print(error_message)
-        except ValueError:
-            print("Invalid input. Please enter a number.")
-    
-    while True:
-        details = input("Enter details: ")
-        is_valid, error_message, _ = data_entry_validation(entry_type, date_string, amount, details)
-        if is_valid:
-            break
-        else:
-            print(error_message)
-
-    if entry_type == "I":
-        current_balance += amount
-    elif entry_type == "E":
-        current_balance -= abs(amount) # Take the absolute value of amount for expenses 
-
-    # Create new entry line (in dictionary format)
-    new_entry = {"date": date.fromisoformat(date_string), "category": entry_type, "amount": amount, "details": details}
-
-    # Append new entry to transactions list
-    transactions.append(new_entry)
-
-    # Sort transactions by date in descending order
-    transactions.sort(key=lambda x: x["date"], reverse=True) # No need to convert to datetime again
-
-    # Save updated transactions
-    save_transactions(filename, current_balance, initial_balance, transactions)
-
-    print("Entry added and balance updated.")
-    
-    # Return updated current balance and transactions for use in the main menu
-    return current_balance, transactions
-
-def delete_entry(current_balance, transactions, filename):
-    """Deletes an entry from the transactions and updates the balance in the file."""
-
-    # 1. Show All Transactions with Indices
-    if not transactions:
-        print("No transactions to delete.")
-        return current_balance, transactions  # Return unchanged values
-
-    print("\nTransactions:")
-    # Table Header
-    print("-" * 74)
-    print(f"{'No.':<5} {'Date':<12} {'Type':<8} {'Amount':<15} Details")
-    print("-" * 74)
-
-    for i, transaction in enumerate(transactions):
-        print(f"{i+1:<5} {transaction['date'].strftime('%Y-%m-%d'):<12} {transaction['category']:<8} {format_currency(transaction['amount']):<15} {transaction['details']}")
-
-    # Table Footer
-    print("-" * 74)
-
-    # 2. Get Index to Delete (with Input Validation)
-    while True:
-        try:
-            index = int(input("Enter the number of the entry to delete: ")) - 1
-            if 0 <= index < len(transactions):
-                break
-            else:
-                print(f"Invalid index. Please enter a number between 1 and {len(transactions)}.")
-        except ValueError:
-            print("Invalid input. Please enter a number.")
-
-    # Confirmation
-    confirm = input(f"Are you sure you want to delete entry {index + 1}? (Y/N): ").upper()
-    if confirm != "Y":
-        print("Deletion canceled.")
-        return current_balance, transactions 
-
-    # Delete Entry and Adjust Balance
-    deleted_entry = transactions.pop(index)
-    if deleted_entry["category"] == "I":
-        current_balance -= deleted_entry["amount"]  # Subtract income
-    else:  # 'E' (Expense)
-        current_balance -= deleted_entry["amount"]  # Subtract the expense amount (already negative)
-    # Save the updated transactions to the file 
-    save_transactions(filename, current_balance, initial_balance, transactions) 
-    print("Entry deleted and balance updated.")
-    return current_balance, transactions
-
-def update_entry(current_balance, transactions, filename):
-    """Updates a specified transaction entry."""
-
-    # 1. Check for Entries
-    if not transactions:
-        print("No transactions to update.")
-        return transactions
-    
-    print("\nTransactions:")
-    # Table Header
-    print("-" * 74)
-    print(f"{'No.':<5} {'Date':<12} {'Type':<8} {'Amount':<15} Details")
-    print("-" * 74)
-
-    for i, transaction in enumerate(transactions):
-        print(f"{i+1:<5} {transaction['date'].strftime('%Y-%m-%d'):<12} {transaction['category']:<8} {format_currency(transaction['amount']):<15} {transaction['details']}")
-
-    # Table Footer
-    print("-" * 74)
-
-    # 3. Get Index to Update
-    while True:
-        try:
-            index = int(input("Enter the number of the entry to update: ")) - 1
-            if 0 <= index < len(transactions):
-                break
-            else:
-                print(f"Invalid index. Please enter a number between 1 and {len(transactions)}.")
-        except ValueError:
-            print("Invalid input. Please enter a number.")
-
-    # Get updated values with validation
-    entry = transactions[index]
-    print(f"\nCurrent Entry: {entry['date'].strftime('%Y-%m-%d')} {entry['category']} {format_currency(entry['amount'])} {entry['details']}")
-
-    while True:
-        edit_choice = input("What to edit? (1) Date, (2) Type, (3) Amount, (4) Details, (5) Cancel: ")
-
-        if edit_choice == "1":
-            while True:
-                new_date_str = input("New date (YYYY-MM-DD): ")
-                is_valid, error_message, _ = data_entry_validation(entry["category"], new_date_str, entry["amount"], entry["details"])
-                if is_valid:
-                    break
-                else:
-                    print(error_message)
-
-            # Update the date
-            entry["date"] = date.fromisoformat(new_date_str)
-
-        elif edit_choice == "2":
-            while True:
-                new_type = input("New type (I/E): ").upper()
-                is_valid, error_message, _ = data_entry_validation(new_type, entry["date"].strftime("%Y-%m-%d"), entry["amount"], entry["details"])  # Pass current_balance
-                if is_valid:
-                    break
-                else:
-                    print(error_message)
-            
-            old_amount = entry["amount"]  
-            entry["category"] = new_type  
-
-            # Adjust amount and balance based on the category change
-            if new_type == "I" and old_amount < 0:  # Expense to Income
-                current_balance += abs(old_amount)  # Add back the original expense amount
-                current_balance += abs(old_amount)  # Add it again as income
-                entry["amount"] = abs(old_amount)  
-            elif new_type == "E" and old_amount > 0:  # Income to Expense
-                current_balance -= old_amount  # Subtract the original income amount
-                current_balance -= abs(old_amount)  # Subtract it again as an expense
-                entry["amount"] = -abs(old_amount)  
-        
-        elif edit_choice == "3":
-            while True:
-                try:
-                    new_amount = float(input("New amount: "))
-
-                    # Check if amount sign doesn't match category
-                    if (entry["category"] == "I" and new_amount < 0) or (entry["category"] == "E" and new_amount > 0):
-                        while True:  # Loop to confirm category change
-                            change_category = input(
-                                f"The new amount ({new_amount:.2f}) doesn't match the current category ({entry['category']}). "
-                                "Change category to " + ("Expense (E)" if new_amount < 0 else "Income (I)") + "? (Y/N): "
-                            ).upper()
-                            if change_category == "Y":
-                                entry["category"] = "E" if new_amount < 0 else "I"
-                                print(f"Category changed to {entry['category']} based on amount.")
-                                break
-                            elif change_category == "N":
-                                print("Amount update canceled.")
-                                return  # Exit update_entry entirely
-                            else:
-                                print("Invalid choice. Please enter 'Y' or 'N'.")
-
-                    # If no category change or change is confirmed, validate
-                    is_valid, error_message, new_amount = data_entry_validation(entry["category"], entry["date"].strftime("%Y-%m-%d"), new_amount, entry["details"])
-                    if is_valid:
-                        break
-                    else:
-                        print(error_message)
-                except ValueError:
-                    print("Invalid input. Please enter a number.")
-
-            old_amount = entry["amount"]
-            current_balance -= old_amount  # Reverse the effect of the old amount
-
-            entry["amount"] = new_amount
-            current_balance += entry["amount"]  # Update balance with the new amount
-
-
-        elif edit_choice == "4":
-            while True:
-                new_details = input("New details: ")
-                if data_entry_validation(entry["category"], entry["date"].strftime("%Y-%m-%d"), entry["amount"], new_details):
-                    break
-            entry["details"] = new_details
-
-        elif edit_choice == "5":
-            print("Update canceled.")
-            return transactions
-        else:
-            print("Invalid choice.")
-        
-        # Sort the transactions by date
-        transactions.sort(key=lambda x: x["date"], reverse=True)
-        
-        # Save the updated transactions to the file
-        save_transactions(filename, current_balance, initial_balance, transactions)
-        print("Entry updated successfully!")
-        break  
-
-    return current_balance, transactions
-
-def filter_entries(current_balance, transactions, filename):
-    """Filters and displays transaction entries based on the user's criteria."""
-
-    filter_type = input("Filter by (1) Month, (2) Year, (3) Day, (4) Date Range, or (5) Category I/E: ")
-
-    filtered_transactions = []
-
-    if filter_type == "1":
-        # Filter by month
-        month_str = input("Enter month (MM): ")
-        try:
-            month = int(month_str)
-            if not 1 <= month <= 12:
-                raise ValueError("Month must be between 1 and 12.")
-
-            filtered_transactions = [entry for entry in transactions if entry["date"].month == month]
-        except ValueError:
-            print("Invalid month format. Please enter a two-digit number (01-12).")
-
-    elif filter_type == "2":
-        # Filter by year
-        year_str = input("Enter year (YYYY): ")
-        try:
-            year = int(year_str)
-            filtered_transactions = [entry for entry in transactions if entry["date"].year == year]
-        except ValueError:
-            print("Invalid year format. Please enter a four-digit year.")
-
-    elif filter_type == "3":
-        # Filter by day
-        day_str = input("Enter day (DD): ")
-        try:
-            day = int(day_str)
-            if not 1 <= day <= 31:
-                raise ValueError("Day must be between 1 and 31.")
-            filtered_transactions = [entry for entry in transactions if entry["date"].day == day]
-        except ValueError:
-            print("Invalid day format. Please enter a two-digit day (01-31).")
-
-    elif filter_type == "4":
-        # Filter by date range
-        start_date_str = input("Enter start date (YYYY-MM-DD): ")
-        end_date_str = input("Enter end date (YYYY-MM-DD): ")
-
-        try:
-            start_date = date.fromisoformat(start_date_str)
-            end_date = date.fromisoformat(end_date_str)
-            if start_date > end_date:
-                raise ValueError("Start date cannot be after end date.")
-
-            filtered_transactions = [entry for entry in transactions if start_date <= entry["date"] <= end_date]
-        except ValueError:
-            print("Invalid date format. Please use YYYY-MM-DD.")
-
-    elif filter_type == "5":
-        # Filter by category (I/E)
-        category = input("Enter category (I for Income, E for Expense): ").upper()
-        while category not in ["I", "E"]:
-            print("Invalid category. Please enter 'I' for Income or 'E' for Expense.")
-            category = input("Enter category (I for Income, E for Expense): ").upper()
-
-        filtered_transactions = [entry for entry in transactions if entry["category"] == category]
-
-    else:
-        print("Invalid filter choice.")
-
-    # Display filtered results
-    if not filtered_transactions:
-        print("No transactions found for the given criteria.")
-    else:
-        # Display filtered transactions in a table format
-        print("\nFiltered Transactions:")
-        print("-" * 74)
-        print(f"{'Date':<12} {'Type':<8} {'Amount':<15} Details")
-        print("-" * 74)
-
-        for transaction in filtered_transactions:
-            date_str = transaction["date"].strftime("%Y-%m-%d")
-            type = transaction["category"]
-            amount = format_currency(transaction["amount"])
-            details = transaction["details"]
-            print(f"{date_str:<12} {type:<8} {amount:<15} {details}")
-        
-        print("-" * 74)
-            
-    return transactions #return transactions in case you use it to update the file
-
-def show_all_entries(current_balance, transactions, filename):
-    """Displays all transaction entries."""
-    if not transactions:
-        print("No transactions found.")
-        return
-
-    print("\nAll Transactions:")
-    print("-" * 45)  # Header line
-    print(f"{'Date':<12} {'Type':<8} {'Amount':<15} Details")
-    print("-" * 45) 
-
-    for transaction in transactions:
-        date_str = transaction["date"].strftime("%Y-%m-%d")  
-        type = transaction["category"]
-        amount = format_currency(transaction["amount"])
-        details = transaction["details"]
-        print(f"{date_str:<12} {type:<8} {amount:<15} {details}")  
-
-    print("-" * 45)  # Footer line
-
-def income_expense_ratio(current_balance, transactions, filename):
-    """Calculates and interprets the income vs. expense ratio."""
-
-    total_income = sum(transaction["amount"] for transaction in transactions if transaction["category"] == "I")
-    total_expenses = abs(sum(transaction["amount"] for transaction in transactions if transaction["category"] == "E"))
-
-    if total_income == 0 and total_expenses == 0:
-        print("No income or expenses recorded.")
-        return transactions # Return the transactions list to main_menu()
-    elif total_income == 0:
-        print("You haven't recorded any income yet.")
-        return transactions # Return the transactions list to main_menu()
-    elif total_expenses == 0:
-        print("You haven't recorded any expenses yet.")
-        return transactions # Return the transactions list to main_menu()
-    
-    #The calculation and display of ratio and the table will be moved inside this else statement
-    else:
-        ratio = total_income / total_expenses
-        
-        # Spending Analysis and Feedback (Updated Messages)
-        if ratio >= 2.0:
-            feedback = "Excellent! You're saving a significant portion of your income."
-        elif ratio >= 1.5:
-            feedback = "Good! Your income is comfortably covering your expenses, and you have some savings."
-        elif ratio >= 1.0:
-            feedback = "Okay: Your income is covering your expenses, but consider saving more."
-        else:
-            feedback = "Warning: Your expenses are higher than your income. You may need to cut back on spending."
-
-
-    # Display results in a table
-    print("\nIncome vs. Expense Summary:")
-    print("-" * 75)
-    print(f"{'Metric':<25} {'Value':<20}")  
-    print("-" * 75)
-    print(f"{'Total Income':<25} {format_currency(total_income):<20}")  # Left-aligned amount
-    print(f"{'Total Expenses':<25} {format_currency(total_expenses):<20}")  # Left-aligned amount
-    print(f"{'Income/Expense Ratio':<25} {ratio:<20.2f}")  # Left-aligned amount
-    print("-" * 75)
-    print(feedback)   # Print feedback without formatting 
-    print("-" * 75)
-
-    return transactions # To maintain consistency with other commands in main_menu
-
-### Helper Functions ###
-def format_currency(amount):
-    return f"{amount:,.2f}" 
-
-def generate_filename():
-    """Generates a unique filename based on current date and time."""
-    now = datetime.now()
-    timestamp = now.strftime("%Y-%m-%d_%H-%M-%S")  # Format timestamp (customize as needed)
-    return f"transactions_{timestamp}.txt"
-
-def data_entry_validation(entry_type, date_string, amount, details):
-    """Validates entry type, date, amount, and details for a transaction."""
-
-    # Validate entry type if it's provided (not an empty string)
-    if entry_type and entry_type not in ["I", "E"]:
-        return False, f"Error: Invalid entry type '{entry_type}'. Please enter 'I' for Income or 'E' for Expense.", amount
-
-    # Validate date (format and ensure it's not in the future) if date_string is provided
-    if date_string:
-        try:
-            entry_date = date.fromisoformat(date_string)
-            if entry_date > date.today():
-                return False, "Error: Entry date cannot be in the future.", amount
-        except ValueError:
-            return False, "Error: Invalid date format. Please use YYYY-MM-DD.", amount
-
-    # Validate amount if amount is provided and entry_type is valid
-    if entry_type in ["I", "E"] and amount:  # Check if amount is provided (not 0 or None)
-        
-        # Convert expense amount to negative and prevent zero amount
-        if entry_type.upper() == "E":
-            amount = -abs(amount)  # Make it negative, regardless of input
-            if current_balance + amount < 0:
-                return False, "Error: Insufficient funds.", amount
-
-        if amount == 0:
-            return False, "Error: Amount must not be zero.", amount
-        
-    # Validate details if they are provided (not an empty string)
-    if details and not details.strip():
-        return False, "Error: Please provide details for the entry.", amount
-
-    # If all checks pass, return True and the amount (possibly modified)
-    return True, "", amount
-
-def load_transactions(filename, mode="r"):
-    """Loads/updates transactions from/to the specified file."""
-    try:
-        with open(filename, mode) as file:
-            # Load current balance (first line) if reading
-            if mode == "r":
-                # Split the first line by ":"
-                current_balance_str = file.readline().strip().split(": ")[-1]
-
-                current_balance = float(current_balance_str.replace(",", "")) 
-                
-                #Read initial balance (second line)
-                initial_balance_str = file.readline().strip().split(": ")[-1]
-                initial_balance = float(initial_balance_str.replace(",", ""))
-            
-            # Load transaction entries (rest of the lines) if reading
-            if mode=="r": 
-                transactions = []
-                for line in file:
-                    parts = line.strip().split(" ")
-                    if len(parts) >= 3:  
-                        date_str, category, amount_str = parts[:3] 
-                        details = " ".join(parts[3:]) if len(parts) > 3 else "" 
-                        amount = float(amount_str.replace(",", ""))
-                        # Convert date_str to date object
-                        transactions.append({"date": date.fromisoformat(date_str), "category": category, "amount": amount, "details": details})
-
-                return current_balance, initial_balance, transactions
-
-            # If appending, update balance at the beginning
-            elif mode == "a":
-                # No need to read the entire file in append mode.  Just overwrite the first line
-                file.seek(0)  # Move to the beginning of the file
-                file.write(format_currency(current_balance) + "\n")  # Overwrite the first line with the updated balance
-
-    except FileNotFoundError:
-        print(f"File not found: {filename}")
-        return 0.00, [] 
-
-def save_transactions(filename, current_balance, initial_balance, transactions):
-    """Saves transactions and current balance to the given file."""
-    with open(filename, "w") as file:
-        file.write(f"Current Balance: {format_currency(current_balance)}\n")
-        file.write(f"Initial Balance: {format_currency(initial_balance)}\n\n")
-        file.write("Transactions Record: \n")
-        
-        for transaction in transactions:  # Iterate over the transactions list
-            file.write(f"{transaction['date'].strftime('%Y-%m-%d')} {transaction['category']} {format_currency(transaction['amount'])} {transaction['details']}\n")
-
-
-
-initialization()
-main_menu()
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from array import array
+from datetime import datetime, date
+from itertools import compress, islice
+from operator import itemgetter
+
+from file_lock import hold_session, locked, replace_atomically
+from binary_snapshot import BINARY_SUFFIX, BinaryLedgerView, is_binary_snapshot, read_binary_snapshot, write_binary_snapshot
+from entry_validation import INSUFFICIENT_FUNDS, VALID_MASK, ParsedValues, check_running_balance, error_counts, first_error, validate_batch
+from instrumentation import METRICS_VARIABLE, PROFILE_VARIABLE, instrument
+from partitioned_store import PARTITIONED_SUFFIX, PartitionedStore, is_partitioned_ledger, read_manifest, read_partitioned_ledger, replace_partitioned_ledger, write_partitioned_ledger
+from sqlite_store import SQLITE_SUFFIXES, SQLiteStore, is_sqlite_ledger, read_sqlite_ledger, write_sqlite_ledger
+from transaction_store import MAX_AMOUNT, TransactionStore
+from undo_log import UndoLog, changed_fields
+
+### Global Variables ###
+# Money is kept as whole centavos (int) everywhere; format_currency turns it back into pesos for display.
+# The ledger itself lives in a Ledger object; these are only caches of the interactive views.
+formatted_rows = {} # (numbered, index) -> table row already formatted by format_row
+formatted_version = None # TransactionStore.version the formatted rows belong to
+report_cells = {} # (year, month) or year -> (bucket version, formatted income/expenses/net, formatted ratio)
+report_store = None # TransactionStore the cached report cells belong to
+
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_COMPACT_THRESHOLD = 500 # Fold the journal back into the snapshot after this many records
+UNDO_SUFFIX = ".undo"
+KEEP_UNDO_HISTORY = True # Save the undo/redo history next to the ledger so it survives restarts
+LOAD_BATCH_SIZE = 10000 # Default number of transactions per batch when streaming a ledger file
+PAGE_SIZE = 20 # Entries per page in show_all_entries and the delete/update pickers
+STEP_NAMES = {"A": "addition", "D": "deletion", "U": "update"} # Undo log step kinds, for messages
+AMOUNT_PATTERN = re.compile(r"([+-]?)(\d*)(?:\.(\d{0,2}))?", re.ASCII) # Pesos with up to 2 decimal places
+
+### Main Functions ###
+def initialization():
+    """Initializes the expense tracker, handling first-time users and file creation, and returns the opened Ledger."""
+
+    while True:
+        print("\nWelcome to our Expense Tracker App!")
+        first_timer_user = input("Are you a first-time user? (Y/N): ").upper()
+        if first_timer_user == "Y":
+            while True:
+                try:
+                    initial_balance_str = input("Enter initial balance: ")
+                    initial_balance = parse_amount(initial_balance_str)
+                    if initial_balance < 0:
+                        raise ValueError("Initial balance cannot be negative.")
+                    break 
+                except ValueError as e:
+                    print(f"Invalid input: {e}. Please enter a positive number.")
+
+            # Writes the starting snapshot so journal records always have a base to replay onto
+            return Ledger.create(generate_filename(), initial_balance)
+            
+        elif first_timer_user == "N":
+            while True:
+                filename = input("Enter the name of your latest transaction file: ")
+                if os.path.isfile(filename):
+                    try:
+                        return Ledger.open(filename)
+                    except BlockingIOError:
+                        print(f"File '{filename}' is open in another session. Please try again.")
+                else:
+                    print(f"File '{filename}' not found. Please try again.")
+        else:
+            print("Invalid input. Please enter 'Y' or 'N'.") 
+
+def main_menu(ledger):
+    """Runs the interactive menu on an open Ledger until the user exits, then closes it."""
+
+    commands = {
+        "1": add_entry,
+        "2": delete_entry,  
+        "3": update_entry, 
+        "4": filter_entries,
+        "5": show_all_entries,
+        "6": income_expense_ratio,
+        "7": check_consistency,
+        "8": search_entries,
+        "9": undo_edit,
+        "10": redo_edit,
+        "11": periodic_reports
+    }
+
+    command_names = {
+        "1": "Add Entry",
+        "2": "Delete Entry",
+        "3": "Update Entry",
+        "4": "Filter Entries",
+        "5": "Show All Entries",
+        "6": "Income Expenses Ratio",
+        "7": "Check Consistency",
+        "8": "Search Entries",
+        "9": "Undo Last Edit",
+        "10": "Redo Edit",
+        "11": "Monthly/Yearly Reports"
+    }
+    exit_choice = str(len(commands) + 1)
+
+    while True:
+        print("\n---------------------------------------------")
+        print("|      Welcome to Expense Tracker App!      |")  # Add your app title here
+        print("---------------------------------------------")
+        print("\nYour Current Balance: PHP ", format_currency(ledger.balance))  
+        print("\nMain Menu:")
+        for choice, command_name in command_names.items():
+            print(f"{choice}. {command_name}")
+        print(f"{exit_choice}. Exit")  
+
+        print("\nCommand Line:")
+        choice = input(f"Choose your command (1-{exit_choice}): ")  
+
+        if choice == exit_choice:  
+            ledger.close() # Folds the journal back into the ledger file
+            print("Exiting Expense Tracker App. Goodbye!")  # Exit message
+            break
+        elif choice in commands:
+            commands[choice](ledger) # Edits are saved by the ledger as they are made
+        else:
+            print(f"Invalid choice. Please enter a number between 1 and {exit_choice}.") 
+
+def add_entry(ledger):
+    """Prompts for a new income or expense entry and adds it to the ledger."""
+    current_balance = ledger.balance
+
+    while True:
+        entry_type = input("Income or Expense? (I/E): ").upper()
+        is_valid, error_message, _ = data_entry_validation(entry_type, "", "", "", current_balance) 
+        if is_valid:
+            break
+        else:
+            print(error_message)
+    
+    while True:
+        date_string = input("Enter date (YYYY-MM-DD): ")
+        is_valid, error_message, _ = data_entry_validation(entry_type, date_string, "", "", current_balance) 
+        if is_valid:
+            break
+        else:
+            print(error_message)
+    
+    while True:
+        try:
+            amount = parse_amount(input("Enter amount (up to 2 decimal places only): "))
+            is_valid, error_message, amount = data_entry_validation(entry_type, date_string, amount, "", current_balance) 
+            if is_valid:
+                break
+            else:
+                print(error_message)
+        except ValueError:
+            print("Invalid input. Please enter a number with up to 2 decimal places.")
+    
+    while True:
+        details = input("Enter details: ")
+        is_valid, error_message, _ = data_entry_validation(entry_type, date_string, amount, details, current_balance)
+        if is_valid:
+            break
+        else:
+            print(error_message)
+
+    # Create new entry line (in dictionary format)
+    new_entry = {"date": date.fromisoformat(date_string), "category": entry_type, "amount": amount, "details": details}
+
+    # Add new entry to the store (kept sorted by date in descending order) and record it in the journal
+    ledger.add(new_entry)
+
+    print("Entry added and balance updated.")
+
+def delete_entry(ledger):
+    """Deletes an entry from the transactions and updates the balance in the file."""
+    transactions = ledger.transactions
+
+    # 1. Show All Transactions with Indices
+    if not transactions:
+        print("No transactions to delete.")
+        return
+
+    # 2. Page through the transactions and pick the one to delete
+    index = page_entries(transactions, "Transactions", numbered=True, pick="delete")
+    if index is None:
+        print("Deletion canceled.")
+        return
+
+    # Confirmation
+    confirm = input(f"Are you sure you want to delete entry {index + 1}? (Y/N): ").upper()
+    if confirm != "Y":
+        print("Deletion canceled.")
+        return
+
+    # Delete Entry, Adjust Balance and record the deletion in the journal
+    ledger.delete(index)
+    print("Entry deleted and balance updated.")
+
+def update_entry(ledger):
+    """Updates a specified transaction entry."""
+    transactions = ledger.transactions
+    current_balance = ledger.balance
+
+    # 1. Check for Entries
+    if not transactions:
+        print("No transactions to update.")
+        return
+    
+    # 2. Page through the transactions and pick the one to update
+    index = page_entries(transactions, "Transactions", numbered=True, pick="update")
+    if index is None:
+        print("Update canceled.")
+        return
+
+    # Get updated values with validation (entry is a copy; it is written back with ledger.update)
+    entry = transactions[index]
+    print(f"\nCurrent Entry: {entry['date'].strftime('%Y-%m-%d')} {entry['category']} {format_currency(entry['amount'])} {entry['details']}")
+
+    while True:
+        edit_choice = input("What to edit? (1) Date, (2) Type, (3) Amount, (4) Details, (5) Cancel: ")
+
+        if edit_choice == "1":
+            while True:
+                new_date_str = input("New date (YYYY-MM-DD): ")
+                is_valid, error_message, _ = data_entry_validation(entry["category"], new_date_str, entry["amount"], entry["details"], current_balance)
+                if is_valid:
+                    break
+                else:
+                    print(error_message)
+
+            # Update the date
+            entry["date"] = date.fromisoformat(new_date_str)
+
+        elif edit_choice == "2":
+            while True:
+                new_type = input("New type (I/E): ").upper()
+                is_valid, error_message, _ = data_entry_validation(new_type, entry["date"].strftime("%Y-%m-%d"), entry["amount"], entry["details"], current_balance)
+                if is_valid:
+                    break
+                else:
+                    print(error_message)
+            
+            old_amount = entry["amount"]  
+            entry["category"] = new_type  
+
+            # Flip the sign of the amount to match the new category
+            if new_type == "I" and old_amount < 0:  # Expense to Income
+                entry["amount"] = abs(old_amount)  
+            elif new_type == "E" and old_amount > 0:  # Income to Expense
+                entry["amount"] = -abs(old_amount)  
+        
+        elif edit_choice == "3":
+            while True:
+                try:
+                    new_amount = parse_amount(input("New amount: "))
+
+                    # Check if amount sign doesn't match category
+                    if (entry["category"] == "I" and new_amount < 0) or (entry["category"] == "E" and new_amount > 0):
+                        while True:  # Loop to confirm category change
+                            change_category = input(
+                                f"The new amount ({format_currency(new_amount)}) doesn't match the current category ({entry['category']}). "
+                                "Change category to " + ("Expense (E)" if new_amount < 0 else "Income (I)") + "? (Y/N): "
+                            ).upper()
+                            if change_category == "Y":
+                                entry["category"] = "E" if new_amount < 0 else "I"
+                                print(f"Category changed to {entry['category']} based on amount.")
+                                break
+                            elif change_category == "N":
+                                print("Amount update canceled.")
+                                return  # Exit update_entry entirely
+                            else:
+                                print("Invalid choice. Please enter 'Y' or 'N'.")
+
+                    # If no category change or change is confirmed, validate
+                    is_valid, error_message, new_amount = data_entry_validation(entry["category"], entry["date"].strftime("%Y-%m-%d"), new_amount, entry["details"], current_balance)
+                    if is_valid:
+                        break
+                    else:
+                        print(error_message)
+                except ValueError:
+                    print("Invalid input. Please enter a number with up to 2 decimal places.")
+
+            entry["amount"] = new_amount
+
+
+        elif edit_choice == "4":
+            while True:
+                new_details = input("New details: ")
+                if data_entry_validation(entry["category"], entry["date"].strftime("%Y-%m-%d"), entry["amount"], new_details, current_balance):
+                    break
+            entry["details"] = new_details
+
+        elif edit_choice == "5":
+            print("Update canceled.")
+            return
+        else:
+            print("Invalid choice.")
+        
+        # Write the edited entry back (the store keeps the transactions sorted by date) and journal it
+        ledger.update(index, entry)
+        print("Entry updated successfully!")
+        break  
+
+def undo_edit(ledger):
+    """Reverses the most recent add, delete or update that has not been undone yet."""
+    try:
+        step = ledger.undo()
+    except ValueError as e:
+        print(f"Cannot undo: {e}.")
+        return
+
+    if step is None:
+        print("Nothing to undo.")
+        return
+    print(f"Undid the last {STEP_NAMES[step[0]]}. Balance: {format_currency(ledger.balance)}")
+
+def redo_edit(ledger):
+    """Repeats the edit that was undone most recently."""
+    try:
+        step = ledger.redo()
+    except ValueError as e:
+        print(f"Cannot redo: {e}.")
+        return
+
+    if step is None:
+        print("Nothing to redo.")
+        return
+    print(f"Redid the {STEP_NAMES[step[0]]}. Balance: {format_currency(ledger.balance)}")
+
+def filter_entries(ledger):
+    """Filters and displays transaction entries based on the user's criteria."""
+
+    criteria = ask_filter_criteria()
+    filtered_transactions = ledger.select(**criteria) if criteria is not None else []
+
+    # Display filtered results
+    if not filtered_transactions:
+        print("No transactions found for the given criteria.")
+    else:
+        # Display filtered transactions in a table format
+        print("\nFiltered Transactions:")
+        print("-" * 74)
+        print(f"{'Date':<12} {'Type':<8} {'Amount':<15} Details")
+        print("-" * 74)
+
+        for transaction in filtered_transactions:
+            date_str = transaction["date"].strftime("%Y-%m-%d")
+            type = transaction["category"]
+            amount = format_currency(transaction["amount"])
+            details = transaction["details"]
+            print(f"{date_str:<12} {type:<8} {amount:<15} {details}")
+        
+        print("-" * 74)
+
+def ask_filter_criteria(optional=False):
+    """Asks for one filter (month, year, day, date range or category) and returns it as select_entries keyword arguments.
+
+    Returns None if the input was invalid, or {} if optional is set and the user skipped the filter.
+    """
+
+    filter_type = input("Filter by (1) Month, (2) Year, (3) Day, (4) Date Range, or (5) Category I/E" + (", or press Enter for none" if optional else "") + ": ")
+
+    if optional and filter_type == "":
+        return {}
+
+    if filter_type == "1":
+        # Filter by month
+        month_str = input("Enter month (MM): ")
+        try:
+            month = int(month_str)
+            if not 1 <= month <= 12:
+                raise ValueError("Month must be between 1 and 12.")
+
+            return {"month": month}
+        except ValueError:
+            print("Invalid month format. Please enter a two-digit number (01-12).")
+
+    elif filter_type == "2":
+        # Filter by year
+        year_str = input("Enter year (YYYY): ")
+        try:
+            year = int(year_str)
+            return {"year": year}
+        except ValueError:
+            print("Invalid year format. Please enter a four-digit year.")
+
+    elif filter_type == "3":
+        # Filter by day
+        day_str = input("Enter day (DD): ")
+        try:
+            day = int(day_str)
+            if not 1 <= day <= 31:
+                raise ValueError("Day must be between 1 and 31.")
+            return {"day": day}
+        except ValueError:
+            print("Invalid day format. Please enter a two-digit day (01-31).")
+
+    elif filter_type == "4":
+        # Filter by date range
+        start_date_str = input("Enter start date (YYYY-MM-DD): ")
+        end_date_str = input("Enter end date (YYYY-MM-DD): ")
+
+        try:
+            start_date = date.fromisoformat(start_date_str)
+            end_date = date.fromisoformat(end_date_str)
+            if start_date > end_date:
+                raise ValueError("Start date cannot be after end date.")
+
+            return {"start": start_date, "end": end_date}
+        except ValueError:
+            print("Invalid date format. Please use YYYY-MM-DD.")
+
+    elif filter_type == "5":
+        # Filter by category (I/E)
+        category = input("Enter category (I for Income, E for Expense): ").upper()
+        while category not in ["I", "E"]:
+            print("Invalid category. Please enter 'I' for Income or 'E' for Expense.")
+            category = input("Enter category (I for Income, E for Expense): ").upper()
+
+        return {"category": category}
+
+    else:
+        print("Invalid filter choice.")
+
+    return None
+
+def search_entries(ledger):
+    """Searches the transaction details, optionally narrowed by one of filter_entries' filters."""
+    query = input("Search details for (words or word beginnings): ").strip()
+    criteria = ask_filter_criteria(optional=True)
+    if criteria is None:
+        return
+
+    matches = ledger.search(query, **criteria)
+    if not matches:
+        print("No transactions found for the given search.")
+        return
+
+    page_entries(ledger.transactions, "Search Results", numbered=True, indices=matches)
+
+def show_all_entries(ledger):
+    """Displays all transaction entries, one page at a time."""
+    show_transactions(ledger.transactions)
+
+def show_transactions(transactions):
+    """Displays transaction entries (transactions may be a store, a list or a lazy iterator such as iter_transactions)."""
+    if isinstance(transactions, (TransactionStore, SQLiteStore, PartitionedStore)):
+        if not transactions:
+            print("No transactions found.")
+            return
+        page_entries(transactions, "All Transactions")
+        return
+
+    shown = 0
+    for transaction in transactions:
+        if shown == 0:
+            print("\nAll Transactions:")
+            print("-" * 45)  # Header line
+            print(f"{'Date':<12} {'Type':<8} {'Amount':<15} Details")
+            print("-" * 45) 
+        shown += 1
+
+        date_str = transaction["date"].strftime("%Y-%m-%d")  
+        type = transaction["category"]
+        amount = format_currency(transaction["amount"])
+        details = transaction["details"]
+        print(f"{date_str:<12} {type:<8} {amount:<15} {details}")  
+
+    if shown == 0:
+        print("No transactions found.")
+        return
+
+    print("-" * 45)  # Footer line
+
+def income_expense_ratio(ledger):
+    """Calculates and interprets the income vs. expense ratio."""
+
+    total_income, total_expenses = income_expense_totals(ledger.transactions)
+
+    if total_income == 0 and total_expenses == 0:
+        print("No income or expenses recorded.")
+        return
+    elif total_income == 0:
+        print("You haven't recorded any income yet.")
+        return
+    elif total_expenses == 0:
+        print("You haven't recorded any expenses yet.")
+        return
+    
+    #The calculation and display of ratio and the table will be moved inside this else statement
+    else:
+        ratio = total_income / total_expenses
+        
+        # Spending Analysis and Feedback (Updated Messages)
+        if ratio >= 2.0:
+            feedback = "Excellent! You're saving a significant portion of your income."
+        elif ratio >= 1.5:
+            feedback = "Good! Your income is comfortably covering your expenses, and you have some savings."
+        elif ratio >= 1.0:
+            feedback = "Okay: Your income is covering your expenses, but consider saving more."
+        else:
+            feedback = "Warning: Your expenses are higher than your income. You may need to cut back on spending."
+
+
+    # Display results in a table
+    print("\nIncome vs. Expense Summary:")
+    print("-" * 75)
+    print(f"{'Metric':<25} {'Value':<20}")  
+    print("-" * 75)
+    print(f"{'Total Income':<25} {format_currency(total_income):<20}")  # Left-aligned amount
+    print(f"{'Total Expenses':<25} {format_currency(total_expenses):<20}")  # Left-aligned amount
+    print(f"{'Income/Expense Ratio':<25} {ratio:<20.2f}")  # Left-aligned amount
+    print("-" * 75)
+    print(feedback)   # Print feedback without formatting 
+    print("-" * 75)
+
+def periodic_reports(ledger):
+    """Shows income, expenses, net, running balance and ratio per month or per year."""
+    transactions = ledger.transactions
+    report_type = input("Report by (1) Month or (2) Year: ")
+    year = None
+    if report_type == "1":
+        year_str = input("Enter year (YYYY), or press Enter for all years: ")
+        if year_str:
+            try:
+                year = int(year_str)
+            except ValueError:
+                print("Invalid year format. Please enter a four-digit year.")
+                return
+        rollups = [(key, totals) for key, totals in transactions.month_totals() if year is None or key[0] == year]
+    elif report_type == "2":
+        rollups = transactions.year_totals()
+    else:
+        print("Invalid report choice.")
+        return
+
+    if not rollups:
+        print("No transactions found for the given criteria.")
+        return
+
+    # The running balance starts from the initial balance plus everything before the first period shown
+    balance = ledger.initial_balance
+    if year is not None:
+        balance += sum(totals["income"] + totals["expenses"] for key, totals in transactions.year_totals() if key < year)
+
+    width = 101
+    lines = ["\n" + ("Monthly" if report_type == "1" else "Yearly") + " Report:", "-" * width,
+             f"{'Period':<10} {'Income':>18} {'Expenses':>18} {'Net':>18} {'Balance':>20} {'Ratio':>12}", "-" * width]
+    for key, totals in rollups:
+        amounts_text, ratio_text = report_row_cells(transactions, key, totals)
+        balance += totals["income"] + totals["expenses"]
+        label = f"{key[0]}-{key[1]:02d}" if report_type == "1" else str(key)
+        lines.append(f"{label:<10} {amounts_text} {format_currency(balance):>20} {ratio_text:>12}")
+
+    overall = transactions.totals(year)
+    amounts_text, ratio_text = report_cells_text(overall)
+    lines += ["-" * width, f"{'Total':<10} {amounts_text} {format_currency(balance):>20} {ratio_text:>12}", "-" * width]
+    sys.stdout.write("\n".join(lines) + "\n")
+
+def check_consistency(ledger):
+    """Compares the running aggregates and the file's balance header against a full recompute."""
+    transactions = ledger.transactions
+    print("\nConsistency Check:")
+    print("-" * 75)
+
+    problems = transactions.verify()
+    for problem in problems:
+        print(f"Aggregate drift: {problem}")
+
+    # Recompute the balance from scratch rather than trusting the running totals
+    entries_total = sum(transaction["amount"] for transaction in transactions)
+    balance = ledger.initial_balance + entries_total
+    recorded_balance = ledger.recorded_balance
+    if recorded_balance != balance:
+        problems.append("balance")
+        print(f"The file header records a balance of {format_currency(recorded_balance)}, "
+              f"but the initial balance and entries add up to {format_currency(balance)} "
+              f"(off by {format_currency(recorded_balance - balance)}).")
+        print("The corrected balance will be written the next time the ledger is saved.")
+
+    if not problems:
+        print("All totals and the balance match the recorded entries.")
+    print("-" * 75)
+
+### Paged View ###
+def format_row(transactions, index, numbered=False):
+    """Formats one table row, reusing the cached text until the ledger changes."""
+    global formatted_rows, formatted_version
+
+    if formatted_version != (id(transactions), transactions.version):
+        formatted_rows = {}
+        formatted_version = (id(transactions), transactions.version)
+
+    row = formatted_rows.get((numbered, index))
+    if row is None:
+        transaction = transactions[index]
+        row = f"{transaction['date'].isoformat():<12} {transaction['category']:<8} {format_currency(transaction['amount']):<15} {transaction['details']}"
+        if numbered:
+            row = f"{index + 1:<5} {row}"
+        formatted_rows[(numbered, index)] = row
+    return row
+
+def report_row_cells(transactions, key, totals):
+    """Returns the formatted cells of one report period, reformatting only periods whose rollup changed."""
+    global report_cells, report_store
+
+    if report_store is not transactions:
+        report_cells = {}
+        report_store = transactions
+
+    version = transactions.bucket_version(*key) if isinstance(key, tuple) else transactions.bucket_version(key)
+    cached = report_cells.get(key)
+    if cached is None or cached[0] != version:
+        cached = report_cells[key] = (version, *report_cells_text(totals))
+    return cached[1], cached[2]
+
+def report_cells_text(totals):
+    """Formats the income, expenses and net cells and the ratio cell of a rollup."""
+    net = totals["income"] + totals["expenses"]
+    amounts_text = f"{format_currency(totals['income']):>18} {format_currency(totals['expenses']):>18} {format_currency(net):>18}"
+    ratio_text = f"{totals['income'] / abs(totals['expenses']):.2f}" if totals["expenses"] else "-"
+    return amounts_text, ratio_text
+
+def page_entries(transactions, title, numbered=False, pick=None, indices=None):
+    """Shows a TransactionStore (or just the given indices of it) one page at a time.
+
+    Each page is written to the terminal in one go. The user can move between
+    pages, jump to a page or search the details to narrow the list. When pick
+    names an action (e.g. "delete"), entering an entry's number returns its index;
+    None is returned if the user quits without picking.
+    """
+    page_size = PAGE_SIZE
+    width = 74 if numbered else 45
+    full_range = range(len(transactions))
+    all_indices = full_range if indices is None else indices
+    indices = all_indices
+    search_text = ""
+    page = 0
+
+    while True:
+        pages = max(1, -(-len(indices) // page_size))
+        page = max(0, min(page, pages - 1))
+
+        lines = [f"\n{title}:" + (f" (details matching '{search_text}')" if search_text else ""), "-" * width]
+        lines.append((f"{'No.':<5} " if numbered else "") + f"{'Date':<12} {'Type':<8} {'Amount':<15} Details")
+        lines.append("-" * width)
+        for index in indices[page * page_size:(page + 1) * page_size]:
+            lines.append(format_row(transactions, index, numbered))
+        if not indices:
+            lines.append("No matching transactions.")
+        lines.append("-" * width)
+        lines.append(f"Page {page + 1} of {pages} ({len(indices)} entries)")
+        sys.stdout.write("\n".join(lines) + "\n")
+
+        if pick is None and pages == 1 and not search_text:
+            return None # Everything fit on one page; nothing to navigate
+
+        options = "[Enter] next, (p) previous, (g N) go to page, (/ text) search, (s N) page size"
+        if pick:
+            options += f", number of the entry to {pick}"
+        command = input(f"{options}, (q) {'cancel' if pick else 'quit'}: ").strip()
+
+        if command.lower() == "q":
+            return None
+        elif command == "" or command.lower() == "n":
+            if page == pages - 1 and pick is None:
+                return None # Paged past the end
+            page += 1
+        elif command.lower() == "p":
+            page -= 1
+        elif command.lower().startswith("g ") and command[2:].strip().isdigit():
+            page = int(command[2:].strip()) - 1
+        elif command.lower().startswith("s ") and command[2:].strip().isdigit() and int(command[2:].strip()) > 0:
+            page_size = int(command[2:].strip())
+            page = 0
+        elif command.startswith("/"):
+            search_text = command[1:].strip()
+            if search_text:
+                indices = transactions.search(search_text)
+                if all_indices is not full_range:
+                    matches = set(indices)
+                    indices = [index for index in all_indices if index in matches]
+            else:
+                indices = all_indices
+            page = 0
+        elif pick and command.isdigit():
+            index = int(command) - 1
+            if 0 <= index < len(transactions):
+                return index
+            print(f"Invalid index. Please enter a number between 1 and {len(transactions)}.")
+        else:
+            print("Invalid input. Please enter one of the listed options.")
+
+### Ledger API ###
+class Ledger:
+    """An open ledger file with its entries, balances, journal and undo history; never prompts or prints.
+
+    The interactive menu is one front end for it; scripts can use it directly:
+
+        with Ledger.open("transactions_2024-07-15_16-13-34.txt") as ledger:
+            ledger.add({"date": date(2024, 7, 16), "category": "E", "amount": -12550, "details": "Groceries"})
+            print(format_currency(ledger.balance), ledger.ratio())
+
+    Amounts are in centavos and indices count from the newest entry, as in
+    TransactionStore. The file is only read when an entry, balance or total is
+    first needed. Every edit is durable when the method returns (journaled, or
+    committed by an SQLite ledger); close() folds the journal into the file.
+    """
+
+    def __init__(self, filename, session=None):
+        self.filename = filename
+        self.journal_records = 0   # Records appended to the journal since the last compaction
+        self._session = session    # Open file holding the edit session lock; None if opened read-only
+        self._transactions = None  # Loaded on first use
+        self._initial_balance = 0
+        self._recorded_balance = 0 # Current balance as written in the file's header (or its journal)
+        self._undo_log = None
+
+    @classmethod
+    def open(cls, filename, edit=True):
+        """Opens an existing ledger, for editing unless edit is False.
+
+        Raises FileNotFoundError if the file does not exist, and BlockingIOError
+        if edit is set and another process is editing the ledger.
+        """
+        if not os.path.isfile(filename):
+            raise FileNotFoundError(f"ledger '{filename}' not found")
+        return cls(filename, hold_session(filename) if edit else None)
+
+    @classmethod
+    def create(cls, filename, initial_balance=0):
+        """Creates a ledger with no entries (in the format its suffix names) and opens it for editing.
+
+        Raises FileExistsError if the file exists and ValueError for a negative initial balance.
+        """
+        if initial_balance < 0:
+            raise ValueError("Initial balance cannot be negative.")
+        session = hold_session(filename)
+        try:
+            with locked(filename):
+                if os.path.exists(filename):
+                    raise FileExistsError(f"ledger '{filename}' already exists")
+                save_transactions(filename, initial_balance, initial_balance, TransactionStore())
+        except BaseException:
+            session.close()
+            raise
+
+        ledger = cls(filename, session)
+        ledger._initial_balance = ledger._recorded_balance = initial_balance
+        ledger._transactions = read_snapshot(filename)[2] # Empty, but an SQLite ledger needs its own store
+        return ledger
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    ### Balances and Entries ###
+    @property
+    def transactions(self):
+        """The entries as a TransactionStore (an SQLiteStore or PartitionedStore for those ledgers), newest first."""
+        if self._transactions is None:
+            self._recorded_balance, self._initial_balance, self._transactions, self.journal_records = read_ledger(self.filename)
+        return self._transactions
+
+    @property
+    def initial_balance(self):
+        self.transactions
+        return self._initial_balance
+
+    @property
+    def balance(self):
+        """The current balance: the initial balance plus every entry."""
+        return ledger_balance(self.initial_balance, self.transactions)
+
+    @property
+    def recorded_balance(self):
+        """The balance the file records, which check_consistency compares with balance."""
+        self.transactions
+        return self._recorded_balance
+
+    @property
+    def undo_log(self):
+        if self._undo_log is None:
+            self._undo_log = UndoLog(undo_filename(self.filename) if KEEP_UNDO_HISTORY else None)
+        return self._undo_log
+
+    ### Edits ###
+    def add(self, entry):
+        """Adds an entry ({"date", "category", "amount", "details"}) in date order and returns its index.
+
+        Raises ValueError for an entry validate_entry rejects.
+        """
+        validate_entry(entry)
+        index = self._editable().add(entry)
+        self._record("A", transaction=entry)
+        self.undo_log.record(("A", index, entry))
+        return index
+
+    def delete(self, index):
+        """Deletes the entry at index and returns it."""
+        deleted_entry = self._editable().delete(index)
+        self._record("D", index=index)
+        self.undo_log.record(("D", index, deleted_entry))
+        return deleted_entry
+
+    def update(self, index, entry):
+        """Replaces the entry at index and returns its new index (it moves only if the date changed).
+
+        Raises ValueError for an entry validate_entry rejects.
+        """
+        validate_entry(entry)
+        transactions = self._editable()
+        changes = changed_fields(transactions[index], entry)
+        new_index = transactions.update(index, entry)
+        self._record("U", index=index, transaction=entry) # Journaled by its index before re-sorting
+        self.undo_log.record(("U", index, new_index, changes))
+        return new_index
+
+    def undo(self):
+        """Reverses the latest edit not undone yet and returns its undo log step, or None if there is nothing to undo.
+
+        Raises ValueError if the history no longer matches the ledger; the history is then cleared.
+        """
+        transactions = self._editable()
+        if not self.undo_log.can_undo():
+            return None
+        step, operations = self.undo_log.undo(transactions)
+        self._apply(operations)
+        return step
+
+    def redo(self):
+        """Repeats the edit undone most recently and returns its step, or None if there is nothing to redo."""
+        transactions = self._editable()
+        if not self.undo_log.can_redo():
+            return None
+        step, operations = self.undo_log.redo(transactions)
+        self._apply(operations)
+        return step
+
+    ### Queries ###
+    def select(self, start=None, end=None, year=None, month=None, day=None, category=None):
+        """Returns the entries matching every given criterion, newest first (see select_entries)."""
+        return select_entries(self.transactions, start=start, end=end, year=year, month=month, day=day, category=category)
+
+    def search(self, text, start=None, end=None, year=None, month=None, day=None, category=None):
+        """Returns the indices of the entries whose details contain words starting with each word of text."""
+        return self.transactions.search(text, start=start, end=end, year=year, month=month, day=day, category=category)
+
+    def totals(self, year=None, month=None):
+        """Returns income, expenses (negative) and entry counts for the whole ledger, a year or a month."""
+        return self.transactions.totals(year, month)
+
+    def month_totals(self):
+        return self.transactions.month_totals()
+
+    def year_totals(self):
+        return self.transactions.year_totals()
+
+    def ratio(self):
+        """Returns the income/expense ratio, or None if no expenses are recorded."""
+        total_income, total_expenses = income_expense_totals(self.transactions)
+        return total_income / total_expenses if total_expenses else None
+
+    def verify(self):
+        """Returns a description of every running aggregate that disagrees with a full recompute."""
+        return self.transactions.verify()
+
+    ### Saving ###
+    def compact(self):
+        """Folds the journal back into the ledger file (written atomically) and starts an empty one.
+
+        An SQLite ledger has no journal; its recorded balance is corrected here if it disagrees with the entries.
+        """
+        if isinstance(self._transactions, SQLiteStore):
+            if self._recorded_balance != self.balance:
+                save_transactions(self.filename, self.balance, self._initial_balance, self._editable())
+                self._recorded_balance = self.balance
+            return
+        if self._transactions is None or (self.journal_records == 0 and not os.path.isfile(journal_filename(self.filename))):
+            return # Nothing to fold in
+        compact_journal(self.filename, self.balance, self._initial_balance, self._editable())
+        self.journal_records = 0
+        self._recorded_balance = self.balance
+        if self._undo_log is not None:
+            self._undo_log.compact()
+
+    def close(self):
+        """Compacts the journal of a ledger opened for editing and ends the edit session; safe to call twice."""
+        if self._session is not None:
+            self.compact()
+            self._session.close()
+            self._session = None
+        if isinstance(self._transactions, SQLiteStore):
+            self._transactions.close()
+        self._transactions = None
+
+    def _editable(self):
+        # The store, once we know no other process can be editing the same file
+        if self._session is None:
+            raise PermissionError(f"ledger '{self.filename}' is not open for editing")
+        return self.transactions
+
+    def _record(self, operation, index=None, transaction=None):
+        # Makes an edit durable: an SQLite ledger has already committed it, a file ledger journals it
+        if isinstance(self._transactions, SQLiteStore):
+            self._recorded_balance = self._transactions.meta("current_balance") # Kept current by the database's triggers
+            return
+
+        balance = self.balance
+        append_journal(self.filename, operation, balance, index=index, transaction=transaction)
+        self.journal_records += 1
+        self._recorded_balance = balance # The journal now carries this balance
+        if self.journal_records >= JOURNAL_COMPACT_THRESHOLD:
+            self.compact()
+
+    def _apply(self, operations):
+        # Applies undo/redo operations (A add, D delete, U update, I insert at index), recording each
+        for operation, index, entry in operations:
+            if operation == "A":
+                self._transactions.add(entry)
+            elif operation == "D":
+                self._transactions.delete(index)
+            elif operation == "U":
+                self._transactions.update(index, entry)
+            elif operation == "I":
+                self._transactions.insert(index, entry)
+            self._record(operation, index=index, transaction=entry)
+
+### Helper Functions ###
+def format_currency(amount):
+    """Formats an amount in centavos as pesos, e.g. -125050 -> "-1,250.50" (exact, no float rounding)."""
+    pesos, centavos = divmod(abs(amount), 100)
+    return f"{'-' if amount < 0 else ''}{pesos:,}.{centavos:02d}"
+
+def parse_amount(amount_str):
+    """Parses a peso amount such as "-1,250.5" into a whole number of centavos."""
+    match = AMOUNT_PATTERN.fullmatch(amount_str.strip().replace(",", ""))
+    if match is None or not (match[2] or match[3]):
+        raise ValueError(f"'{amount_str}' is not an amount with up to 2 decimal places")
+    centavos = int(match[2] or "0") * 100 + int((match[3] or "").ljust(2, "0"))
+    if centavos > MAX_AMOUNT:
+        raise ValueError(f"'{amount_str}' is too large an amount")
+    return -centavos if match[1] == "-" else centavos
+
+def select_entries(transactions, start=None, end=None, year=None, month=None, day=None, category=None):
+    """Returns the entries matching every given criterion, using the date index of a TransactionStore, SQL on an SQLiteStore
+    or only the partitions of a PartitionedStore whose months can match."""
+    if isinstance(transactions, (TransactionStore, SQLiteStore, PartitionedStore)):
+        return transactions.select(start=start, end=end, year=year, month=month, day=day, category=category)
+
+    # Plain lists and lazy iterators (e.g. iter_transactions) are scanned once
+    return [
+        entry for entry in transactions
+        if (start is None or entry["date"] >= start)
+        and (end is None or entry["date"] <= end)
+        and (year is None or entry["date"].year == year)
+        and (month is None or entry["date"].month == month)
+        and (day is None or entry["date"].day == day)
+        and (category is None or entry["category"] == category)
+    ]
+
+def income_expense_totals(transactions):
+    """Returns (total income, total expenses as a positive amount) in centavos."""
+    if isinstance(transactions, (TransactionStore, SQLiteStore, PartitionedStore)):
+        # Read the running aggregates (kept in memory, by triggers in the database or in a manifest) instead of visiting every entry
+        totals = transactions.totals()
+        return totals["income"], abs(totals["expenses"])
+
+    # Single pass, so a lazy iterator such as iter_transactions works as well as a list
+    total_income = 0
+    total_expenses = 0
+    for transaction in transactions:
+        if transaction["category"] == "I":
+            total_income += transaction["amount"]
+        elif transaction["category"] == "E":
+            total_expenses += transaction["amount"]
+    return total_income, abs(total_expenses)
+
+def ledger_balance(initial_balance, transactions):
+    """Returns the current balance: the initial balance plus every recorded entry."""
+    return initial_balance + transactions.net_total()
+
+def generate_filename():
+    """Generates a unique filename based on current date and time."""
+    now = datetime.now()
+    timestamp = now.strftime("%Y-%m-%d_%H-%M-%S")  # Format timestamp (customize as needed)
+    return f"transactions_{timestamp}.txt"
+
+def data_entry_validation(entry_type, date_string, amount, details, current_balance):
+    """Validates entry type, date, amount, and details for a transaction (expenses are checked against current_balance)."""
+
+    # Validate entry type if it's provided (not an empty string)
+    if entry_type and entry_type not in ["I", "E"]:
+        return False, f"Error: Invalid entry type '{entry_type}'. Please enter 'I' for Income or 'E' for Expense.", amount
+
+    # Validate date (format and ensure it's not in the future) if date_string is provided
+    if date_string:
+        try:
+            entry_date = date.fromisoformat(date_string)
+            if entry_date > date.today():
+                return False, "Error: Entry date cannot be in the future.", amount
+        except ValueError:
+            return False, "Error: Invalid date format. Please use YYYY-MM-DD.", amount
+
+    # Validate amount if amount is provided and entry_type is valid
+    if entry_type in ["I", "E"] and amount:  # Check if amount is provided (not 0 or None)
+        
+        # Convert expense amount to negative and prevent zero amount
+        if entry_type.upper() == "E":
+            amount = -abs(amount)  # Make it negative, regardless of input
+            if current_balance + amount < 0:
+                return False, "Error: Insufficient funds.", amount
+
+        if amount == 0:
+            return False, "Error: Amount must not be zero.", amount
+        
+    # Validate details if they are provided (not an empty string)
+    if details and not details.strip():
+        return False, "Error: Please provide details for the entry.", amount
+    if details and has_line_break(details):
+        return False, "Error: Details cannot contain line breaks.", amount
+
+    # If all checks pass, return True and the amount (possibly modified)
+    return True, "", amount
+
+def has_line_break(details):
+    """Returns True if details contain a "\r" or "\n", which would split the entry's ledger or journal line."""
+    return "\n" in details or "\r" in details
+
+def validate_entry(entry):
+    """Raises ValueError for an entry that data_entry_validation or the store would refuse.
+
+    The category must be "I" or "E", the date a date, the amount a non-zero
+    whole number of centavos within range, and the details a string on one line.
+    Future dates and insufficient funds are left to the caller, as amounts here
+    are already signed.
+    """
+    if entry["category"] not in ("I", "E"):
+        raise ValueError(f"Invalid entry type {entry['category']!r}. Use 'I' for Income or 'E' for Expense.")
+    if not isinstance(entry["date"], date):
+        raise ValueError(f"Invalid entry date {entry['date']!r}. Use a datetime.date.")
+    amount = entry["amount"]
+    if not isinstance(amount, int) or isinstance(amount, bool) or amount == 0:
+        raise ValueError("Amount must be a non-zero whole number of centavos.")
+    if abs(amount) > MAX_AMOUNT:
+        raise ValueError(f"Amount must be at most {MAX_AMOUNT} centavos.")
+    if not isinstance(entry["details"], str):
+        raise ValueError("Details must be text.")
+    if has_line_break(entry["details"]):
+        raise ValueError("Details cannot contain line breaks.")
+
+def format_transaction(transaction):
+    """Formats a transaction as a single ledger line (without the newline)."""
+    return f"{transaction['date'].isoformat()} {transaction['category']} {format_currency(transaction['amount'])} {transaction['details']}"
+
+def parse_transaction(line):
+    """Parses a ledger line into a transaction dictionary, or returns None if the line is not a transaction."""
+    parts = line.strip().split(" ")
+    if len(parts) >= 3:  
+        date_str, category, amount_str = parts[:3] 
+        details = " ".join(parts[3:]) if len(parts) > 3 else "" 
+        amount = parse_amount(amount_str)
+        # Convert date_str to date object
+        return {"date": date.fromisoformat(date_str), "category": category, "amount": amount, "details": details}
+    return None
+
+def read_balances(file):
+    """Reads the current and initial balance header lines from an open ledger file."""
+    # Split the first line by ":"
+    current_balance_str = file.readline().strip().split(": ")[-1]
+    current_balance = parse_amount(current_balance_str)
+
+    #Read initial balance (second line)
+    initial_balance_str = file.readline().strip().split(": ")[-1]
+    initial_balance = parse_amount(initial_balance_str)
+
+    return current_balance, initial_balance
+
+def iter_transactions(filename):
+    """Lazily yields the transactions of a ledger file one at a time, without loading the whole file."""
+    with locked(filename, exclusive=False):
+        if os.path.isfile(journal_filename(filename)):
+            # Journal records address entries by index, so pending edits need the snapshot in memory
+            current_balance, _, transactions = read_snapshot(filename)
+            _, transactions, _ = replay_journal(filename, current_balance, transactions)
+            yield from transactions
+            return
+
+        if is_binary_snapshot(filename):
+            # Rows are paged in from the memory-mapped file as they are read
+            with BinaryLedgerView(filename) as view:
+                yield from view
+            return
+
+        if is_sqlite_ledger(filename):
+            transactions = SQLiteStore(filename)
+            try:
+                yield from transactions # Streams from a database cursor
+            finally:
+                transactions.close()
+            return
+
+        if is_partitioned_ledger(filename):
+            yield from read_partitioned_ledger(filename)[2] # One partition in memory at a time
+            return
+
+        with open(filename, "r") as file:
+            read_balances(file)
+            for line in file:
+                transaction = parse_transaction(line)
+                if transaction is not None:
+                    yield transaction
+
+def iter_transaction_batches(filename, batch_size=LOAD_BATCH_SIZE):
+    """Yields the transactions of a ledger file in lists of at most batch_size entries."""
+    batch = []
+    for transaction in iter_transactions(filename):
+        batch.append(transaction)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def read_snapshot(filename):
+    """Reads a ledger with the storage backend detected from the file itself, without its journal."""
+    return storage_backend(filename).read(filename)
+
+def read_text_snapshot(filename):
+    """Reads the human-readable format into (current balance, initial balance, TransactionStore)."""
+    with open(filename, "r") as file:
+        current_balance, initial_balance = read_balances(file)
+
+        # Load transaction entries (rest of the lines)
+        transactions = TransactionStore(transaction for transaction in map(parse_transaction, file) if transaction is not None)
+
+    return current_balance, initial_balance, transactions
+
+def load_transactions(filename):
+    """Loads transactions from the specified text or binary file and replays any pending journal records."""
+    try:
+        current_balance, initial_balance, transactions, _ = read_ledger(filename)
+        return current_balance, initial_balance, transactions
+
+    except FileNotFoundError:
+        print(f"File not found: {filename}")
+        return 0, [] 
+
+def read_ledger(filename):
+    """Reads a ledger and replays its journal; returns (current balance, initial balance, transactions, journal records)."""
+    # Shared lock: other readers may load at the same time, but no journal append or compaction can interleave
+    with locked(filename, exclusive=False):
+        current_balance, initial_balance, transactions = read_snapshot(filename)
+
+        # Apply the edits made since the snapshot was last written
+        current_balance, transactions, records = replay_journal(filename, current_balance, transactions)
+    return current_balance, initial_balance, transactions, records
+
+def save_transactions(filename, current_balance, initial_balance, transactions, backend_name=None):
+    """Saves transactions and current balance to the given file, keeping its storage backend (text, binary, SQLite or partitioned).
+
+    The snapshot is written to a temporary file and renamed over the old one, so
+    a crash or a concurrent reader never sees a half-written ledger. An SQLite
+    ledger saved onto itself only writes its recorded balance, and only if it
+    drifted: every edit is already committed. A partitioned ledger saved onto
+    itself rewrites only its changed partitions.
+    """
+    if isinstance(transactions, SQLiteStore) and os.path.abspath(transactions.filename) == os.path.abspath(filename):
+        if transactions.meta("current_balance") != current_balance:
+            transactions.set_meta("current_balance", current_balance)
+        return
+    if isinstance(transactions, PartitionedStore) and os.path.abspath(transactions.filename) == os.path.abspath(filename):
+        with locked(filename):
+            transactions.save(current_balance, initial_balance)
+        return
+
+    backend = storage_backend(filename, backend_name)
+    temporary = filename + ".tmp"
+    with locked(filename):
+        if os.path.exists(temporary):
+            os.remove(temporary) # Left behind by an interrupted save
+        backend.write(temporary, current_balance, initial_balance, transactions)
+        backend.replace(temporary, filename)
+
+def write_text_snapshot(filename, current_balance, initial_balance, transactions):
+    """Writes the human-readable "Current Balance / Initial Balance / Transactions Record" format."""
+    with open(filename, "w") as file:
+        file.write(f"Current Balance: {format_currency(current_balance)}\n")
+        file.write(f"Initial Balance: {format_currency(initial_balance)}\n\n")
+        file.write("Transactions Record: \n")
+        
+        for transaction in transactions:  # Iterate over the transactions list
+            file.write(format_transaction(transaction) + "\n")
+
+### Journal Functions ###
+def journal_filename(filename):
+    """Returns the name of the journal file that belongs to a ledger file."""
+    return filename + JOURNAL_SUFFIX
+
+def undo_filename(filename):
+    """Returns the name of the file that keeps a ledger's undo/redo history."""
+    return filename + UNDO_SUFFIX
+
+def snapshot_identity(filename):
+    """Returns a token that changes whenever the ledger file is replaced (inode, size and modification time)."""
+    status = os.stat(filename)
+    return f"{status.st_ino}-{status.st_size}-{status.st_mtime_ns}"
+
+def append_journal(filename, operation, current_balance, index=None, transaction=None, snapshot=None):
+    """Appends one add (A), delete (D), update (U), insert-at-index (I) or compaction (C) record to the ledger's journal."""
+    # Record layout: <operation> <balance after the edit> [<index>] [<transaction line>], or C <balance> <snapshot identity>
+    fields = [operation, format_currency(current_balance).replace(",", "")]
+    if index is not None:
+        fields.append(str(index))
+    if transaction is not None:
+        fields.append(format_transaction(transaction))
+    if snapshot is not None:
+        fields.append(snapshot)
+
+    with locked(filename), open(journal_filename(filename), "a") as journal:
+        journal.write(" ".join(fields) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno()) # Make sure the record survives a crash before reporting success
+
+def replay_journal(filename, current_balance, transactions):
+    """Applies the journal records of a ledger on top of its loaded snapshot and counts them."""
+    records = 0
+    if not os.path.isfile(journal_filename(filename)):
+        return current_balance, transactions, records
+
+    with open(journal_filename(filename), "r") as journal:
+        lines = journal.readlines()
+    if lines and not lines[-1].endswith("\n"):
+        lines.pop() # Ignore a partially written last record
+
+    # A compaction record names the snapshot its earlier records were made against. If the file
+    # has been replaced since, the compaction got as far as writing it: those records are folded in.
+    snapshot = snapshot_identity(filename)
+    start = 0
+    for position, line in enumerate(lines):
+        if line.startswith("C ") and line.split()[2] != snapshot:
+            start = position + 1
+
+    for line in lines[start:]:
+        parts = line.rstrip("\n").split(" ", 3)
+        operation = parts[0]
+        if operation == "A":
+            transactions.add(parse_transaction(" ".join(parts[2:])))
+        elif operation == "D":
+            transactions.delete(int(parts[2]))
+        elif operation == "U":
+            transactions.update(int(parts[2]), parse_transaction(parts[3]))
+        elif operation == "I":
+            transactions.insert(int(parts[2]), parse_transaction(parts[3]))
+        else:
+            continue # Skip records this version does not understand
+
+        current_balance = parse_amount(parts[1])
+        records += 1
+
+    return current_balance, transactions, records
+
+def compact_journal(filename, current_balance, initial_balance, transactions):
+    """Folds the journal back into the snapshot file and starts a new, empty journal."""
+    # Readers must not see the new snapshot together with the old journal
+    with locked(filename):
+        if os.path.isfile(journal_filename(filename)):
+            # Lets a crash before the journal is removed be told apart from one before the snapshot is replaced
+            append_journal(filename, "C", current_balance, snapshot=snapshot_identity(filename))
+        save_transactions(filename, current_balance, initial_balance, transactions)
+        if os.path.isfile(journal_filename(filename)):
+            os.remove(journal_filename(filename))
+
+def convert_ledger(source, target, to_format=None):
+    """Exports a ledger from one storage backend to another (pending journal records are included)."""
+    current_balance, initial_balance, transactions = load_transactions(source)
+    if to_format is None:
+        to_format = storage_backend_for_suffix(target).name
+
+    save_transactions(target, current_balance, initial_balance, transactions, to_format)
+    print(f"Converted {len(transactions)} entries from '{source}' to {to_format} ledger '{target}'.")
+
+### Storage Backends ###
+class StorageBackend:
+    """How a ledger file is stored; load_transactions and save_transactions go through one of these.
+
+    read() returns (current balance, initial balance, store) and write() creates
+    a new file from any store; replace() moves a written file over the ledger.
+    """
+    name = None
+    suffixes = ()
+
+    def detect(self, filename):
+        """Returns True if the file is in this backend's format."""
+        return False
+
+    def read(self, filename):
+        raise NotImplementedError
+
+    def write(self, filename, current_balance, initial_balance, transactions):
+        raise NotImplementedError
+
+    def replace(self, temporary, filename):
+        replace_atomically(temporary, filename)
+
+class TextBackend(StorageBackend):
+    """The original human-readable format; edits are journaled and a save rewrites the whole file."""
+    name = "text"
+    suffixes = (".txt",)
+
+    def read(self, filename):
+        return read_text_snapshot(filename)
+
+    def write(self, filename, current_balance, initial_balance, transactions):
+        write_text_snapshot(filename, current_balance, initial_balance, transactions)
+
+class BinaryBackend(StorageBackend):
+    """Memory-mapped columns (see binary_snapshot); edits are journaled like the text format."""
+    name = "binary"
+    suffixes = (BINARY_SUFFIX,)
+
+    def detect(self, filename):
+        return is_binary_snapshot(filename)
+
+    def read(self, filename):
+        return read_binary_snapshot(filename)
+
+    def write(self, filename, current_balance, initial_balance, transactions):
+        write_binary_snapshot(filename, current_balance, initial_balance, transactions)
+
+class SQLiteBackend(StorageBackend):
+    """An SQLite database (see sqlite_store); entries stay on disk and every edit is committed as it happens."""
+    name = "sqlite"
+    suffixes = SQLITE_SUFFIXES
+
+    def detect(self, filename):
+        return is_sqlite_ledger(filename)
+
+    def read(self, filename):
+        if not os.path.isfile(filename):
+            raise FileNotFoundError(filename) # Connecting would create an empty database instead
+        return read_sqlite_ledger(filename)
+
+    def write(self, filename, current_balance, initial_balance, transactions):
+        write_sqlite_ledger(filename, current_balance, initial_balance, transactions)
+
+    def replace(self, temporary, filename):
+        replace_atomically(temporary, filename)
+        for suffix in ("-wal", "-shm"):
+            if os.path.isfile(filename + suffix):
+                os.remove(filename + suffix) # Write-ahead log of the database that was just replaced
+
+class PartitionedBackend(StorageBackend):
+    """A manifest plus one binary snapshot per year or month (see partitioned_store); partitions are read as needed."""
+    suffixes = (PARTITIONED_SUFFIX,)
+
+    def __init__(self, name, granularity):
+        self.name = name
+        self.granularity = granularity
+
+    def detect(self, filename):
+        return is_partitioned_ledger(filename) and read_manifest(filename)["granularity"] == self.granularity
+
+    def read(self, filename):
+        return read_partitioned_ledger(filename)
+
+    def write(self, filename, current_balance, initial_balance, transactions):
+        write_partitioned_ledger(filename, current_balance, initial_balance, transactions, self.granularity)
+
+    def replace(self, temporary, filename):
+        replace_partitioned_ledger(temporary, filename)
+
+STORAGE_BACKENDS = {backend.name: backend for backend in (TextBackend(), BinaryBackend(), SQLiteBackend(),
+                                                          PartitionedBackend("partitioned", "year"), PartitionedBackend("partitioned-monthly", "month"))}
+
+def storage_backend(filename, name=None):
+    """Returns the storage backend by name, else the one whose format the file is in, else the one its suffix names."""
+    if name is not None:
+        return STORAGE_BACKENDS[name]
+    for backend in STORAGE_BACKENDS.values():
+        if backend.detect(filename):
+            return backend
+    return storage_backend_for_suffix(filename)
+
+def storage_backend_for_suffix(filename):
+    """Returns the storage backend a new file with this name should use (text unless the suffix says otherwise)."""
+    for backend in STORAGE_BACKENDS.values():
+        if filename.endswith(backend.suffixes):
+            return backend
+    return STORAGE_BACKENDS["text"]
+
+### Batch Import ###
+IMPORT_FORMATS = {".csv": "csv", ".tsv": "tsv", ".tab": "tsv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+IMPORT_BATCH_SIZE = 100_000 # Records read and validated together
+IMPORT_COLUMNS = {"date": "date", "type": "type", "category": "type", "amount": "amount", "details": "details", "description": "details"}
+
+def read_import_rows(source, source_format):
+    """Yields (line number, [date, type, amount, details]) for every record of a CSV, TSV or JSON-lines file."""
+    fields = ["date", "type", "amount", "details"]
+    with open(source, "r", newline="", encoding="utf-8-sig") as file:
+        if source_format == "jsonl":
+            for line_number, line in enumerate(file, start=1):
+                if line.strip():
+                    record = {IMPORT_COLUMNS.get(key.lower(), key): value for key, value in json.loads(line).items()}
+                    yield line_number, [str(record.get(field) or "") for field in fields]
+            return
+
+        reader = csv.reader(file, delimiter="\t" if source_format == "tsv" else ",")
+        header = [IMPORT_COLUMNS.get(name.strip().lower(), name) for name in next(reader, [])]
+        # Missing columns (usually "type") read from a trailing empty cell
+        positions = [header.index(field) if field in header else len(header) for field in fields]
+        for row in reader:
+            if row:
+                row += [""] * (len(header) + 1 - len(row))
+                yield reader.line_num, [row[position] for position in positions]
+
+def validate_import_rows(rows, today):
+    """Validates a batch of imported [date, type, amount, details] records with data_entry_validation's rules.
+
+    Returns (codes, ordinals, categories, amounts, details) as validate_batch
+    does, plus the stripped details. Insufficient funds are checked later,
+    once every batch has been read.
+    """
+    # One map per column; zip(*rows) would be far slower with this many arguments
+    dates, entry_types, amount_strings, details = (list(map(itemgetter(field), rows)) for field in range(4))
+    amounts = list(map(ParsedValues(import_amount).__getitem__, amount_strings))
+    # Bank exports often spell the type out ("Expense") or leave it out and only sign the amount
+    entry_types = list(map(ParsedValues(lambda entry_type: entry_type.strip().upper()[:1]).__getitem__, entry_types))
+    if "" in entry_types:
+        entry_types = [entry_type or ("E" if amount is not None and amount < 0 else "I") for entry_type, amount in zip(entry_types, amounts)]
+    details = list(map(str.strip, details))
+    return validate_batch(dates, entry_types, amounts, details, today=today) + (details,)
+
+def import_amount(amount_str):
+    """parse_amount for imported records: returns None instead of raising for an invalid amount."""
+    try:
+        return parse_amount(amount_str)
+    except ValueError:
+        return None
+
+def import_transactions(ledger, source, source_format=None, rejects_path=None, initial_balance=0):
+    """Bulk-imports a CSV/TSV/JSON-lines file into a ledger with one sorted merge and a single save."""
+    started = time.perf_counter()
+    if source_format is None:
+        source_format = IMPORT_FORMATS.get(os.path.splitext(source)[1].lower(), "csv")
+
+    if os.path.isfile(ledger):
+        _, initial_balance, transactions = load_transactions(ledger)
+    else:
+        transactions = TransactionStore()
+
+    # Accepted rows go straight into columns; no dictionary per row
+    dates, categories, amounts, details_ids, line_numbers = array("i"), bytearray(), array("q"), array("i"), array("i")
+    string_ids = ParsedValues(lambda details: len(string_ids)) # Details -> string id, numbered in order of appearance
+    reject_counts = {}
+    rejects = open(rejects_path, "w", newline="") if rejects_path else None
+    today = date.today()
+    records = 0
+
+    rows = read_import_rows(source, source_format)
+    while batch := list(islice(rows, IMPORT_BATCH_SIZE)):
+        records += len(batch)
+        numbers, batch = list(map(itemgetter(0), batch)), list(map(itemgetter(1), batch))
+        codes, ordinals, kinds, signed, details = validate_import_rows(batch, today)
+        for error, count in error_counts(codes).items():
+            reject_counts[error] = reject_counts.get(error, 0) + count
+        if rejects:
+            for position in compress(range(len(codes)), codes):
+                rejects.write(f"{numbers[position]}\t{first_error(codes[position])}\t{json.dumps(batch[position])}\n") # [date, type, amount, details]
+
+        valid = codes.translate(VALID_MASK)
+        dates.extend(compress(ordinals, valid))
+        categories.extend(compress(kinds, valid))
+        amounts.extend(compress(signed, valid))
+        details_ids.extend(map(string_ids.__getitem__, compress(details, valid)))
+        line_numbers.extend(compress(numbers, valid))
+
+    strings = list(string_ids)
+
+    # Same rule as data_entry_validation, against the balance running through the new entries in date order
+    codes = check_running_balance(bytes(len(dates)), dates, amounts, ledger_balance(initial_balance, transactions))
+    if any(codes):
+        reject_counts["insufficient funds"] = codes.count(INSUFFICIENT_FUNDS)
+        if rejects:
+            for position in compress(range(len(codes)), codes):
+                row = [date.fromordinal(dates[position]).isoformat(), chr(categories[position]),
+                       format_currency(amounts[position]), strings[details_ids[position]]]
+                rejects.write(f"{line_numbers[position]}\tinsufficient funds\t{json.dumps(row)}\n")
+        valid = codes.translate(VALID_MASK)
+        dates, amounts, details_ids = (array(column.typecode, compress(column, valid)) for column in (dates, amounts, details_ids))
+        categories = bytearray(compress(categories, valid))
+
+    if rejects:
+        rejects.close()
+
+    # Reversed so entries sharing a date end up in file order, exactly as repeated add_entry calls would
+    for column in (dates, categories, amounts, details_ids):
+        column.reverse()
+    transactions.merge(TransactionStore.from_columns(dates, categories, amounts, details_ids, strings))
+
+    with locked(ledger):
+        compact_journal(ledger, ledger_balance(initial_balance, transactions), initial_balance, transactions) # Its records are part of the snapshot
+        if os.path.isfile(undo_filename(ledger)):
+            os.remove(undo_filename(ledger)) # Indices in the undo history no longer line up with the merged ledger
+
+    elapsed = time.perf_counter() - started
+    rejected = sum(reject_counts.values())
+    print(f"Imported {records - rejected:,} of {records:,} records into '{ledger}' in {elapsed:.2f}s "
+          f"({records / elapsed if elapsed else 0:,.0f} records/s).")
+    for reason, count in sorted(reject_counts.items()):
+        print(f"  Rejected ({reason}): {count:,}")
+    if rejected and rejects_path:
+        print(f"  Rejected records were written to '{rejects_path}'.")
+    return records - rejected, reject_counts
+
+### Command Line ###
+def command_line(arguments):
+    """Runs a one-shot command such as `convert`, or the interactive menu when no command is given."""
+    parser = argparse.ArgumentParser(prog="ExpensesTracker.py", description="Expense Tracker App command line tools.")
+    parser.add_argument("--metrics", default=os.environ.get(METRICS_VARIABLE),
+                        help=f"record command latencies and I/O metrics into this file when exiting, Prometheus text if it ends with .prom, JSON otherwise (default: ${METRICS_VARIABLE})")
+    parser.add_argument("--profile", default=os.environ.get(PROFILE_VARIABLE),
+                        help=f"write a cProfile dump of every menu command run into this directory (default: ${PROFILE_VARIABLE})")
+    subcommands = parser.add_subparsers(dest="command")
+
+    convert = subcommands.add_parser("convert", help="convert a ledger between the text, binary, SQLite and partitioned backends")
+    convert.add_argument("source", help="ledger file to read (text, binary, SQLite or partitioned, detected automatically)")
+    convert.add_argument("target", help=f"ledger file to write (binary if it ends with {BINARY_SUFFIX}, SQLite if it ends with {' or '.join(SQLITE_SUFFIXES)}, "
+                                        f"partitioned by year if it ends with {PARTITIONED_SUFFIX})")
+    convert.add_argument("--to", dest="to_format", choices=list(STORAGE_BACKENDS), help="force the output backend")
+
+    bulk_import = subcommands.add_parser("import", help="bulk-import a CSV, TSV or JSON-lines file into a ledger")
+    bulk_import.add_argument("ledger", help="ledger file to add the entries to (created if missing)")
+    bulk_import.add_argument("source", help="file with date, type, amount and details columns (type may be omitted)")
+    bulk_import.add_argument("--format", dest="source_format", choices=["csv", "tsv", "jsonl"], help="input format (default: from the file extension)")
+    bulk_import.add_argument("--rejects", help="write rejected records and the reason to this file")
+    bulk_import.add_argument("--initial-balance", default="0", help="initial balance when the ledger is created")
+
+    options = parser.parse_args(arguments)
+    if options.metrics or options.profile:
+        instrument(sys.modules[__name__], options.metrics, options.profile)
+
+    if options.command is None:
+        main_menu(initialization())
+    elif options.command == "convert":
+        if not os.path.isfile(options.source):
+            parser.error(f"file '{options.source}' not found")
+        convert_ledger(options.source, options.target, options.to_format)
+    elif options.command == "import":
+        if not os.path.isfile(options.source):
+            parser.error(f"file '{options.source}' not found")
+        try:
+            initial_balance = parse_amount(options.initial_balance)
+        except ValueError as e:
+            parser.error(str(e))
+        try:
+            session = hold_session(options.ledger)
+        except BlockingIOError:
+            parser.error(f"ledger '{options.ledger}' is open in another session")
+        with session:
+            import_transactions(options.ledger, options.source, options.source_format, options.rejects, initial_balance)
+
+
+
+if __name__ == "__main__":
+    command_line(sys.argv[1:])
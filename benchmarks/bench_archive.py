@@ -0,0 +1,98 @@
+"""Benchmark for ledger_archive: compression ratio and throughput of every codec on synthetic ledgers.
+
+For each ledger size and codec it times export (text ledger -> archive) and
+import (archive -> text ledger), and checks that the restored ledger is the
+same file byte for byte. Throughput is in megabytes of text ledger per second
+and the ratio is the text ledger's size over the archive's. The "plain gzip"
+row compresses the text file as it is, for comparison with the dictionary
+encoding. Peak memory is the largest resident set of the process so far, which
+stays flat as ledgers grow because both directions stream.
+
+Run from the repository root:  python benchmarks/bench_archive.py --sizes 100k,1M --codecs gzip,xz
+"""
+import argparse
+import contextlib
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError: # Windows: no peak memory column
+    resource = None
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+from bench_tracker import parse_sizes
+from generate_ledger import write_ledger
+from ledger_archive import CODECS, available_codecs, export_archive, import_archive, open_codec
+
+def peak_memory():
+    """Returns the peak resident set size of this process in bytes (ru_maxrss is in KB on Linux, bytes on macOS), or None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def report(rows, codec, size, archive_size, export_seconds, import_seconds=None, identical=None):
+    import_text = f"{size / 1e6 / import_seconds:>12.1f}" if import_seconds else f"{'-':>12}"
+    identical_text = "-" if identical is None else "yes" if identical else "NO"
+    peak = peak_memory()
+    peak_text = f"{peak / 1e6:>8.0f}" if peak is not None else f"{'-':>8}"
+    print(f"{rows:>11,} {codec:<11} {archive_size / 1e6:>10.2f} {size / archive_size:>7.1f}x {size / 1e6 / export_seconds:>12.1f} "
+          f"{import_text} {identical_text:>10} {peak_text}")
+
+def bench_size(rows, data_dir, codecs):
+    ledger = os.path.join(data_dir, f"ledger_{rows}.txt")
+    if not os.path.isfile(ledger):
+        write_ledger(ledger, rows)
+    size = os.path.getsize(ledger)
+    scratch = os.path.join(data_dir, f"scratch_{rows}")
+    os.makedirs(scratch, exist_ok=True)
+
+    # Baseline: the text ledger compressed as it is
+    plain = os.path.join(scratch, "plain.gz")
+    started = time.perf_counter()
+    with open(ledger, "rb") as source, open_codec(plain, "gzip", "wb") as target:
+        shutil.copyfileobj(source, target)
+    report(rows, "plain gzip", size, os.path.getsize(plain), time.perf_counter() - started)
+
+    for codec in codecs:
+        archive = os.path.join(scratch, "ledger" + CODECS[codec][0])
+        restored = os.path.join(scratch, "restored.txt")
+        started = time.perf_counter()
+        export_archive(ledger, archive, codec)
+        export_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        import_archive(archive, restored)
+        import_seconds = time.perf_counter() - started
+        report(rows, codec, size, os.path.getsize(archive), export_seconds, import_seconds, filecmp.cmp(ledger, restored, shallow=False))
+        os.remove(restored)
+    shutil.rmtree(scratch)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ledger archive export and import on synthetic ledgers.")
+    parser.add_argument("--sizes", default="100k,1M", help="comma-separated ledger sizes: 10k, 100k, 1M, 10M or numbers (default: 100k,1M)")
+    parser.add_argument("--codecs", default=",".join(available_codecs()), help=f"comma-separated codecs (default: {','.join(available_codecs())})")
+    parser.add_argument("--data-dir", help="keep the generated ledgers here and reuse them (default: a temporary directory)")
+    options = parser.parse_args()
+    codecs = options.codecs.split(",")
+    for codec in codecs:
+        if codec not in available_codecs():
+            parser.error(f"codec '{codec}' is not available here (choose from {', '.join(available_codecs())})")
+
+    print(f"{'Rows':>11} {'Codec':<11} {'Archive MB':>10} {'Ratio':>8} {'Export MB/s':>12} {'Import MB/s':>12} "
+          f"{'Identical':>10} {'Peak MB':>8}")
+    with contextlib.ExitStack() as stack:
+        data_dir = options.data_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        os.makedirs(data_dir, exist_ok=True)
+        for rows in parse_sizes(options.sizes):
+            bench_size(rows, data_dir, codecs)
+
+if __name__ == "__main__":
+    main()
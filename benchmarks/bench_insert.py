@@ -0,0 +1,64 @@
+"""Micro-benchmark: cost of adding one entry as the ledger grows.
+
+Compares TransactionStore.add (binary search + insert) with the old
+approach of appending to a list of dictionaries and re-sorting it.
+
+Run from the repository root:  python benchmarks/bench_insert.py
+"""
+import os
+import random
+import sys
+import timeit
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transaction_store import TransactionStore
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+INSERTS = 200
+FIRST_DAY = date(1998, 1, 1).toordinal()
+LAST_DAY = date(2024, 7, 15).toordinal()
+
+def make_transaction(ordinal):
+    return {"date": date.fromordinal(ordinal), "category": "E", "amount": -12550, "details": "Groceries"}
+
+def make_ledger(size):
+    ordinals = sorted((random.randint(FIRST_DAY, LAST_DAY) for _ in range(size)), reverse=True)
+    return [make_transaction(ordinal) for ordinal in ordinals]
+
+def time_store(ledger, ordinals):
+    store = TransactionStore(ledger)
+    new_entries = [make_transaction(ordinal) for ordinal in ordinals]
+    seconds = timeit.timeit(lambda: [store.add(entry) for entry in new_entries], number=1)
+    return seconds / len(new_entries)
+
+def time_list_sort(ledger, ordinals):
+    transactions = list(ledger)
+    new_entries = [make_transaction(ordinal) for ordinal in ordinals]
+
+    def add_all():
+        for entry in new_entries:
+            transactions.append(entry)
+            transactions.sort(key=lambda x: x["date"], reverse=True)
+
+    seconds = timeit.timeit(add_all, number=1)
+    return seconds / len(new_entries)
+
+def main():
+    random.seed(2024)
+    print(f"{'Rows':>10} {'store, random date':>20} {'store, newest date':>20} {'list + sort':>15}")
+    for size in SIZES:
+        ledger = make_ledger(size)
+        random_dates = [random.randint(FIRST_DAY, LAST_DAY) for _ in range(INSERTS)]
+        newest_dates = [LAST_DAY + day for day in range(INSERTS)]
+
+        store_random = time_store(ledger, random_dates)
+        store_newest = time_store(ledger, newest_dates)
+        # The old approach is far too slow to repeat INSERTS times on the biggest ledgers
+        list_sort = time_list_sort(ledger, random_dates[:max(1, INSERTS * 1_000 // size)])
+
+        print(f"{size:>10,} {store_random * 1e6:>17.1f} us {store_newest * 1e6:>17.1f} us {list_sort * 1e6:>12.1f} us")
+
+if __name__ == "__main__":
+    main()
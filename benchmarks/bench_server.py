@@ -0,0 +1,191 @@
+"""Load test for ledger_server: concurrent keep-alive clients sending a mix of reads and edits.
+
+By default it writes a synthetic ledger to a scratch directory, starts the
+server on it in a subprocess and stops it at the end. Pass --port to load an
+already running server instead (its ledger will be edited). Reports requests
+per second and latency percentiles per kind of request, plus the server's
+cache and writer counters. Everything stays on 127.0.0.1.
+
+Run from the repository root:  python benchmarks/bench_server.py --rows 100000 --clients 32 --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+from generate_ledger import FIRST_DAY, LAST_DAY, write_ledger
+from ledger_server import HOST
+
+STARTUP_TIMEOUT = 120 # Seconds to wait for the server to load its ledger
+# (kind, weight): the share of each kind of request in the read part of the mix
+READS = [("balance", 30), ("ratio", 20), ("filter", 20), ("search", 10), ("totals", 10), ("page", 10)]
+
+### HTTP Client ###
+class Connection:
+    """One keep-alive HTTP/1.1 connection to the server."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, port):
+        return cls(*await asyncio.open_connection(HOST, port))
+
+    async def request(self, method, path, body=None):
+        """Sends one request and returns (status, decoded JSON body)."""
+        data = b"" if body is None else json.dumps(body).encode()
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {HOST}\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if not line.strip():
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        self.writer.close()
+
+### Load Test ###
+def next_request(generator, write_share):
+    """Picks the next (kind, method, path, body) of the mix."""
+    if generator.random() < write_share:
+        if generator.random() < 0.5:
+            entry = {"date": date.fromordinal(generator.randint(FIRST_DAY, LAST_DAY)).isoformat(),
+                     "category": "I", "amount": generator.randint(100, 100_000), "details": "Load test"}
+            return "add", "POST", "/entries", entry
+        return "delete", "DELETE", "/entries/0", None # The newest entry, so the ledger keeps its size
+
+    kind = generator.choices([kind for kind, _ in READS], [weight for _, weight in READS])[0]
+    if kind == "balance":
+        return kind, "GET", "/balance", None
+    if kind == "ratio":
+        return kind, "GET", "/ratio", None
+    if kind == "filter":
+        return kind, "GET", f"/entries?year={generator.randint(1998, 2024)}&category=E&limit=50", None
+    if kind == "search":
+        return kind, "GET", f"/search?q={generator.choice(['rent', 'salary', 'gift', 'repair'])}&limit=20", None
+    if kind == "totals":
+        return kind, "GET", "/totals?by=month", None
+    return kind, "GET", f"/entries?offset={generator.randrange(0, 1000)}&limit=20", None
+
+async def run_client(port, requests, write_share, batch, seed, latencies, statuses):
+    """Sends requests one after another (or batch at a time) over one connection."""
+    generator = random.Random(seed)
+    connection = await Connection.open(port)
+    try:
+        sent = 0
+        while sent < requests:
+            chosen = [next_request(generator, write_share) for _ in range(min(batch, requests - sent))]
+            started = time.perf_counter()
+            if batch == 1:
+                kind, method, path, body = chosen[0]
+                status, _ = await connection.request(method, path, body)
+                results = [status]
+            else:
+                kind = "batch"
+                _, response = await connection.request("POST", "/batch", {"requests": [
+                    {"method": method, "path": path, "body": body} for _, method, path, body in chosen]})
+                results = [result["status"] for result in response["responses"]]
+            latencies.setdefault(kind, []).append(time.perf_counter() - started)
+            for status in results:
+                statuses[status] = statuses.get(status, 0) + 1
+            sent += len(chosen)
+    finally:
+        connection.close()
+
+async def load_test(port, clients, requests, write_share, batch):
+    """Runs the clients concurrently and returns (elapsed seconds, latencies by kind, status counts, server stats)."""
+    latencies, statuses = {}, {}
+    per_client = -(-requests // clients)
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(port, per_client, write_share, batch, client, latencies, statuses) for client in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    connection = await Connection.open(port)
+    _, stats = await connection.request("GET", "/stats")
+    connection.close()
+    return elapsed, latencies, statuses, stats
+
+async def wait_for_server(port, process):
+    """Waits until the server accepts connections; raises RuntimeError if it exits first."""
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError("the server exited during startup")
+        try:
+            connection = await Connection.open(port)
+        except OSError:
+            await asyncio.sleep(0.1)
+            continue
+        connection.close()
+        return
+    raise RuntimeError(f"the server did not start within {STARTUP_TIMEOUT}s")
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def report(elapsed, latencies, statuses, stats, requests):
+    print(f"\n{requests:,} requests in {elapsed:.2f}s: {requests / elapsed:,.0f} requests/s")
+    print(f"{'Kind':<10} {'Count':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for kind in sorted(latencies):
+        values = sorted(latencies[kind])
+        print(f"{kind:<10} {len(values):>8,} {percentile(values, 0.5) * 1e3:>9.2f} "
+              f"{percentile(values, 0.95) * 1e3:>9.2f} {percentile(values, 0.99) * 1e3:>9.2f}")
+    print("Statuses: " + ", ".join(f"{status}: {count:,}" for status, count in sorted(statuses.items())))
+    print(f"Server: {stats['cache_hits']:,} of {stats['requests']:,} requests answered from the cache, "
+          f"{stats['writes']:,} edits in {stats['write_batches']:,} writer batches")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test ledger_server on localhost.")
+    parser.add_argument("--port", type=int, help="test the server already running on this port instead of starting one")
+    parser.add_argument("--server-port", type=int, default=8799, help="port for the server this script starts (default: 8799)")
+    parser.add_argument("--rows", type=int, default=100_000, help="entries in the synthetic ledger (default: 100000)")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent connections (default: 16)")
+    parser.add_argument("--requests", type=int, default=10_000, help="requests in total (default: 10000)")
+    parser.add_argument("--write-share", type=float, default=0.05, help="fraction of the requests that are edits (default: 0.05)")
+    parser.add_argument("--batch", type=int, default=1, help="requests sent together through /batch (default: 1, no batching)")
+    options = parser.parse_args()
+
+    if options.port is not None:
+        asyncio.run(wait_for_server(options.port, None))
+        results = asyncio.run(load_test(options.port, options.clients, options.requests, options.write_share, options.batch))
+        report(*results, options.requests)
+        return
+
+    with tempfile.TemporaryDirectory() as scratch:
+        ledger = os.path.join(scratch, "ledger.txt")
+        write_ledger(ledger, options.rows)
+        server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(BENCHMARKS), "ledger_server.py"), ledger,
+                                   "--port", str(options.server_port)], stdout=subprocess.DEVNULL)
+        try:
+            started = time.perf_counter()
+            asyncio.run(wait_for_server(options.server_port, server))
+            print(f"Server loaded {options.rows:,} entries in {time.perf_counter() - started:.2f}s.")
+            results = asyncio.run(load_test(options.server_port, options.clients, options.requests, options.write_share, options.batch))
+        finally:
+            if sys.platform == "win32":
+                server.terminate()
+            else:
+                server.send_signal(signal.SIGINT) # Lets the server fold its journal in and release the ledger
+            server.wait()
+    report(*results, options.requests)
+
+if __name__ == "__main__":
+    main()
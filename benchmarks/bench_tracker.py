@@ -0,0 +1,203 @@
+"""Benchmark suite for the tracker's hot paths on synthetic ledgers.
+
+For each ledger size it times loading and saving (text and binary), every
+filter_entries mode, the details search, income_expense_ratio, batch
+validation of every entry and journaled add/update/delete, and reports
+throughput and peak traced memory. The functions are driven directly,
+without the input() prompts. Results are written as JSON; pass an earlier
+results file with --compare to spot regressions between versions.
+
+Run from the repository root:  python benchmarks/bench_tracker.py --sizes 10k,100k,1M
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+
+import ExpensesTracker as tracker
+from entry_validation import validate_batch
+from generate_ledger import FIRST_DAY, LAST_DAY, write_ledger
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+EDITS = 100 # Journaled adds, updates and deletes timed per ledger size
+FILTERS = {
+    "filter month": {"month": 6},
+    "filter year": {"year": 2010},
+    "filter day": {"day": 15},
+    "filter date range": {"start": date(2010, 1, 1), "end": date(2012, 12, 31)},
+    "filter category": {"category": "E"},
+}
+
+def measure(function, repeat=1, memory=True):
+    """Returns (best wall-clock seconds of repeat runs, peak traced bytes of one more run, last result)."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - started
+        best = seconds if best is None else min(best, seconds)
+
+    peak = None
+    if memory:
+        # Traced separately, as tracemalloc slows down every allocation
+        tracemalloc.start()
+        result = function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak, result
+
+def quietly(function, *arguments):
+    """Calls a menu command with its printed report discarded."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*arguments)
+
+def bench_size(rows, data_dir, repeat, memory):
+    """Runs every benchmark on one ledger size and returns the result records."""
+    results = []
+
+    def record(operation, function, count, unit, repeat=repeat):
+        seconds, peak, result = measure(function, repeat, memory)
+        results.append({"operation": operation, "rows": rows, "seconds": seconds, "count": count, "unit": unit,
+                        "per_second": count / seconds if seconds else None, "peak_bytes": peak})
+        peak_text = f"{peak / 2**20:>9.1f} MiB" if peak is not None else ""
+        print(f"{rows:>11,} {operation:<20} {seconds * 1e3:>11.2f} ms {count / seconds if seconds else 0:>14,.0f} {unit}/s {peak_text}")
+        return result
+
+    ledger = os.path.join(data_dir, f"ledger_{rows}.txt")
+    if not os.path.isfile(ledger):
+        write_ledger(ledger, rows)
+    binary_ledger = os.path.join(data_dir, f"ledger_{rows}{tracker.BINARY_SUFFIX}")
+    scratch = os.path.join(data_dir, f"scratch_{rows}")
+
+    current_balance, initial_balance, transactions = record("load text", lambda: tracker.load_transactions(ledger), rows, "rows")
+    record("save text", lambda: tracker.write_text_snapshot(scratch + ".txt", current_balance, initial_balance, transactions), rows, "rows")
+    record("save binary", lambda: tracker.write_binary_snapshot(binary_ledger, current_balance, initial_balance, transactions), rows, "rows")
+    record("load binary", lambda: tracker.load_transactions(binary_ledger), rows, "rows")
+
+    for operation, criteria in FILTERS.items():
+        record(operation, lambda: tracker.select_entries(transactions, **criteria), rows, "rows")
+    record("search details", lambda: transactions.search("rent"), rows, "rows")
+    with tracker.Ledger.open(scratch + ".txt", edit=False) as reader:
+        reader.transactions # Loaded outside the timing
+        record("income expense ratio", lambda: quietly(tracker.income_expense_ratio, reader), rows, "rows")
+
+    # The ledger's entries as an import would hand them over: ISO date strings and unsigned amounts
+    columns = [[], [], [], []]
+    for transaction in transactions:
+        columns[0].append(transaction["date"].isoformat())
+        columns[1].append(transaction["category"])
+        columns[2].append(abs(transaction["amount"]))
+        columns[3].append(transaction["details"])
+    record("validate batch", lambda: validate_batch(*columns, current_balance=initial_balance), rows, "rows")
+
+    # Edits go through the journal and the undo history (one fsync each), as they do from the menu
+    generator = random.Random(rows)
+    journaled = tracker.Ledger.open(scratch + ".txt")
+    journaled.transactions
+
+    def add_entries():
+        for _ in range(EDITS):
+            entry = {"date": date.fromordinal(generator.randint(FIRST_DAY, LAST_DAY)), "category": "E", "amount": -12550, "details": "Groceries"}
+            journaled.add(entry)
+
+    def update_entries():
+        for _ in range(EDITS):
+            index = generator.randrange(len(journaled.transactions))
+            entry = journaled.transactions[index]
+            entry["date"] = date.fromordinal(generator.randint(FIRST_DAY, LAST_DAY))
+            journaled.update(index, entry)
+
+    def delete_entries():
+        for _ in range(EDITS):
+            journaled.delete(generator.randrange(len(journaled.transactions)))
+
+    record("add entry", add_entries, EDITS, "ops", repeat=1)
+    record("update entry", update_entries, EDITS, "ops", repeat=1)
+    record("delete entry", delete_entries, EDITS, "ops", repeat=1)
+    journaled.close()
+
+    for path in (scratch + ".txt", tracker.journal_filename(scratch + ".txt"), tracker.undo_filename(scratch + ".txt"), binary_ledger):
+        if os.path.isfile(path):
+            os.remove(path)
+    return results
+
+def commit_id():
+    """Returns the short git commit of the tracker being measured, or None outside a checkout."""
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+def compare(results, baseline_path, threshold):
+    """Prints the operations that got more than threshold slower than in an earlier results file."""
+    with open(baseline_path, "r") as file:
+        baseline = json.load(file)
+    previous = {(result["operation"], result["rows"]): result["seconds"] for result in baseline["results"]}
+
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    regressions = 0
+    for result in results:
+        before = previous.get((result["operation"], result["rows"]))
+        if not before:
+            continue
+        change = result["seconds"] / before - 1
+        if change > threshold:
+            regressions += 1
+            print(f"  SLOWER {result['operation']:<20} {result['rows']:>11,} rows: {before * 1e3:.2f} ms -> {result['seconds'] * 1e3:.2f} ms ({change:+.0%})")
+    if regressions == 0:
+        print(f"  No operation is more than {threshold:.0%} slower.")
+    return regressions
+
+def parse_sizes(text):
+    """Parses "10k,100k,1M" (or plain numbers) into row counts."""
+    return [SIZES[size] if size in SIZES else int(size) for size in text.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the expense tracker on synthetic ledgers.")
+    parser.add_argument("--sizes", default="10k,100k,1M", help="comma-separated ledger sizes: 10k, 100k, 1M, 10M or numbers (default: 10k,100k,1M)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per read-only benchmark; the best is kept (default: 3)")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the traced run that measures peak memory")
+    parser.add_argument("--data-dir", help="keep the generated ledgers here and reuse them (default: a temporary directory)")
+    parser.add_argument("--output", default="bench_tracker_results.json", help="JSON results file (default: bench_tracker_results.json)")
+    parser.add_argument("--compare", help="earlier JSON results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="slowdown reported as a regression by --compare (default: 0.10)")
+    options = parser.parse_args()
+
+    print(f"{'Rows':>11} {'Operation':<20} {'Time':>14} {'Throughput':>20} {'Peak memory':>13}")
+    results = []
+    with contextlib.ExitStack() as stack:
+        data_dir = options.data_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        os.makedirs(data_dir, exist_ok=True)
+        for rows in parse_sizes(options.sizes):
+            results.extend(bench_size(rows, data_dir, options.repeat, options.memory))
+
+    report = {
+        "commit": commit_id(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "edits": EDITS,
+        "results": results,
+    }
+    with open(options.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to '{options.output}'.")
+
+    if options.compare:
+        compare(results, options.compare, options.threshold)
+
+if __name__ == "__main__":
+    main()
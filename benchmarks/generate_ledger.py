@@ -0,0 +1,75 @@
+"""Writes a synthetic ledger in the tracker's text format for benchmarking.
+
+The entries are spread evenly (newest first) between FIRST_DAY and
+LAST_DAY, with income and expense details taken from the sample ledger.
+The same seed always gives the same file.
+
+Run from the repository root:  python benchmarks/generate_ledger.py 100000 ledger_100k.txt
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ExpensesTracker import format_currency
+
+FIRST_DAY = date(1998, 1, 1).toordinal()
+LAST_DAY = date(2024, 7, 15).toordinal()
+INITIAL_BALANCE = 10_000_000 # Centavos (PHP 100,000.00)
+INCOME_SHARE = 0.35 # Fraction of the entries that are income
+INCOME_DETAILS = ["Salary", "Side hustle income", "Investment income", "Tax refund", "Gift from friend",
+                  "Reimbursement for work", "Sold old books", "Rebate on purchase", "Inheritance"]
+EXPENSE_DETAILS = ["Rent", "Grocery shopping", "Car repair", "Restaurant meal", "Movie tickets", "Medical bill",
+                   "Gym membership fee", "Online shopping", "Haircut", "Home repair", "Tuition payment",
+                   "Subscription service fee", "Parking ticket", "Holiday gifts", "Vacation expenses"]
+
+def synthetic_transactions(rows, seed=2024, first_day=FIRST_DAY, last_day=LAST_DAY):
+    """Yields rows (ordinal, category, amount in centavos, details) newest first."""
+    generator = random.Random(seed)
+    span = last_day - first_day
+    for row in range(rows):
+        ordinal = last_day - row * span // rows
+        if generator.random() < INCOME_SHARE:
+            yield ordinal, "I", generator.randint(50_000, 5_000_000), generator.choice(INCOME_DETAILS)
+        else:
+            yield ordinal, "E", -generator.randint(5_000, 1_500_000), generator.choice(EXPENSE_DETAILS)
+
+def write_ledger(path, rows, seed=2024, initial_balance=INITIAL_BALANCE):
+    """Writes rows synthetic entries to path and returns the ledger's current balance in centavos."""
+    balance = initial_balance
+    dates = {}
+    # The balance header comes first, so the entries are written to a scratch file and copied after it
+    with tempfile.TemporaryFile("w+") as body:
+        for ordinal, category, amount, details in synthetic_transactions(rows, seed):
+            date_str = dates.get(ordinal)
+            if date_str is None:
+                date_str = dates[ordinal] = date.fromordinal(ordinal).isoformat()
+            body.write(f"{date_str} {category} {format_currency(amount)} {details}\n")
+            balance += amount
+
+        body.seek(0)
+        with open(path, "w") as file:
+            file.write(f"Current Balance: {format_currency(balance)}\n")
+            file.write(f"Initial Balance: {format_currency(initial_balance)}\n\n")
+            file.write("Transactions Record: \n")
+            shutil.copyfileobj(body, file)
+
+    return balance
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic ledger in the text format.")
+    parser.add_argument("rows", type=int, help="number of entries")
+    parser.add_argument("output", help="ledger file to write")
+    parser.add_argument("--seed", type=int, default=2024, help="random seed (default: 2024)")
+    options = parser.parse_args()
+
+    balance = write_ledger(options.output, options.rows, options.seed)
+    print(f"Wrote {options.rows:,} entries to '{options.output}' (current balance {format_currency(balance)}).")
+
+if __name__ == "__main__":
+    main()
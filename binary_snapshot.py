@@ -0,0 +1,141 @@
+import mmap
+import struct
+import sys
+from array import array
+from datetime import date
+
+from transaction_store import TransactionStore
+
+# Layout (little-endian): header, then the columns oldest entry first
+#   dates      int32  x count   date.toordinal()
+#   categories uint8  x count   b"I" / b"E"   (padded to 8 bytes)
+#   amounts    int64  x count   centavos
+#   details    int32  x count   index into the string table
+#   offsets    uint64 x (strings + 1) into the blob
+#   blob       UTF-8 details strings back to back
+MAGIC = b"ETLB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHqqQQ") # magic, version, reserved, current balance, initial balance, count, strings
+BINARY_SUFFIX = ".etb"
+
+### Binary Snapshot Functions ###
+def is_binary_snapshot(filename):
+    """Returns True if the file starts with the binary snapshot signature."""
+    try:
+        with open(filename, "rb") as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def write_binary_snapshot(filename, current_balance, initial_balance, transactions):
+    """Saves the balances and a TransactionStore as a binary snapshot."""
+    dates, categories, amounts, details, strings = transactions.columns()
+
+    # Only write the strings that are still referenced, renumbered densely
+    used_ids = sorted(set(details))
+    new_ids = {string_id: new_id for new_id, string_id in enumerate(used_ids)}
+    details = array("i", map(new_ids.__getitem__, details))
+    encoded = [strings[string_id].encode("utf-8") for string_id in used_ids]
+    offsets = array("Q", [0])
+    for string in encoded:
+        offsets.append(offsets[-1] + len(string))
+
+    with open(filename, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, current_balance, initial_balance, len(dates), len(encoded)))
+        file.write(little_endian(dates))
+        file.write(categories)
+        file.write(bytes(padding(len(categories))))
+        file.write(little_endian(amounts))
+        file.write(little_endian(details))
+        file.write(little_endian(offsets))
+        file.write(b"".join(encoded))
+
+def read_binary_snapshot(filename):
+    """Loads a binary snapshot into (current balance, initial balance, TransactionStore)."""
+    with BinaryLedgerView(filename) as view:
+        dates = view.column("i", view.dates_offset, view.count)
+        categories = bytearray(view.data[view.categories_offset:view.categories_offset + view.count])
+        amounts = view.column("q", view.amounts_offset, view.count)
+        details = view.column("i", view.details_offset, view.count)
+        strings = [view.string(string_id) for string_id in range(view.string_count)]
+        transactions = TransactionStore.from_columns(dates, categories, amounts, details, strings)
+        return view.current_balance, view.initial_balance, transactions
+
+class BinaryLedgerView:
+    """Read-only, memory-mapped view of a binary snapshot.
+
+    Nothing is parsed up front: the operating system pages rows in as they are
+    read, so opening even a very large ledger is instant. Entries are indexed
+    newest first and returned as the same dictionaries TransactionStore hands out.
+    """
+
+    def __init__(self, filename):
+        self._file = open(filename, "rb")
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.current_balance, self.initial_balance, self.count, self.string_count = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{filename} is not a version {VERSION} binary ledger snapshot")
+
+        self.dates_offset = HEADER.size
+        self.categories_offset = self.dates_offset + 4 * self.count
+        self.amounts_offset = self.categories_offset + self.count + padding(self.count)
+        self.details_offset = self.amounts_offset + 8 * self.count
+        self.offsets_offset = self.details_offset + 4 * self.count
+        self.blob_offset = self.offsets_offset + 8 * (self.string_count + 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for position in range(self.count - 1, -1, -1):
+            yield self._row(position)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("transaction index out of range")
+        return self._row(self.count - 1 - index)
+
+    def close(self):
+        self.data.close()
+        self._file.close()
+
+    def column(self, typecode, offset, count):
+        """Copies one fixed-width column out of the mapping into an array."""
+        column = array(typecode)
+        column.frombytes(self.data[offset:offset + column.itemsize * count])
+        if sys.byteorder == "big":
+            column.byteswap()
+        return column
+
+    def string(self, string_id):
+        start, end = struct.unpack_from("<QQ", self.data, self.offsets_offset + 8 * string_id)
+        return self.data[self.blob_offset + start:self.blob_offset + end].decode("utf-8")
+
+    def _row(self, position):
+        return {
+            "date": date.fromordinal(struct.unpack_from("<i", self.data, self.dates_offset + 4 * position)[0]),
+            "category": chr(self.data[self.categories_offset + position]),
+            "amount": struct.unpack_from("<q", self.data, self.amounts_offset + 8 * position)[0],
+            "details": self.string(struct.unpack_from("<i", self.data, self.details_offset + 4 * position)[0]),
+        }
+
+### Helper Functions ###
+def little_endian(column):
+    """Returns the bytes of an array in little-endian order."""
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+def padding(size):
+    """Number of zero bytes that bring size up to a multiple of 8."""
+    return -size % 8
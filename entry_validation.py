@@ -0,0 +1,172 @@
+"""Batch validation of ledger entries, a whole column at a time.
+
+data_entry_validation checks one entry as the user types it. This module
+checks a batch of entries given as columns (dates, types, amounts, details)
+and returns one error code per row: a byte whose bits are the checks the row
+failed, 0 when it is valid. Each check is a C-level pass over its column
+(map, bytes.translate, itertools.accumulate and big-integer bit operations),
+and each distinct date or type string is parsed once, so a million rows take
+a fraction of a second without NumPy.
+"""
+import operator
+from array import array
+from datetime import date
+from itertools import accumulate, compress, repeat
+
+from transaction_store import EXPENSE, INCOME
+
+# Error bits; a row's lowest bit is the error reported for it, in the order data_entry_validation checks
+INVALID_AMOUNT = 1
+INVALID_TYPE = 2
+INVALID_DATE = 4
+FUTURE_DATE = 8
+ZERO_AMOUNT = 16
+MISSING_DETAILS = 32
+INSUFFICIENT_FUNDS = 64
+LINE_BREAK = 128 # A "\r" or "\n" in details would split the entry's ledger line in two
+ERROR_NAMES = {
+    INVALID_AMOUNT: "invalid amount",
+    INVALID_TYPE: "invalid type",
+    INVALID_DATE: "invalid date",
+    FUTURE_DATE: "future date",
+    ZERO_AMOUNT: "zero amount",
+    MISSING_DETAILS: "missing details",
+    INSUFFICIENT_FUNDS: "insufficient funds",
+    LINE_BREAK: "line break in details",
+}
+CATEGORY_CODES = {"I": INCOME, "E": EXPENSE}
+BALANCE_BLOCK = 4096 # Rows whose running balance is summed at once by check_running_balance
+# bytes.translate tables: 0/1 selectors into one error bit, error codes into 1 for the valid rows,
+# category codes into INVALID_TYPE for unknown ones and into signs (255 is -1 as a signed byte)
+ERROR_TABLES = {error: bytes([0, error]) + bytes(254) for error in ERROR_NAMES}
+VALID_MASK = bytes([1]) + bytes(255)
+TYPE_ERRORS = bytes(0 if code in (INCOME, EXPENSE) else INVALID_TYPE for code in range(256))
+SIGN_TABLE = bytes(1 if code == INCOME else 255 if code == EXPENSE else 0 for code in range(256))
+
+### Batch Validation ###
+def validate_batch(dates, categories, amounts, details, current_balance=None, today=None):
+    """Validates a batch of entries given as equally long columns.
+
+    dates holds ISO date strings (or date objects), categories "I"/"E"
+    strings, amounts centavos (None for amounts that could not be parsed)
+    and details strings. With current_balance, the valid rows are also
+    checked for insufficient funds, see check_running_balance.
+
+    Returns (codes, ordinals, categories, amounts): the error code of every
+    row as bytes, plus the date ordinals, b"I"/b"E" categories and signed
+    amounts, ready to become TransactionStore columns once the invalid rows
+    are dropped.
+    """
+    today = (today or date.today()).toordinal()
+    count = len(dates)
+    columns = [] # One column of error bits per failed check
+
+    # Dates and types repeat a lot, so each distinct value is parsed once, the first time the pass meets it;
+    # a check that every distinct value passes needs no pass over the rows at all
+    date_ordinals = ParsedValues(date_ordinal)
+    ordinals = array("i", list(map(date_ordinals.__getitem__, dates))) # Arrays fill far faster from lists than from iterators
+    if not all(date_ordinals.values()):
+        columns.append(bytes(map(operator.not_, ordinals)).translate(ERROR_TABLES[INVALID_DATE]))
+    if max(date_ordinals.values(), default=0) > today:
+        columns.append(bytes(map(today.__lt__, ordinals)).translate(ERROR_TABLES[FUTURE_DATE]))
+
+    kinds = ParsedValues(category_code)
+    categories = bytes(map(kinds.__getitem__, categories))
+    if not all(kinds.values()):
+        columns.append(categories.translate(TYPE_ERRORS))
+
+    if None in amounts:
+        columns.append(bytes(map(operator.is_, amounts, repeat(None))).translate(ERROR_TABLES[INVALID_AMOUNT]))
+        amounts = [1 if amount is None else amount for amount in amounts] # Placeholder, so they are not also zero
+    magnitudes = list(map(abs, amounts))
+    if 0 in magnitudes:
+        columns.append(bytes(map(operator.not_, magnitudes)).translate(ERROR_TABLES[ZERO_AMOUNT]))
+    # Signs as signed bytes (1 or -1), so one multiplication pass signs every amount
+    amounts = array("q", list(map(operator.mul, memoryview(categories.translate(SIGN_TABLE)).cast("b"), magnitudes)))
+
+    distinct_details = set(details)
+    blank = {value for value in distinct_details if not value.strip()}
+    if blank:
+        columns.append(bytes(map(blank.__contains__, details)).translate(ERROR_TABLES[MISSING_DETAILS]))
+    broken = {value for value in distinct_details if "\n" in value or "\r" in value}
+    if broken:
+        columns.append(bytes(map(broken.__contains__, details)).translate(ERROR_TABLES[LINE_BREAK]))
+
+    codes = merge_codes(count, columns)
+    if current_balance is not None:
+        codes = check_running_balance(codes, ordinals, amounts, current_balance)
+    return codes, ordinals, categories, amounts
+
+def check_running_balance(codes, ordinals, amounts, current_balance):
+    """Marks INSUFFICIENT_FUNDS on the valid rows that would take the balance below zero.
+
+    The valid rows are applied to current_balance in date order (rows sharing
+    a date in their given order), and a row that fails is left out of the
+    balance, like a rejected import record. Returns the updated codes.
+    """
+    valid = codes.translate(VALID_MASK)
+    if current_balance + sum(filter((0).__gt__, compress(amounts, valid))) >= 0:
+        return codes # Even every expense at once leaves the balance at or above zero
+
+    order = sorted(compress(range(len(codes)), valid), key=ordinals.__getitem__)
+    ordered = list(map(amounts.__getitem__, order))
+    if min(accumulate(ordered, initial=current_balance)) >= 0:
+        return codes
+
+    codes = bytearray(codes)
+    balance = current_balance
+    for start in range(0, len(order), BALANCE_BLOCK):
+        block = ordered[start:start + BALANCE_BLOCK]
+        running = list(accumulate(block, initial=balance))
+        if min(running) >= 0:
+            balance = running[-1]
+            continue
+        # From the first dip on, which rows fail depends on the ones rejected before them, so walk row by row
+        first = max(bytes(map((0).__gt__, running)).find(1) - 1, 0) # running[k] is the balance before block[k]
+        balance = running[first]
+        for position, amount in zip(order[start + first:start + len(block)], block[first:]):
+            if balance + amount < 0:
+                codes[position] |= INSUFFICIENT_FUNDS
+            else:
+                balance += amount
+    return bytes(codes)
+
+class ParsedValues(dict):
+    """Maps values to parse(value), calling parse only the first time each distinct value is looked up."""
+
+    def __init__(self, parse):
+        super().__init__()
+        self.parse = parse
+
+    def __missing__(self, value):
+        parsed = self[value] = self.parse(value)
+        return parsed
+
+def date_ordinal(value):
+    """Returns the ordinal of an ISO date string or date, or 0 if it is not a valid date."""
+    try:
+        return value.toordinal() if isinstance(value, date) else date.fromisoformat(value.strip()).toordinal()
+    except (AttributeError, TypeError, ValueError):
+        return 0
+
+def category_code(value):
+    """Returns ord("I") or ord("E") for an entry type (any case or padding), or 0 for anything else."""
+    return CATEGORY_CODES.get(value.strip().upper() if isinstance(value, str) else None, 0)
+
+def merge_codes(count, columns):
+    """ORs columns of error bits into one column of error codes, as big integers rather than row by row."""
+    merged = 0 # Valid rows are 0, so the result is count bytes even when nothing failed
+    for column in columns:
+        merged |= int.from_bytes(column, "little")
+    return merged.to_bytes(count, "little")
+
+def first_error(code):
+    """Returns the name of the first check a row failed (its lowest error bit), or None if it is valid."""
+    return ERROR_NAMES[code & -code] if code else None
+
+def error_counts(codes):
+    """Returns {error name: number of rows whose first error it is}."""
+    counts = {}
+    for code in set(codes) - {0}:
+        counts[first_error(code)] = counts.get(first_error(code), 0) + codes.count(code)
+    return counts
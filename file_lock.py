@@ -0,0 +1,113 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_SUFFIX = ".lock"       # Held shared while a ledger is read, exclusively while it is written
+SESSION_SUFFIX = ".session" # Held by the one process allowed to edit a ledger
+WINDOWS_RETRY = 0.05 # Seconds between attempts, as msvcrt.locking cannot wait indefinitely
+
+# (path, thread id) -> [open lock file, depth, exclusive] for the locks each thread holds, so nested calls reuse them
+_held = {}
+_held_guard = threading.Lock()
+
+### File Locking ###
+@contextmanager
+def locked(path, exclusive=True, blocking=True):
+    """Holds an advisory lock on path + LOCK_SUFFIX (shared or exclusive) for the duration of the block.
+
+    The lock is re-entrant within a thread: a nested request for the same or
+    a weaker lock reuses the one already held. Other threads open the lock
+    file again and wait like another process would. Asking for an exclusive
+    lock inside a shared one raises RuntimeError. With blocking=False,
+    BlockingIOError is raised if another process or thread holds a
+    conflicting lock. On Windows every lock is exclusive.
+    """
+    key = (path + LOCK_SUFFIX, threading.get_ident())
+    with _held_guard:
+        held = _held.get(key)
+        if held is not None:
+            if exclusive and not held[2]:
+                raise RuntimeError(f"cannot upgrade the shared lock on '{path}' to an exclusive one")
+            held[1] += 1
+    if held is not None:
+        try:
+            yield
+        finally:
+            release(key)
+        return
+
+    file = acquire(key[0], exclusive, blocking)
+    with _held_guard:
+        _held[key] = [file, 1, exclusive]
+    try:
+        yield
+    finally:
+        release(key)
+
+def acquire(lock_path, exclusive=True, blocking=True):
+    """Opens lock_path and locks it; returns the open file, which holds the lock until it is closed."""
+    file = open(lock_path, "a+b")
+    try:
+        if fcntl is not None:
+            operation = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB)
+            fcntl.flock(file.fileno(), operation)
+        else:
+            file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    if not blocking:
+                        raise BlockingIOError(f"'{lock_path}' is locked by another process")
+                    time.sleep(WINDOWS_RETRY)
+    except BaseException:
+        file.close()
+        raise
+    return file
+
+def release(key):
+    with _held_guard:
+        held = _held[key]
+        held[1] -= 1
+        if held[1] > 0:
+            return
+        del _held[key]
+    file = held[0]
+    if fcntl is None:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    file.close() # Closing the file drops an fcntl lock
+
+def hold_session(path):
+    """Takes the edit session lock of a ledger without waiting; returns the open file that holds it.
+
+    Raises BlockingIOError if another process is editing the ledger. Close the
+    returned file (or exit) to end the session.
+    """
+    return acquire(path + SESSION_SUFFIX, exclusive=True, blocking=False)
+
+### Atomic Writes ###
+def replace_atomically(temporary, target):
+    """Flushes a fully written temporary file to disk and renames it over target.
+
+    Readers see either the old file or the new one, never a partly written one.
+    """
+    with open(temporary, "rb+") as file:
+        os.fsync(file.fileno())
+    os.replace(temporary, target)
+    if sys.platform != "win32":
+        # Make the rename itself durable
+        directory = os.open(os.path.dirname(os.path.abspath(target)), os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
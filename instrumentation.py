@@ -0,0 +1,256 @@
+"""Opt-in instrumentation of the tracker's hot paths: menu commands, ledger I/O and currency formatting.
+
+Turned on by the EXPENSES_TRACKER_METRICS environment variable or the
+--metrics option, naming the file the metrics are written to when the
+program exits: Prometheus text format if it ends in .prom, JSON otherwise.
+EXPENSES_TRACKER_PROFILE or --profile names a directory that gets one
+cProfile dump per menu command run (open them with pstats or snakeviz).
+
+Instrumenting replaces functions in the tracker module's namespace with
+timed wrappers, which every caller picks up because they look the names up
+at call time. When it is off nothing is wrapped, so the hot paths run
+exactly as they do without this module.
+"""
+import atexit
+import cProfile
+import functools
+import json
+import os
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+METRICS_VARIABLE = "EXPENSES_TRACKER_METRICS"
+PROFILE_VARIABLE = "EXPENSES_TRACKER_PROFILE"
+PREFIX = "expenses_tracker_"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10) # Upper bounds in seconds
+# Menu commands timed per call (excluding the time spent waiting at input() prompts)
+COMMANDS = ("add_entry", "delete_entry", "update_entry", "filter_entries", "show_all_entries", "income_expense_ratio",
+            "check_consistency", "search_entries", "undo_edit", "redo_edit", "periodic_reports")
+# name -> (type, label name, help text), in export order
+METRICS = {
+    "command_seconds": ("histogram", "command", "Time spent in a menu command, excluding the wait for input."),
+    "io_seconds": ("histogram", "operation", "Time to load (read and parse) or save (format and write) a ledger, or append to its journal."),
+    "rows_total": ("counter", "operation", "Entries loaded, saved or selected by a filter."),
+    "bytes_total": ("counter", "operation", "Ledger and journal bytes read or written."),
+    "format_currency_calls_total": ("counter", "function", "Calls to format_currency."),
+    "format_currency_seconds_total": ("counter", "function", "Time spent in format_currency."),
+    "input_wait_seconds_total": ("counter", "function", "Time spent waiting for the user at input() prompts."),
+}
+
+### Metrics ###
+class Histogram:
+    """Counts of observations per latency bucket, plus their sum and count."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1) # The last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1 # Buckets are inclusive upper bounds, like Prometheus "le"
+        self.sum += seconds
+        self.count += 1
+
+    def cumulative(self):
+        """Returns [(upper bound label, observations at or below it)], ending with "+Inf"."""
+        totals, total = [], 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), self.counts):
+            total += count
+            totals.append((str(bound), total))
+        return totals
+
+class Metrics:
+    """Histograms and counters of one run, each keyed by metric name and one label value."""
+
+    def __init__(self, path=None, profile_directory=None):
+        self.path = path
+        self.profile_directory = profile_directory
+        self.histograms = {} # (name, label) -> Histogram
+        self.counters = {}   # (name, label) -> number
+        self.profiles = 0    # cProfile dumps written so far
+        self.collectors = [] # Called before exporting, to copy in figures kept elsewhere
+
+    def observe(self, name, label, seconds):
+        histogram = self.histograms.get((name, label))
+        if histogram is None:
+            histogram = self.histograms[(name, label)] = Histogram()
+        histogram.observe(seconds)
+
+    def add(self, name, label, amount):
+        self.counters[(name, label)] = self.counters.get((name, label), 0) + amount
+
+    def as_json(self):
+        """Returns the metrics as {name: {label: value}}, histograms as buckets, sum and count."""
+        self.collect()
+        result = {}
+        for (name, label), histogram in sorted(self.histograms.items()):
+            result.setdefault(name, {})[label] = {"buckets": dict(histogram.cumulative()), "sum": histogram.sum, "count": histogram.count}
+        for (name, label), value in sorted(self.counters.items()):
+            result.setdefault(name, {})[label] = value
+        return result
+
+    def prometheus_text(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        self.collect()
+        lines = []
+        for name, (kind, label_name, help_text) in METRICS.items():
+            series = self.histograms if kind == "histogram" else self.counters
+            labels = sorted(label for metric, label in series if metric == name)
+            if not labels:
+                continue
+            lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            for label in labels:
+                selector = f'{label_name}="{label}"'
+                if kind == "counter":
+                    lines.append(f"{PREFIX}{name}{{{selector}}} {self.counters[(name, label)]}")
+                    continue
+                histogram = self.histograms[(name, label)]
+                for bound, total in histogram.cumulative():
+                    lines.append(f'{PREFIX}{name}_bucket{{{selector},le="{bound}"}} {total}')
+                lines.append(f"{PREFIX}{name}_sum{{{selector}}} {histogram.sum}")
+                lines.append(f"{PREFIX}{name}_count{{{selector}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def collect(self):
+        """Runs the collectors, which copy in figures kept outside these dictionaries."""
+        for collector in self.collectors:
+            collector()
+
+    def export(self, path=None):
+        """Writes the metrics to path (default: the one given at start), replacing the file in one rename."""
+        path = path or self.path
+        if not path:
+            return
+        text = self.prometheus_text() if path.endswith(".prom") else json.dumps(self.as_json(), indent=2) + "\n"
+        temporary = path + ".tmp"
+        with open(temporary, "w") as file:
+            file.write(text)
+        os.replace(temporary, path)
+
+    def profile_path(self, command):
+        self.profiles += 1
+        return os.path.join(self.profile_directory, f"{command}_{datetime.now():%Y-%m-%d_%H-%M-%S}_{self.profiles}.prof")
+
+### Instrumenting ###
+def instrument(tracker, path=None, profile_directory=None):
+    """Wraps the tracker module's hot paths and exports the metrics to path when the program exits.
+
+    Returns the Metrics being collected.
+    """
+    metrics = Metrics(path, profile_directory)
+    if profile_directory:
+        os.makedirs(profile_directory, exist_ok=True)
+    waiting = [0.0] # Seconds spent in input() so far; commands leave it out of their latency
+
+    def timed_input(prompt=""):
+        started = time.perf_counter()
+        try:
+            return input(prompt)
+        finally:
+            seconds = time.perf_counter() - started
+            waiting[0] += seconds
+            metrics.add("input_wait_seconds_total", "input", seconds)
+
+    def timed_command(command):
+        @functools.wraps(command)
+        def wrapper(*arguments, **keywords):
+            waited = waiting[0]
+            profile = cProfile.Profile() if profile_directory else None
+            started = time.perf_counter()
+            try:
+                if profile is not None:
+                    return profile.runcall(command, *arguments, **keywords)
+                return command(*arguments, **keywords)
+            finally:
+                metrics.observe("command_seconds", command.__name__, time.perf_counter() - started - (waiting[0] - waited))
+                if profile is not None:
+                    profile.dump_stats(metrics.profile_path(command.__name__))
+        return wrapper
+
+    def timed_read_ledger(read_ledger):
+        @functools.wraps(read_ledger)
+        def wrapper(filename):
+            started = time.perf_counter()
+            result = read_ledger(filename)
+            metrics.observe("io_seconds", "load", time.perf_counter() - started)
+            metrics.add("rows_total", "load", len(result[2]))
+            metrics.add("bytes_total", "load", file_size(filename) + file_size(tracker.journal_filename(filename)))
+            return result
+        return wrapper
+
+    def timed_save_transactions(save_transactions):
+        @functools.wraps(save_transactions)
+        def wrapper(filename, current_balance, initial_balance, transactions, *arguments, **keywords):
+            before = file_identity(filename)
+            started = time.perf_counter()
+            save_transactions(filename, current_balance, initial_balance, transactions, *arguments, **keywords)
+            metrics.observe("io_seconds", "save", time.perf_counter() - started)
+            if file_identity(filename) != before: # An SQLite ledger saved onto itself writes nothing
+                metrics.add("rows_total", "save", len(transactions))
+                metrics.add("bytes_total", "save", file_size(filename))
+        return wrapper
+
+    def timed_append_journal(append_journal):
+        @functools.wraps(append_journal)
+        def wrapper(filename, *arguments, **keywords):
+            journal = tracker.journal_filename(filename)
+            size = file_size(journal)
+            started = time.perf_counter()
+            append_journal(filename, *arguments, **keywords)
+            metrics.observe("io_seconds", "journal", time.perf_counter() - started)
+            metrics.add("bytes_total", "journal", file_size(journal) - size)
+        return wrapper
+
+    def counted_select_entries(select_entries):
+        @functools.wraps(select_entries)
+        def wrapper(*arguments, **keywords):
+            entries = select_entries(*arguments, **keywords)
+            metrics.add("rows_total", "select", len(entries))
+            return entries
+        return wrapper
+
+    def timed_format_currency(format_currency):
+        totals = [0, 0.0] # Calls and seconds, kept here and copied into the metrics on export, as this runs once per row
+
+        @functools.wraps(format_currency)
+        def wrapper(amount):
+            started = time.perf_counter()
+            text = format_currency(amount)
+            totals[1] += time.perf_counter() - started
+            totals[0] += 1
+            return text
+
+        def collect():
+            metrics.counters[("format_currency_calls_total", "format_currency")] = totals[0]
+            metrics.counters[("format_currency_seconds_total", "format_currency")] = totals[1]
+        metrics.collectors.append(collect)
+        return wrapper
+
+    tracker.input = timed_input # Shadows the builtin for the tracker's prompts only
+    for name in COMMANDS:
+        setattr(tracker, name, timed_command(getattr(tracker, name)))
+    tracker.read_ledger = timed_read_ledger(tracker.read_ledger)
+    tracker.save_transactions = timed_save_transactions(tracker.save_transactions)
+    tracker.append_journal = timed_append_journal(tracker.append_journal)
+    tracker.select_entries = counted_select_entries(tracker.select_entries)
+    tracker.format_currency = timed_format_currency(tracker.format_currency)
+    atexit.register(metrics.export)
+    return metrics
+
+### Helper Functions ###
+def file_size(path):
+    """Returns the size of a file in bytes, or 0 if it does not exist."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def file_identity(path):
+    """Returns (inode, modification time) of a file, which changes whenever a save replaces it, or None."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
@@ -0,0 +1,356 @@
+"""Local HTTP/JSON service that keeps one ledger loaded and answers from memory.
+
+Dashboards ask it for balances, ratios and filtered entries instead of
+re-reading the ledger file for every number. Reads are answered from the warm
+store and kept in a response cache that every write clears. Adds, updates and
+deletes are queued for a single writer task, which applies (and journals)
+them one at a time in arrival order. The server only listens on 127.0.0.1.
+
+Amounts are whole centavos, dates YYYY-MM-DD and indices count from the newest
+entry, as in the Ledger API:
+    GET    /balance                         balance, initial balance and entry count
+    GET    /entries?year=&month=&day=&start=&end=&category=&offset=&limit=
+    GET    /search?q=...&<same filters>     entries whose details match q
+    GET    /ratio                           total income, expenses and their ratio
+    GET    /totals?by=month|year[&year=]    per-period rollups
+    GET    /stats                           request, cache and writer counters
+    POST   /entries                         add {"date", "category", "amount", "details"}
+    PUT    /entries/<index>                 update the given fields of an entry
+    DELETE /entries/<index>
+    POST   /undo, /redo
+    POST   /batch                           {"requests": [{"method", "path", "body"}, ...]} in one round trip
+
+Run from the repository root:  python ledger_server.py ledger.txt --port 8765
+"""
+import argparse
+import asyncio
+import json
+from datetime import date
+from urllib.parse import parse_qsl, urlsplit
+
+import ExpensesTracker as tracker
+from transaction_store import MAX_AMOUNT
+
+HOST = "127.0.0.1" # Loopback only; the service is never reachable from other machines
+DEFAULT_PORT = 8765
+PAGE_LIMIT = 100 # Entries per /entries or /search response unless limit asks for another number
+MAX_BODY = 1 << 20 # Largest request body accepted, in bytes
+CACHE_LIMIT = 10000 # Cached read responses; the cache starts over when it reaches this many
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+MUTATIONS = ("POST", "PUT", "DELETE")
+
+class RequestError(Exception):
+    """A request the server refuses; sent to the client as {"error": message} with the given HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+### Ledger Server ###
+class LedgerServer:
+    """Answers JSON requests about one open Ledger."""
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.cache = {}    # (path, query) -> (status, encoded body) of the reads answered since the last write
+        self.writes = None # Queue of (method, path, body, future) for the writer task, made on the running loop
+        self.stats = {"requests": 0, "cache_hits": 0, "writes": 0, "write_batches": 0}
+
+    async def serve(self, port=DEFAULT_PORT):
+        """Accepts connections until cancelled."""
+        self.writes = asyncio.Queue()
+        writer = asyncio.create_task(self._writer())
+        server = await asyncio.start_server(self._connection, HOST, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            writer.cancel()
+
+    async def respond(self, method, target, body=None):
+        """Answers one request (body is the decoded JSON, if any) and returns (status, encoded JSON body)."""
+        self.stats["requests"] += 1
+        url = urlsplit(target)
+        try:
+            if method == "GET":
+                key = (url.path, url.query)
+                response = self.cache.get(key)
+                if response is not None:
+                    self.stats["cache_hits"] += 1
+                    return response
+                response = (200, encode(self.read(url.path, dict(parse_qsl(url.query)))))
+                if url.path == "/stats":
+                    return response # Changes with every request
+                if len(self.cache) >= CACHE_LIMIT:
+                    self.cache.clear()
+                self.cache[key] = response
+                return response
+
+            if method not in MUTATIONS:
+                raise RequestError(405, f"method {method} is not supported")
+            if url.path == "/batch" and method == "POST":
+                return 200, await self.batch(body)
+
+            # Edits wait their turn with the writer
+            future = asyncio.get_running_loop().create_future()
+            self.writes.put_nowait((method, url.path, body, future))
+            return (201 if method == "POST" and url.path == "/entries" else 200), encode(await future)
+        except RequestError as e:
+            return e.status, encode({"error": str(e)})
+
+    async def batch(self, body):
+        """Answers a list of requests in order; consecutive edits reach the writer together."""
+        requests = body.get("requests") if isinstance(body, dict) else None
+        if not isinstance(requests, list):
+            raise RequestError(400, 'expected {"requests": [...]}')
+
+        responses = []
+        edits = [] # Consecutive edits not sent yet
+        for request in requests + [None]:
+            if request is not None and not (isinstance(request, dict) and isinstance(request.get("method"), str)
+                                            and isinstance(request.get("path"), str) and request["path"] != "/batch"):
+                request = {"method": "", "path": ""} # Answered with an error below, in its place
+            if request is not None and request["method"] in MUTATIONS:
+                edits.append(request)
+                continue
+            if edits:
+                responses += await asyncio.gather(*(self.respond(edit["method"], edit["path"], edit.get("body")) for edit in edits))
+                edits = []
+            if request is not None and request["method"]:
+                responses.append(await self.respond(request["method"], request["path"]))
+            elif request is not None:
+                responses.append((400, encode({"error": "each request needs a method and a path (and cannot be a batch)"})))
+        return b'{"responses":[' + b",".join(b'{"status":%d,"body":%s}' % response for response in responses) + b"]}"
+
+    def read(self, path, query):
+        """Answers a GET request from the loaded ledger."""
+        ledger = self.ledger
+        if path == "/balance":
+            return {"balance": ledger.balance, "initial_balance": ledger.initial_balance, "entries": len(ledger.transactions)}
+        if path == "/ratio":
+            total_income, total_expenses = tracker.income_expense_totals(ledger.transactions)
+            return {"income": total_income, "expenses": total_expenses, "ratio": ledger.ratio()}
+        if path == "/totals":
+            return totals_json(ledger, query)
+        if path == "/entries":
+            return entries_json(ledger, query)
+        if path == "/search":
+            if not query.get("q", "").strip():
+                raise RequestError(400, "q is required")
+            indices = ledger.search(query["q"], **filter_criteria(query))
+            offset, limit = page_bounds(query)
+            page = indices[offset:offset + limit]
+            return {"count": len(indices), "entries": [entry_json(ledger.transactions[index], index) for index in page]}
+        if path == "/stats":
+            return dict(self.stats, cached=len(self.cache))
+        raise RequestError(404, f"no such resource: {path}")
+
+    def write(self, method, path, body):
+        """Applies one edit (only ever called by the writer task)."""
+        ledger = self.ledger
+        if path == "/entries" and method == "POST":
+            index = ledger.add(parse_entry(body, ledger.balance))
+            return {"index": index, "balance": ledger.balance}
+        if path in ("/undo", "/redo") and method == "POST":
+            try:
+                step = ledger.undo() if path == "/undo" else ledger.redo()
+            except ValueError as e:
+                raise RequestError(409, str(e))
+            return {"step": None if step is None else tracker.STEP_NAMES[step[0]], "balance": ledger.balance}
+
+        parts = path.split("/")
+        if len(parts) != 3 or parts[1] != "entries":
+            raise RequestError(404, f"no such resource: {path}")
+        if not parts[2].isdigit() or int(parts[2]) >= len(ledger.transactions):
+            raise RequestError(404, f"no entry {parts[2]}")
+        index = int(parts[2])
+        if method == "DELETE":
+            deleted_entry = ledger.delete(index)
+            return {"deleted": entry_json(deleted_entry), "balance": ledger.balance}
+        if method == "PUT":
+            current = ledger.transactions[index]
+            fields = entry_json(current)
+            fields.update(body if isinstance(body, dict) else {})
+            # The entry's own amount is not spent yet, so it is checked against the balance without it
+            index = ledger.update(index, parse_entry(fields, ledger.balance - current["amount"]))
+            return {"index": index, "balance": ledger.balance}
+        raise RequestError(405, f"method {method} is not supported on {path}")
+
+    async def _writer(self):
+        # The only task that edits the ledger: applies every queued edit in order, then drops the cached reads
+        while True:
+            batch = [await self.writes.get()]
+            while not self.writes.empty():
+                batch.append(self.writes.get_nowait())
+
+            for method, path, body, future in batch:
+                if future.done():
+                    continue # The client went away
+                try:
+                    future.set_result(self.write(method, path, body))
+                except RequestError as e:
+                    future.set_exception(e)
+                except PermissionError as e:
+                    future.set_exception(RequestError(403, str(e)))
+                except (ValueError, IndexError) as e:
+                    future.set_exception(RequestError(400, str(e)))
+                except Exception as e: # Answer it and keep writing: every later edit waits on this task
+                    future.set_exception(RequestError(500, f"edit failed: {e}"))
+            self.cache.clear() # Before any reader runs again, so nobody sees a read from before the edits
+            self.stats["writes"] += len(batch)
+            self.stats["write_batches"] += 1
+
+    async def _connection(self, reader, writer):
+        # One client connection; requests are answered in order and the connection kept open (HTTP/1.1 keep-alive)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode("latin-1").split()
+                length = int(headers.get("content-length", "0")) if headers.get("content-length", "0").isdigit() else -1
+                keep_alive = len(parts) == 3 and parts[2] == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if len(parts) != 3 or length < 0:
+                    status, body = 400, encode({"error": "malformed request"})
+                    keep_alive = False
+                elif length > MAX_BODY:
+                    status, body = 413, encode({"error": f"request bodies are limited to {MAX_BODY} bytes"})
+                    keep_alive = False
+                else:
+                    data = await reader.readexactly(length) if length else b""
+                    try:
+                        decoded = json.loads(data) if data else None
+                    except ValueError:
+                        status, body = 400, encode({"error": "the request body is not valid JSON"})
+                    else:
+                        status, body = await self.respond(parts[0], parts[1], decoded)
+
+                writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass # The client hung up mid-request, or the server is stopping
+        finally:
+            writer.close()
+
+### Helper Functions ###
+def encode(result):
+    return json.dumps(result, separators=(",", ":")).encode()
+
+def entry_json(entry, index=None):
+    """Returns an entry with its date as YYYY-MM-DD (and its index, if given)."""
+    fields = {"date": entry["date"].isoformat(), "category": entry["category"], "amount": entry["amount"], "details": entry["details"]}
+    if index is not None:
+        fields["index"] = index
+    return fields
+
+def parse_entry(fields, current_balance):
+    """Turns {"date", "category", "amount", "details"} into a transaction, applying data_entry_validation's rules."""
+    if not isinstance(fields, dict) or any(field not in fields for field in ("date", "category", "amount", "details")):
+        raise RequestError(400, "an entry needs date, category, amount and details")
+    entry_type = str(fields["category"]).upper()
+    amount = fields["amount"]
+    details = str(fields["details"])
+    if not isinstance(fields["date"], str) or not fields["date"]:
+        raise RequestError(400, "date must be a YYYY-MM-DD string")
+    if entry_type not in ("I", "E"):
+        raise RequestError(400, "category must be I or E")
+    if not isinstance(amount, int) or isinstance(amount, bool) or amount == 0:
+        raise RequestError(400, "amount must be a non-zero whole number of centavos")
+    if abs(amount) > MAX_AMOUNT:
+        raise RequestError(400, f"amount must be at most {MAX_AMOUNT} centavos")
+    if not details.strip():
+        raise RequestError(400, "details must not be empty")
+
+    # data_entry_validation makes expenses negative; incomes are made positive the same way
+    is_valid, error_message, amount = tracker.data_entry_validation(entry_type, fields["date"], abs(amount), details, current_balance)
+    if not is_valid:
+        raise RequestError(400, error_message.removeprefix("Error: "))
+    return {"date": date.fromisoformat(fields["date"]), "category": entry_type, "amount": amount, "details": details}
+
+def filter_criteria(query):
+    """Turns filter_entries-style query parameters into Ledger.select keyword arguments."""
+    criteria = {}
+    try:
+        for name in ("year", "month", "day"):
+            if query.get(name):
+                criteria[name] = int(query[name])
+        for name in ("start", "end"):
+            if query.get(name):
+                criteria[name] = date.fromisoformat(query[name])
+    except ValueError:
+        raise RequestError(400, "year, month and day must be numbers and start and end YYYY-MM-DD dates")
+    if query.get("category"):
+        criteria["category"] = query["category"].upper()
+        if criteria["category"] not in ("I", "E"):
+            raise RequestError(400, "category must be I or E")
+    return criteria
+
+def page_bounds(query):
+    """Returns (offset, limit) from the query parameters."""
+    try:
+        offset = int(query.get("offset", 0))
+        limit = int(query.get("limit", PAGE_LIMIT))
+    except ValueError:
+        raise RequestError(400, "offset and limit must be numbers")
+    return max(offset, 0), max(limit, 0)
+
+def entries_json(ledger, query):
+    """One page of the entries matching the filters, with the total number of matches."""
+    criteria = filter_criteria(query)
+    offset, limit = page_bounds(query)
+    transactions = ledger.transactions
+    if not criteria:
+        # No filter: read just the requested page rather than the whole ledger
+        stop = min(offset + limit, len(transactions))
+        return {"count": len(transactions), "entries": [entry_json(transactions[index], index) for index in range(offset, stop)]}
+    entries = ledger.select(**criteria)
+    return {"count": len(entries), "entries": [entry_json(entry) for entry in entries[offset:offset + limit]]}
+
+def totals_json(ledger, query):
+    """Per-month or per-year rollups (as periodic_reports shows them), optionally for one year."""
+    by = query.get("by", "year")
+    if by not in ("month", "year"):
+        raise RequestError(400, "by must be month or year")
+    year = filter_criteria({"year": query.get("year")}).get("year")
+    rollups = ledger.month_totals() if by == "month" else ledger.year_totals()
+    return [
+        dict(totals, period=f"{key[0]}-{key[1]:02d}" if by == "month" else str(key))
+        for key, totals in rollups
+        if year is None or (key[0] if by == "month" else key) == year
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a ledger as JSON on localhost, keeping it loaded between requests.")
+    parser.add_argument("ledger", help="ledger file (text, binary or SQLite)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port on {HOST} (default: {DEFAULT_PORT})")
+    parser.add_argument("--read-only", action="store_true", help="answer queries only, without taking the ledger's edit session")
+    options = parser.parse_args()
+
+    try:
+        ledger = tracker.Ledger.open(options.ledger, edit=not options.read_only)
+    except FileNotFoundError:
+        parser.error(f"file '{options.ledger}' not found")
+    except BlockingIOError:
+        parser.error(f"ledger '{options.ledger}' is open in another session (use --read-only to serve queries)")
+
+    with ledger:
+        print(f"Serving '{options.ledger}' ({len(ledger.transactions):,} entries) on http://{HOST}:{options.port}/", flush=True)
+        try:
+            asyncio.run(LedgerServer(ledger).serve(options.port))
+        except KeyboardInterrupt:
+            print("Stopped.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+import json
+import os
+import shutil
+import time
+from array import array
+from bisect import bisect_left
+from datetime import date
+
+from binary_snapshot import BINARY_SUFFIX, read_binary_snapshot, write_binary_snapshot
+from file_lock import locked, replace_atomically
+from transaction_store import ZERO_ROLLUP, TransactionStore, add_to_rollup, check_entry, new_rollup
+
+# Layout: a small JSON manifest (balances, plus the entry count and per-month rollups of every
+# partition) and one binary snapshot per year or month in <manifest>.partitions/. Partition files
+# get a new name each time they are written, so replacing the manifest is the single atomic step
+# of a save; files it no longer lists are deleted afterwards.
+MANIFEST_MAGIC = b'{"format":"partitioned-ledger"'
+MANIFEST_VERSION = 1
+PARTITIONED_SUFFIX = ".manifest"
+PARTITIONS_SUFFIX = ".partitions"
+KEY_LENGTHS = {"year": 4, "month": 7} # Partition keys are the first characters of the ISO date: "2024" or "2024-07"
+
+### Partitioned Ledger Functions ###
+def is_partitioned_ledger(filename):
+    """Returns True if the file is the manifest of a partitioned ledger."""
+    try:
+        with open(filename, "rb") as file:
+            return file.read(len(MANIFEST_MAGIC)) == MANIFEST_MAGIC
+    except OSError:
+        return False
+
+def partition_directory(filename):
+    """Returns the directory that holds the partition files of a manifest."""
+    return filename + PARTITIONS_SUFFIX
+
+def read_manifest(filename):
+    with open(filename, "r") as file:
+        return json.load(file)
+
+def write_partitioned_ledger(filename, current_balance, initial_balance, transactions, granularity="year"):
+    """Writes a TransactionStore (or any store with columns()) as a new partitioned ledger, partitions first."""
+    shutil.rmtree(partition_directory(filename), ignore_errors=True) # Left behind by an interrupted save
+    store = PartitionedStore(filename, granularity)
+    store.merge(transactions)
+    store.save(current_balance, initial_balance)
+
+def read_partitioned_ledger(filename):
+    """Opens a partitioned ledger as (current balance, initial balance, PartitionedStore); only the manifest is read."""
+    manifest = read_manifest(filename)
+    transactions = PartitionedStore(filename, manifest["granularity"], manifest["partitions"])
+    return manifest["current_balance"], manifest["initial_balance"], transactions
+
+def replace_partitioned_ledger(temporary, filename):
+    """Moves a partitioned ledger written under a temporary name over filename, manifest last."""
+    source, target = partition_directory(temporary), partition_directory(filename)
+    os.makedirs(target, exist_ok=True)
+    names = [partition["file"] for partition in read_manifest(temporary)["partitions"]]
+    for name in names:
+        replace_atomically(os.path.join(source, name), os.path.join(target, name))
+    try:
+        os.rmdir(source)
+    except OSError:
+        pass
+    replace_atomically(temporary, filename)
+    remove_unlisted_partitions(filename, names)
+
+def remove_unlisted_partitions(filename, names):
+    """Deletes the files of a partition directory that the manifest does not list (superseded or left by a crash)."""
+    directory = partition_directory(filename)
+    for name in set(os.listdir(directory)) - set(names):
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+### Partitioned Store ###
+class PartitionedStore:
+    """A TransactionStore look-alike split into one TransactionStore per year (or month).
+
+    Entries are indexed newest first across all partitions. A partition is read
+    from its binary snapshot the first time an edit, a page or a filter needs
+    it; totals, balances and the month rollups come from the manifest, so the
+    ratio report and a year's filter never open the partitions they do not
+    cover. save() rewrites only the partitions that changed, then the manifest.
+    """
+
+    def __init__(self, filename, granularity="year", partitions=()):
+        self.filename = filename       # The manifest
+        self.granularity = granularity
+        self._files = {}               # partition key -> file name in the partition directory, for saved partitions
+        self._counts = {}              # partition key -> number of entries
+        self._months = {}              # (year, month) -> [income, expenses, income count, expense count]
+        self._loaded = {}              # partition key -> TransactionStore, for the partitions read or created so far
+        self._dirty = set()            # partition keys changed since the last save
+        self._bucket_versions = {}     # (year, month) or year -> version of the last change to that rollup
+        self.version = 0               # bumped by every change, so callers can tell when cached views are stale
+        for partition in partitions:
+            self._files[partition["key"]] = partition["file"]
+            self._counts[partition["key"]] = partition["entries"]
+            for month, rollup in partition["months"].items():
+                self._months[(int(month[:4]), int(month[5:7]))] = list(rollup)
+
+    def __len__(self):
+        return sum(self._counts.values())
+
+    def __bool__(self):
+        return any(self._counts.values())
+
+    def __iter__(self):
+        # Cold partitions are read one at a time and not kept
+        for key in self._keys():
+            yield from self._peek(key)
+
+    def __getitem__(self, index):
+        key, local_index = self._locate(index)
+        return self._partition(key)[local_index]
+
+    def add(self, transaction):
+        """Adds a transaction in date order (after existing entries on the same date) and returns its index."""
+        key = self._key(transaction["date"])
+        local_index = self._partition(key).add(transaction)
+        self._changed(key, transaction, 1)
+        return self._offsets()[key] + local_index
+
+    def insert(self, index, transaction):
+        """Puts a transaction back at exactly index (e.g. to undo a delete); raises ValueError if that breaks the date order."""
+        if not 0 <= index <= len(self):
+            raise IndexError("transaction index out of range")
+        key = self._key(transaction["date"])
+        offset = sum(count for other, count in self._counts.items() if other > key)
+        if not offset <= index <= offset + self._counts.get(key, 0):
+            raise ValueError(f"a transaction dated {transaction['date']} cannot go at index {index}")
+        self._partition(key).insert(index - offset, transaction)
+        self._changed(key, transaction, 1)
+        return index
+
+    def delete(self, index):
+        """Removes the transaction at index and returns it."""
+        key, local_index = self._locate(index)
+        deleted_entry = self._partition(key).delete(local_index)
+        self._changed(key, deleted_entry, -1)
+        return deleted_entry
+
+    def update(self, index, transaction):
+        """Replaces the transaction at index and returns its new index; only a changed date moves the entry."""
+        key, local_index = self._locate(index)
+        check_entry(transaction) # Before the delete or rollup change below, so a bad entry changes nothing
+        if self._key(transaction["date"]) != key:
+            self.delete(index)
+            return self.add(transaction) # Moves to another partition
+        partition = self._partition(key)
+        self._changed(key, partition[local_index], -1)
+        local_index = partition.update(local_index, transaction)
+        self._changed(key, transaction, 1)
+        return self._offsets()[key] + local_index
+
+    def merge(self, other):
+        """Adds every entry of another store, exactly as calling add() for each in turn would, one partition at a time."""
+        dates, categories, amounts, details, strings = other.columns()
+        position = 0
+        while position < len(dates):
+            key = self._key(date.fromordinal(dates[position]))
+            stop = bisect_left(dates, key_end(key), position)
+            # Each partition gets only the strings its entries use, renumbered densely
+            part_details = details[position:stop]
+            used_ids = sorted(set(part_details))
+            new_ids = {string_id: new_id for new_id, string_id in enumerate(used_ids)}
+            part = TransactionStore.from_columns(dates[position:stop], categories[position:stop], amounts[position:stop],
+                                                 array("i", map(new_ids.__getitem__, part_details)), [strings[string_id] for string_id in used_ids])
+            if self._counts.get(key):
+                self._partition(key).merge(part)
+            else:
+                self._loaded[key] = part
+            self._refresh(key)
+            position = stop
+
+    def select(self, start=None, end=None, year=None, month=None, day=None, category=None):
+        """Returns the entries that match every given criterion, newest first (see TransactionStore.select).
+
+        Only the partitions whose manifest rollups show entries in a matching
+        month (of the requested category) are opened.
+        """
+        entries = []
+        for key in self._keys(start, end, year, month, category):
+            entries.extend(self._partition(key).select(start=start, end=end, year=year, month=month, day=day, category=category))
+        return entries
+
+    def search(self, text, start=None, end=None, year=None, month=None, day=None, category=None):
+        """Returns the indices (newest first) of the entries whose details match text (see TransactionStore.search)."""
+        offsets = self._offsets()
+        indices = []
+        for key in self._keys(start, end, year, month, category):
+            local_indices = self._partition(key).search(text, start=start, end=end, year=year, month=month, day=day, category=category)
+            indices.extend(offsets[key] + local_index for local_index in local_indices)
+        return indices
+
+    def columns(self):
+        """Returns oldest-first columns (dates, categories, amounts, details ids) and their string table, like TransactionStore."""
+        dates, categories, amounts, details = array("i"), bytearray(), array("q"), array("i")
+        string_ids = {}
+        for key in reversed(self._keys()):
+            part_dates, part_categories, part_amounts, part_details, part_strings = self._peek(key).columns()
+            new_ids = [string_ids.setdefault(string, len(string_ids)) for string in part_strings]
+            dates += part_dates
+            categories += part_categories
+            amounts += part_amounts
+            details += array("i", map(new_ids.__getitem__, part_details))
+        return dates, categories, amounts, details, list(string_ids)
+
+    def totals(self, year=None, month=None):
+        """Returns income, expenses (as a negative sum) in centavos and entry counts for the whole ledger, a year or a month."""
+        if month is not None:
+            rollup = self._months.get((year, month), ZERO_ROLLUP)
+        else:
+            rollup = new_rollup()
+            for (bucket_year, _), month_rollup in self._months.items():
+                if year is None or bucket_year == year:
+                    for slot in range(4):
+                        rollup[slot] += month_rollup[slot]
+        income, expenses, income_count, expense_count = rollup
+        return {"income": income, "expenses": expenses, "income_count": income_count, "expense_count": expense_count}
+
+    def net_total(self):
+        """Returns the sum of all income and expense amounts in centavos."""
+        return sum(rollup[0] + rollup[1] for rollup in self._months.values())
+
+    def month_totals(self):
+        """Returns the (year, month) rollups in date order."""
+        return [(key, self.totals(*key)) for key in sorted(self._months)]
+
+    def year_totals(self):
+        """Returns the yearly rollups in date order."""
+        return [(year, self.totals(year)) for year in sorted({year for year, _ in self._months})]
+
+    def bucket_version(self, year, month=None):
+        """Returns the store version that last changed a month's (or a year's) rollup."""
+        return self._bucket_versions.get(year if month is None else (year, month), 0)
+
+    def verify(self):
+        """Checks every partition's own aggregates, then that its entries add up to what the manifest records."""
+        problems = []
+        for key in reversed(self._keys()):
+            partition = self._peek(key)
+            problems += [f"partition {key}: {problem}" for problem in partition.verify()]
+            if len(partition) != self._counts[key]:
+                problems.append(f"partition {key} entry count {self._counts[key]} should be {len(partition)}")
+            recomputed = {month: [totals["income"], totals["expenses"], totals["income_count"], totals["expense_count"]]
+                          for month, totals in partition.month_totals()}
+            recorded = {month: rollup for month, rollup in self._months.items() if self._month_key(*month) == key}
+            for month in sorted(set(recomputed) | set(recorded)):
+                if recomputed.get(month, ZERO_ROLLUP) != recorded.get(month, ZERO_ROLLUP):
+                    problems.append(f"{month[0]}-{month[1]:02d} manifest totals {recorded.get(month, ZERO_ROLLUP)} "
+                                    f"should be {recomputed.get(month, ZERO_ROLLUP)}")
+        return problems
+
+    def loaded_partitions(self):
+        """Returns the keys of the partitions held in memory, oldest first."""
+        return sorted(self._loaded)
+
+    def save(self, current_balance, initial_balance):
+        """Writes the partitions changed since the last save under new names, then replaces the manifest."""
+        directory = partition_directory(self.filename)
+        os.makedirs(directory, exist_ok=True)
+        stamp = f"{time.time_ns():x}"
+        for key in sorted(self._dirty):
+            self._files.pop(key, None)
+            if not self._counts.get(key):
+                self._counts.pop(key, None) # Every entry was deleted: the partition goes away
+                self._loaded.pop(key, None)
+                continue
+            name = f"{key}-{stamp}{BINARY_SUFFIX}"
+            temporary = os.path.join(directory, name + ".tmp")
+            write_binary_snapshot(temporary, 0, 0, self._loaded[key])
+            replace_atomically(temporary, os.path.join(directory, name))
+            self._files[key] = name
+        self._dirty.clear()
+
+        partitions = []
+        for key in sorted(key for key, count in self._counts.items() if count): # Not a period whose first add failed
+            months = {f"{year:04d}-{month:02d}": rollup for (year, month), rollup in sorted(self._months.items())
+                      if self._month_key(year, month) == key}
+            partitions.append({"key": key, "file": self._files[key], "entries": self._counts[key], "months": months})
+        manifest = {"format": "partitioned-ledger", "version": MANIFEST_VERSION, "granularity": self.granularity,
+                    "current_balance": current_balance, "initial_balance": initial_balance, "partitions": partitions}
+        temporary = self.filename + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(manifest, file, separators=(",", ":")) # Keeps "format" first, where is_partitioned_ledger looks
+            file.write("\n")
+        replace_atomically(temporary, self.filename)
+        remove_unlisted_partitions(self.filename, self._files.values())
+
+    ### Internal Helpers ###
+    def _key(self, entry_date):
+        return entry_date.isoformat()[:KEY_LENGTHS[self.granularity]]
+
+    def _month_key(self, year, month):
+        return f"{year:04d}-{month:02d}"[:KEY_LENGTHS[self.granularity]]
+
+    def _keys(self, start=None, end=None, year=None, month=None, category=None):
+        # Newest-first keys of the partitions that can hold matching entries, judged from the month rollups alone
+        if start is None and end is None and year is None and month is None and category is None:
+            return sorted((key for key, count in self._counts.items() if count), reverse=True)
+        first = (start.year, start.month) if start is not None else None
+        last = (end.year, end.month) if end is not None else None
+        keys = set()
+        for (bucket_year, bucket_month), rollup in self._months.items():
+            if ((first is not None and (bucket_year, bucket_month) < first) or (last is not None and (bucket_year, bucket_month) > last)
+                    or (year is not None and bucket_year != year) or (month is not None and bucket_month != month)
+                    or (category == "I" and not rollup[2]) or (category == "E" and not rollup[3])):
+                continue
+            keys.add(self._month_key(bucket_year, bucket_month))
+        return sorted(keys, reverse=True)
+
+    def _offsets(self):
+        # Partition key -> newest-first index of the partition's newest entry
+        offsets = {}
+        offset = 0
+        for key in sorted(self._counts, reverse=True):
+            offsets[key] = offset
+            offset += self._counts[key]
+        return offsets
+
+    def _locate(self, index):
+        # Converts a newest-first index into (partition key, index within the partition), skipping whole partitions by their counts
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("transaction index out of range")
+        for key in sorted(self._counts, reverse=True):
+            if index < self._counts[key]:
+                return key, index
+            index -= self._counts[key]
+
+    def _partition(self, key):
+        # The partition's store, read from its file on first use (a new, empty one for a period with no entries yet)
+        partition = self._loaded.get(key)
+        if partition is None:
+            partition = self._loaded[key] = self._read(key) if key in self._files else TransactionStore()
+        self._counts.setdefault(key, 0) # Also for a loaded partition emptied and dropped from the counts by save()
+        return partition
+
+    def _peek(self, key):
+        # The partition's store without keeping it in memory if it was not loaded already
+        partition = self._loaded.get(key)
+        return partition if partition is not None else self._read(key)
+
+    def _read(self, key):
+        path = os.path.join(partition_directory(self.filename), self._files[key])
+        with locked(self.filename, exclusive=False):
+            try:
+                return read_binary_snapshot(path)[2]
+            except FileNotFoundError:
+                raise FileNotFoundError(f"partition {key} of '{self.filename}' was replaced by another session's save; open the ledger again") from None
+
+    def _changed(self, key, entry, change):
+        # Keeps the partition's entry count and month rollup current for one added (1) or removed (-1) entry
+        entry_date = entry["date"]
+        month = (entry_date.year, entry_date.month)
+        rollup = self._months.setdefault(month, new_rollup())
+        add_to_rollup(rollup, ord(entry["category"]), entry["amount"], change)
+        if rollup[2] == 0 and rollup[3] == 0:
+            del self._months[month]
+        self._counts[key] += change
+        self._dirty.add(key)
+        self.version += 1
+        self._bucket_versions[month] = self._bucket_versions[entry_date.year] = self.version
+
+    def _refresh(self, key):
+        # Takes a partition's count and month rollups from the partition itself, after a merge
+        partition = self._loaded[key]
+        self.version += 1
+        for month in [month for month in self._months if self._month_key(*month) == key]:
+            del self._months[month]
+        for month, totals in partition.month_totals():
+            self._months[month] = [totals["income"], totals["expenses"], totals["income_count"], totals["expense_count"]]
+            self._bucket_versions[month] = self._bucket_versions[month[0]] = self.version
+        self._counts[key] = len(partition)
+        self._dirty.add(key)
+
+### Helper Functions ###
+def key_end(key):
+    """Returns the ordinal of the first day after the year ("2024") or month ("2024-07") a partition key names."""
+    year, _, month = key.partition("-")
+    if not month or month == "12":
+        return date(int(year) + 1, 1, 1).toordinal()
+    return date(int(year), int(month) + 1, 1).toordinal()
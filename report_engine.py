@@ -0,0 +1,186 @@
+"""Parallel income/expense report engine for very large ledger files.
+
+The ledger is split into partitions that each cover a contiguous date range:
+line-aligned byte ranges of a text ledger (which is sorted by date) or row
+ranges of a binary snapshot. Worker processes compute per-month rollups
+[income, expenses, income count, expense count] for their partition and the
+partial results are summed. Every figure is a whole number of centavos or
+entries, so the merged result is identical to the serial one regardless of
+how the ledger was split.
+
+Run from the repository root:  python report_engine.py ledger.txt --by year --workers 8
+"""
+import argparse
+import locale
+import os
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import compress
+
+import ExpensesTracker as tracker
+from binary_snapshot import BinaryLedgerView, is_binary_snapshot
+from file_lock import locked
+from partitioned_store import is_partitioned_ledger
+from sqlite_store import is_sqlite_ledger
+from transaction_store import EXPENSE_MASK, INCOME_MASK, new_rollup
+
+PARTITIONS_PER_WORKER = 4 # Smaller partitions even out workers that finish early
+
+### Report Engine ###
+def month_rollups(filename, workers=None):
+    """Returns {(year, month): [income, expenses, income count, expense count]} for a ledger file.
+
+    workers=1 computes everything in this process (the serial path); otherwise
+    the partitions are spread over a process pool of that many workers (default:
+    one per CPU). A ledger with pending journal records is loaded as usual,
+    since its edits can only be applied to the whole snapshot, and an SQLite
+    ledger already keeps these rollups in its months table (a partitioned one
+    in its manifest).
+    """
+    if os.path.isfile(tracker.journal_filename(filename)) or is_sqlite_ledger(filename) or is_partitioned_ledger(filename):
+        _, _, transactions = tracker.load_transactions(filename)
+        return {key: [totals["income"], totals["expenses"], totals["income_count"], totals["expense_count"]]
+                for key, totals in transactions.month_totals()}
+
+    workers = workers or os.cpu_count() or 1
+    with locked(filename, exclusive=False):
+        if workers == 1:
+            partitions = ledger_partitions(filename, 1)
+            return merge_rollups([partition_rollups(*partition) for partition in partitions])
+
+        partitions = ledger_partitions(filename, workers * PARTITIONS_PER_WORKER)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return merge_rollups(executor.map(partition_rollups, *zip(*partitions)))
+
+def ledger_partitions(filename, count):
+    """Splits a ledger file into at most count (filename, binary, start, end) partitions of contiguous dates."""
+    if is_binary_snapshot(filename):
+        with BinaryLedgerView(filename) as view:
+            rows = len(view)
+        bounds = sorted({rows * part // count for part in range(count + 1)})
+        return [(filename, True, start, end) for start, end in zip(bounds, bounds[1:])]
+
+    with open(filename, "rb") as file:
+        file.readline() # Current Balance
+        file.readline() # Initial Balance
+        first = file.tell()
+        size = os.fstat(file.fileno()).st_size
+        bounds = [first]
+        for part in range(1, count):
+            file.seek(max(first + (size - first) * part // count, bounds[-1]))
+            if file.tell() > first:
+                file.readline() # Move the boundary to the start of the next line
+            if file.tell() > bounds[-1]:
+                bounds.append(file.tell())
+        if size > bounds[-1] or len(bounds) == 1:
+            bounds.append(size)
+    return [(filename, False, start, end) for start, end in zip(bounds, bounds[1:])]
+
+def partition_rollups(filename, binary, start, end):
+    """Computes the per-month rollups of one partition (runs in a pool worker)."""
+    if binary:
+        return binary_rollups(filename, start, end)
+    return text_rollups(filename, start, end)
+
+def text_rollups(filename, start, end):
+    """Rollups of the ledger lines between two byte offsets of a text ledger."""
+    with open(filename, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+
+    rollups = {}
+    months = {} # Date string -> (year, month); a ledger has far fewer days than entries
+    for line in data.decode(locale.getpreferredencoding(False)).splitlines():
+        # Same rules as parse_transaction: lines with fewer than three fields are not entries
+        parts = line.strip().split(" ", 3)
+        if len(parts) < 3:
+            continue
+        key = months.get(parts[0])
+        if key is None:
+            entry_date = date.fromisoformat(parts[0])
+            key = months[parts[0]] = (entry_date.year, entry_date.month)
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollup = rollups[key] = new_rollup()
+        if parts[1] == "I":
+            rollup[0] += tracker.parse_amount(parts[2])
+            rollup[2] += 1
+        elif parts[1] == "E":
+            rollup[1] += tracker.parse_amount(parts[2])
+            rollup[3] += 1
+    return rollups
+
+def binary_rollups(filename, start, end):
+    """Rollups of rows [start, end) (oldest first) of a binary snapshot, summed one month at a time."""
+    with BinaryLedgerView(filename) as view:
+        dates = view.column("i", view.dates_offset + 4 * start, end - start)
+        categories = view.data[view.categories_offset + start:view.categories_offset + end]
+        amounts = view.column("q", view.amounts_offset + 8 * start, end - start)
+
+    rollups = {}
+    lo = 0
+    while lo < len(dates):
+        month_start = date.fromordinal(dates[lo]).replace(day=1)
+        next_month = date(month_start.year + month_start.month // 12, month_start.month % 12 + 1, 1)
+        hi = bisect_left(dates, next_month.toordinal(), lo)
+        month_categories = categories[lo:hi]
+        incomes = list(compress(amounts[lo:hi], month_categories.translate(INCOME_MASK)))
+        expenses = list(compress(amounts[lo:hi], month_categories.translate(EXPENSE_MASK)))
+        rollups[(month_start.year, month_start.month)] = [sum(incomes), sum(expenses), len(incomes), len(expenses)]
+        lo = hi
+    return rollups
+
+def merge_rollups(partial_rollups):
+    """Adds up per-month rollups from several partitions; returns them in date order."""
+    merged = {}
+    for rollups in partial_rollups:
+        for key, rollup in rollups.items():
+            total = merged.setdefault(key, new_rollup())
+            for field, value in enumerate(rollup):
+                total[field] += value
+    return {key: merged[key] for key in sorted(merged) if any(merged[key])}
+
+def year_rollups(months):
+    """Rolls per-month rollups up into per-year rollups."""
+    return merge_rollups({year: rollup} for (year, _), rollup in months.items())
+
+def ledger_rollup(months):
+    """Rolls per-month rollups up into one rollup for the whole ledger."""
+    return merge_rollups({None: rollup} for rollup in months.values()).get(None, new_rollup())
+
+def ratio(rollup):
+    """Income/expense ratio of a rollup (None without expenses), exactly as income_expense_ratio computes it."""
+    return rollup[0] / abs(rollup[1]) if rollup[1] else None
+
+def main():
+    parser = argparse.ArgumentParser(description="Income and expense report over a ledger file, computed in parallel.")
+    parser.add_argument("ledger", help="ledger file (text or binary)")
+    parser.add_argument("--by", choices=["year", "month"], default="year", help="report period (default: year)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU; 1 runs serially)")
+    parser.add_argument("--check", action="store_true", help="also run the serial path and confirm the results match")
+    options = parser.parse_args()
+
+    started = time.perf_counter()
+    months = month_rollups(options.ledger, options.workers)
+    elapsed = time.perf_counter() - started
+
+    periods = year_rollups(months) if options.by == "year" else months
+    print(f"{'Period':<10} {'Income':>18} {'Expenses':>18} {'Net':>18} {'Entries':>10} {'Ratio':>7}")
+    for key, rollup in list(periods.items()) + [("Total", ledger_rollup(months))]:
+        label = f"{key[0]}-{key[1]:02d}" if isinstance(key, tuple) else str(key)
+        period_ratio = ratio(rollup)
+        print(f"{label:<10} {tracker.format_currency(rollup[0]):>18} {tracker.format_currency(rollup[1]):>18} "
+              f"{tracker.format_currency(rollup[0] + rollup[1]):>18} {rollup[2] + rollup[3]:>10,} "
+              f"{'-' if period_ratio is None else f'{period_ratio:.2f}':>7}")
+    print(f"\nComputed in {elapsed:.2f}s.")
+
+    if options.check:
+        started = time.perf_counter()
+        serial = month_rollups(options.ledger, workers=1)
+        serial_elapsed = time.perf_counter() - started
+        print(f"Serial path: {serial_elapsed:.2f}s, results {'match' if serial == months else 'DIFFER'}.")
+
+if __name__ == "__main__":
+    main()
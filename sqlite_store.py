@@ -0,0 +1,426 @@
+import sqlite3
+from array import array
+from datetime import date
+
+from transaction_store import TOKEN_PATTERN
+
+# Schema: entries ordered newest first by (date DESC, seq); seq only orders entries that share a date.
+# months holds the [income, expenses, income count, expense count] rollups plus the entry count per
+# "YYYY-MM" and meta the balances; triggers keep both current on every row change.
+SQLITE_MAGIC = b"SQLite format 3\x00"
+SQLITE_SUFFIXES = (".db", ".sqlite")
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE entries (
+    id INTEGER PRIMARY KEY,
+    date TEXT NOT NULL,      -- YYYY-MM-DD
+    seq REAL NOT NULL,       -- order among entries on the same date
+    category TEXT NOT NULL,  -- I or E
+    amount INTEGER NOT NULL, -- centavos
+    details TEXT NOT NULL
+);
+CREATE TABLE months (
+    month TEXT PRIMARY KEY,  -- YYYY-MM
+    income INTEGER NOT NULL,
+    expenses INTEGER NOT NULL,
+    income_count INTEGER NOT NULL,
+    expense_count INTEGER NOT NULL,
+    entries INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+INDEXES = """
+CREATE INDEX entries_order ON entries (date DESC, seq);
+CREATE INDEX entries_category ON entries (category, date);
+"""
+ROLLUP_ADD = """
+    INSERT INTO months VALUES (substr(NEW.date, 1, 7),
+        CASE NEW.category WHEN 'I' THEN NEW.amount ELSE 0 END, CASE NEW.category WHEN 'E' THEN NEW.amount ELSE 0 END,
+        NEW.category = 'I', NEW.category = 'E', 1)
+    ON CONFLICT (month) DO UPDATE SET income = income + excluded.income, expenses = expenses + excluded.expenses,
+        income_count = income_count + excluded.income_count, expense_count = expense_count + excluded.expense_count,
+        entries = entries + 1;
+    UPDATE meta SET value = value + NEW.amount WHERE key = 'current_balance';
+"""
+ROLLUP_REMOVE = """
+    UPDATE months SET income = income - CASE OLD.category WHEN 'I' THEN OLD.amount ELSE 0 END,
+        expenses = expenses - CASE OLD.category WHEN 'E' THEN OLD.amount ELSE 0 END,
+        income_count = income_count - (OLD.category = 'I'), expense_count = expense_count - (OLD.category = 'E'),
+        entries = entries - 1
+    WHERE month = substr(OLD.date, 1, 7);
+    DELETE FROM months WHERE month = substr(OLD.date, 1, 7) AND entries = 0;
+    UPDATE meta SET value = value - OLD.amount WHERE key = 'current_balance';
+"""
+TRIGGERS = f"""
+CREATE TRIGGER entries_insert AFTER INSERT ON entries BEGIN {ROLLUP_ADD} END;
+CREATE TRIGGER entries_delete AFTER DELETE ON entries BEGIN {ROLLUP_REMOVE} END;
+CREATE TRIGGER entries_update AFTER UPDATE ON entries BEGIN {ROLLUP_REMOVE} {ROLLUP_ADD} END;
+"""
+BLOCK_SIZE = 64 # Entries fetched at once by __getitem__, so paging through the ledger is one query per block
+FEW_STRINGS = 500 # Up to this many matching details strings, search() hands them to SQL as an IN list
+ORDER = "ORDER BY date DESC, seq"
+
+### SQLite Snapshot Functions ###
+def is_sqlite_ledger(filename):
+    """Returns True if the file is an SQLite database."""
+    try:
+        with open(filename, "rb") as file:
+            return file.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    except OSError:
+        return False
+
+def write_sqlite_ledger(filename, current_balance, initial_balance, transactions):
+    """Writes the balances and a TransactionStore (or SQLiteStore) to a new SQLite ledger file."""
+    dates, categories, amounts, details, strings = transactions.columns()
+    connection = sqlite3.connect(filename)
+    try:
+        with connection:
+            connection.executescript(SCHEMA)
+            connection.executemany("INSERT INTO meta VALUES (?, ?)", [("initial_balance", initial_balance), ("current_balance", current_balance)])
+            iso_dates = {ordinal: date.fromordinal(ordinal).isoformat() for ordinal in set(dates)}
+            count = len(dates)
+            # Oldest-first columns: later positions are newer, so same-date entries get decreasing seq
+            connection.executemany("INSERT INTO entries (date, seq, category, amount, details) VALUES (?, ?, ?, ?, ?)", (
+                (iso_dates[ordinal], count - position, chr(categories[position]), amounts[position], strings[details[position]])
+                for position, ordinal in enumerate(dates)
+            ))
+            # Rollups in one pass; the triggers take over from here
+            connection.execute("""
+                INSERT INTO months SELECT substr(date, 1, 7),
+                    SUM(CASE category WHEN 'I' THEN amount ELSE 0 END), SUM(CASE category WHEN 'E' THEN amount ELSE 0 END),
+                    SUM(category = 'I'), SUM(category = 'E'), COUNT(*)
+                FROM entries GROUP BY substr(date, 1, 7)
+            """)
+            connection.executescript(INDEXES + TRIGGERS)
+    finally:
+        connection.close()
+
+def read_sqlite_ledger(filename):
+    """Opens an SQLite ledger as (current balance, initial balance, SQLiteStore); entries stay in the database."""
+    transactions = SQLiteStore(filename)
+    return transactions.meta("current_balance"), transactions.meta("initial_balance"), transactions
+
+### SQLite Store ###
+class SQLiteStore:
+    """A TransactionStore look-alike whose entries live in an SQLite database.
+
+    Entries are indexed newest first and handed out as the same dictionaries.
+    Every add, delete, update and insert is its own committed SQL transaction,
+    and triggers keep the monthly rollups and the balance current, so writes
+    do not grow with the ledger. Filters and totals run as SQL queries on the
+    date and category indexes instead of visiting entries in Python.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._connection = sqlite3.connect(filename)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = FULL") # Each commit is on disk before the edit is reported
+        self._blocks = {}          # first index -> cached block of rows, for the current version
+        self._count = None         # Number of entries, for the current version
+        self._cached_version = None
+        self._strings = None       # Distinct details strings, loaded by the first search
+        self._bucket_versions = {} # (year, month) or year -> version of the last change to that rollup
+        self.version = 0           # bumped by every change, so callers can tell when cached views are stale
+
+    def close(self):
+        self._connection.close()
+
+    def meta(self, key):
+        return self._connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def set_meta(self, key, value):
+        with self._connection:
+            self._connection.execute("UPDATE meta SET value = ? WHERE key = ?", (value, key))
+
+    def __len__(self):
+        self._check_cache()
+        if self._count is None:
+            self._count = self._connection.execute("SELECT COALESCE(SUM(entries), 0) FROM months").fetchone()[0]
+        return self._count
+
+    def __bool__(self):
+        return self._connection.execute("SELECT EXISTS (SELECT 1 FROM entries)").fetchone()[0] == 1
+
+    def __iter__(self):
+        for row in self._connection.execute(f"SELECT date, category, amount, details FROM entries {ORDER}"):
+            yield make_entry(row)
+
+    def __getitem__(self, index):
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("transaction index out of range")
+        return make_entry(self._block(index - index % BLOCK_SIZE)[index % BLOCK_SIZE][1:5])
+
+    def add(self, transaction):
+        """Adds a transaction in date order (after existing entries on the same date) and returns its index."""
+        date_str = transaction["date"].isoformat()
+        with self._connection:
+            # Only seq among entries of the same date matters, and entries_order finds their largest in one seek
+            seq = self._connection.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM entries WHERE date = ?", (date_str,)).fetchone()[0]
+            self._insert_row(date_str, seq, transaction)
+        return self._index_of(date_str, seq)
+
+    def insert(self, index, transaction):
+        """Puts a transaction back at exactly index (e.g. to undo a delete); raises ValueError if that breaks the date order."""
+        count = len(self)
+        if not 0 <= index <= count:
+            raise IndexError("transaction index out of range")
+        date_str = transaction["date"].isoformat()
+        before = self._locate(index - 1) if index > 0 else None
+        after = self._locate(index) if index < count else None
+        if (before is not None and before[1] < date_str) or (after is not None and after[1] > date_str):
+            raise ValueError(f"a transaction dated {transaction['date']} cannot go at index {index}")
+
+        # Pick a seq between the neighbours that share the date
+        if before is not None and before[1] == date_str and after is not None and after[1] == date_str:
+            seq = (before[2] + after[2]) / 2
+        elif before is not None and before[1] == date_str:
+            seq = before[2] + 1
+        elif after is not None and after[1] == date_str:
+            seq = after[2] - 1
+        else:
+            seq = 0
+        with self._connection:
+            self._insert_row(date_str, seq, transaction)
+        return index
+
+    def delete(self, index):
+        """Removes the transaction at index and returns it."""
+        row = self._locate(index)
+        with self._connection:
+            self._connection.execute("DELETE FROM entries WHERE id = ?", (row[0],))
+        self._changed(row[1])
+        return make_entry(row[1:2] + row[3:])
+
+    def update(self, index, transaction):
+        """Replaces the transaction at index and returns its new index; only a changed date moves the entry."""
+        row = self._locate(index)
+        if transaction["date"].isoformat() != row[1]:
+            self.delete(index)
+            return self.add(transaction)
+
+        with self._connection:
+            self._connection.execute("UPDATE entries SET category = ?, amount = ?, details = ? WHERE id = ?",
+                                     (transaction["category"], transaction["amount"], transaction["details"], row[0]))
+        self._changed(row[1], transaction["details"])
+        return index
+
+    def merge(self, other):
+        """Adds all of another store's entries in one SQL transaction, exactly as calling add() for each in turn would."""
+        with self._connection:
+            seq = self._connection.execute("SELECT COALESCE(MAX(seq), 0) FROM entries").fetchone()[0]
+            self._connection.executemany(
+                "INSERT INTO entries (date, seq, category, amount, details) VALUES (?, ?, ?, ?, ?)",
+                ((entry["date"].isoformat(), seq + number, entry["category"], entry["amount"], entry["details"])
+                 for number, entry in enumerate(other, start=1))
+            )
+        self.version += 1
+        self._strings = None
+        for (year, month), _ in self.month_totals(): # Any bucket may have changed
+            self._bucket_versions[(year, month)] = self._bucket_versions[year] = self.version
+
+    def select(self, start=None, end=None, year=None, month=None, day=None, category=None):
+        """Returns the entries that match every given criterion, newest first (see TransactionStore.select)."""
+        where, parameters = criteria_sql(start, end, year, month, day, category)
+        rows = self._connection.execute(f"SELECT date, category, amount, details FROM entries WHERE {where} {ORDER}", parameters)
+        return [make_entry(row) for row in rows]
+
+    def search(self, text, start=None, end=None, year=None, month=None, day=None, category=None):
+        """Returns the indices (newest first) of the entries whose details match text (see TransactionStore.search)."""
+        where, parameters = criteria_sql(start, end, year, month, day, category)
+        words = TOKEN_PATTERN.findall(text.lower())
+        matched = None
+        if words:
+            if self._strings is None:
+                self._strings = {details for (details,) in self._connection.execute("SELECT DISTINCT details FROM entries")}
+            matched = {details for details in self._strings if words_match(words, details)}
+            if not matched:
+                return [] # No details string has these words
+            if len(matched) <= FEW_STRINGS:
+                where += f" AND details IN ({', '.join('?' * len(matched))})"
+                parameters += list(matched)
+                matched = None
+
+        found = {} # "YYYY-MM" -> ids of the matching entries dated in that month
+        for entry_id, date_str, details in self._connection.execute(f"SELECT id, date, details FROM entries WHERE {where}", parameters):
+            if matched is None or details in matched:
+                found.setdefault(date_str[:7], set()).add(entry_id)
+
+        # Only the months holding matches are numbered, off the entries_order index; the others are skipped
+        # by their counts in months, so the cost grows with the matching months rather than the whole ledger
+        indices = []
+        offset = 0
+        for month, entries in self._connection.execute("SELECT month, entries FROM months ORDER BY month DESC").fetchall():
+            ids = found.get(month)
+            if ids:
+                ordered = self._connection.execute(f"SELECT id FROM entries WHERE date BETWEEN ? AND ? {ORDER}", (month + "-01", month + "-31"))
+                indices += [offset + position for position, (entry_id,) in enumerate(ordered) if entry_id in ids]
+            offset += entries
+        return indices
+
+    def columns(self):
+        """Returns oldest-first columns (dates, categories, amounts, details ids) and their string table, like TransactionStore."""
+        dates, categories, amounts, details = array("i"), bytearray(), array("q"), array("i")
+        strings, string_ids, ordinals = [], {}, {}
+        for date_str, category, amount, text in self._connection.execute(
+                "SELECT date, category, amount, details FROM entries ORDER BY date, seq DESC"):
+            ordinal = ordinals.get(date_str)
+            if ordinal is None:
+                ordinal = ordinals[date_str] = date.fromisoformat(date_str).toordinal()
+            string_id = string_ids.get(text)
+            if string_id is None:
+                string_id = string_ids[text] = len(strings)
+                strings.append(text)
+            dates.append(ordinal)
+            categories.append(ord(category))
+            amounts.append(amount)
+            details.append(string_id)
+        return dates, categories, amounts, details, strings
+
+    def totals(self, year=None, month=None):
+        """Returns income, expenses (as a negative sum) in centavos and entry counts for the whole ledger, a year or a month."""
+        if month is not None:
+            where, parameters = "month = ?", [f"{year:04d}-{month:02d}"]
+        elif year is not None:
+            where, parameters = "month BETWEEN ? AND ?", [f"{year:04d}-01", f"{year:04d}-12"]
+        else:
+            where, parameters = "1", []
+        income, expenses, income_count, expense_count = self._connection.execute(
+            f"SELECT COALESCE(SUM(income), 0), COALESCE(SUM(expenses), 0), COALESCE(SUM(income_count), 0), "
+            f"COALESCE(SUM(expense_count), 0) FROM months WHERE {where}", parameters).fetchone()
+        return {"income": income, "expenses": expenses, "income_count": income_count, "expense_count": expense_count}
+
+    def net_total(self):
+        """Returns the sum of all income and expense amounts in centavos."""
+        return self._connection.execute("SELECT COALESCE(SUM(income + expenses), 0) FROM months").fetchone()[0]
+
+    def month_totals(self):
+        """Returns the (year, month) rollups in date order."""
+        rows = self._connection.execute("SELECT month, income, expenses, income_count, expense_count FROM months ORDER BY month")
+        return [((int(key[:4]), int(key[5:])), rollup_dict(rollup)) for key, *rollup in rows]
+
+    def year_totals(self):
+        """Returns the yearly rollups in date order."""
+        rows = self._connection.execute("""
+            SELECT substr(month, 1, 4), SUM(income), SUM(expenses), SUM(income_count), SUM(expense_count)
+            FROM months GROUP BY substr(month, 1, 4) ORDER BY 1
+        """)
+        return [(int(year), rollup_dict(rollup)) for year, *rollup in rows]
+
+    def bucket_version(self, year, month=None):
+        """Returns the store version that last changed a month's (or a year's) rollup."""
+        return self._bucket_versions.get(year if month is None else (year, month), 0)
+
+    def verify(self):
+        """Recomputes the month rollups from the entries and describes each one the triggers got wrong.
+
+        The recorded balance (meta's current_balance) is compared by check_consistency, like a file's header.
+        """
+        problems = []
+        recomputed = self._connection.execute("""
+            SELECT substr(date, 1, 7), SUM(CASE category WHEN 'I' THEN amount ELSE 0 END),
+                SUM(CASE category WHEN 'E' THEN amount ELSE 0 END), SUM(category = 'I'), SUM(category = 'E'), COUNT(*)
+            FROM entries GROUP BY 1
+        """).fetchall()
+        stored = self._connection.execute("SELECT * FROM months").fetchall()
+        recomputed = {row[0]: list(row[1:]) for row in recomputed}
+        stored = {row[0]: list(row[1:]) for row in stored}
+        for key in sorted(set(recomputed) | set(stored)):
+            if recomputed.get(key) != stored.get(key):
+                problems.append(f"{key} totals {stored.get(key)} should be {recomputed.get(key)}")
+        return problems
+
+    ### Internal Helpers ###
+    def _insert_row(self, date_str, seq, transaction):
+        self._connection.execute("INSERT INTO entries (date, seq, category, amount, details) VALUES (?, ?, ?, ?, ?)",
+                                 (date_str, seq, transaction["category"], transaction["amount"], transaction["details"]))
+        self._changed(date_str, transaction["details"])
+
+    def _changed(self, date_str, details=None):
+        # Invalidates cached blocks and marks the month and year of date_str as changed
+        self.version += 1
+        year, month = int(date_str[:4]), int(date_str[5:7])
+        self._bucket_versions[(year, month)] = self._bucket_versions[year] = self.version
+        if details is not None and self._strings is not None:
+            self._strings.add(details)
+
+    def _locate(self, index):
+        # Returns (id, date, seq, category, amount, details) of the entry at index, skipping whole months by their counts
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("transaction index out of range")
+        for month, entries in self._connection.execute("SELECT month, entries FROM months ORDER BY month DESC"):
+            if index < entries:
+                return self._connection.execute(
+                    f"SELECT id, date, seq, category, amount, details FROM entries WHERE date BETWEEN ? AND ? {ORDER} LIMIT 1 OFFSET ?",
+                    (month + "-01", month + "-31", index)).fetchone()
+            index -= entries
+
+    def _index_of(self, date_str, seq):
+        # Newest-first index of the entry with this date and seq
+        later_months = self._connection.execute("SELECT COALESCE(SUM(entries), 0) FROM months WHERE month > ?", (date_str[:7],)).fetchone()[0]
+        later_days = self._connection.execute("SELECT COUNT(*) FROM entries WHERE date > ? AND date <= ?", (date_str, date_str[:7] + "-31")).fetchone()[0]
+        same_day = self._connection.execute("SELECT COUNT(*) FROM entries WHERE date = ? AND seq < ?", (date_str, seq)).fetchone()[0]
+        return later_months + later_days + same_day
+
+    def _check_cache(self):
+        # Drops the cached count and blocks once the store has changed
+        if self._cached_version != self.version:
+            self._blocks = {}
+            self._count = None
+            self._cached_version = self.version
+
+    def _block(self, first):
+        # BLOCK_SIZE rows starting at index first, cached until the next change
+        self._check_cache()
+        block = self._blocks.get(first)
+        if block is None:
+            row = self._locate(first)
+            # Continue from the located entry; later blocks of the same page reuse the cache
+            block = [row] + self._connection.execute(
+                f"SELECT id, date, category, amount, details FROM entries WHERE date < ? OR (date = ? AND seq > ?) {ORDER} LIMIT ?",
+                (row[1], row[1], row[2], BLOCK_SIZE - 1)).fetchall()
+            block = [block[0][:2] + block[0][3:]] + block[1:]
+            self._blocks[first] = block
+        return block
+
+### Helper Functions ###
+def make_entry(row):
+    """Turns a (date, category, amount, details) row into a transaction dictionary."""
+    return {"date": date.fromisoformat(row[0]), "category": row[1], "amount": row[2], "details": row[3]}
+
+def rollup_dict(rollup):
+    income, expenses, income_count, expense_count = rollup
+    return {"income": income, "expenses": expenses, "income_count": income_count, "expense_count": expense_count}
+
+def words_match(words, details):
+    """True if every word starts a word of details, ignoring case (the rule TransactionStore.search uses)."""
+    tokens = TOKEN_PATTERN.findall(details.lower())
+    return all(any(token.startswith(word) for token in tokens) for word in words)
+
+def criteria_sql(start, end, year, month, day, category):
+    """Builds the WHERE clause and parameters for TransactionStore.select-style criteria on the indexed columns."""
+    clauses, parameters = ["1"], []
+    if start is not None:
+        clauses.append("date >= ?")
+        parameters.append(start.isoformat())
+    if end is not None:
+        clauses.append("date <= ?")
+        parameters.append(end.isoformat())
+    if year is not None:
+        clauses.append("date BETWEEN ? AND ?")
+        parameters += [f"{year:04d}-01-01", f"{year:04d}-12-31"]
+    if month is not None:
+        clauses.append("substr(date, 6, 2) = ?")
+        parameters.append(f"{month:02d}")
+    if day is not None:
+        clauses.append("substr(date, 9, 2) = ?")
+        parameters.append(f"{day:02d}")
+    if category is not None:
+        clauses.append("category = ?")
+        parameters.append(category)
+    return " AND ".join(clauses), parameters
@@ -0,0 +1,46 @@
+"""Regression tests for partitioned ledgers whose partitions empty out and fill up again.
+
+Run from the repository root:  python -m pytest tests
+"""
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from ExpensesTracker import Ledger, load_transactions
+from partitioned_store import partition_directory
+
+def entry(entry_date, amount, details):
+    return {"date": entry_date, "category": "I", "amount": amount, "details": details}
+
+def test_add_to_a_partition_emptied_by_a_compaction(tmp_path):
+    filename = str(tmp_path / "ledger.manifest")
+    with Ledger.create(filename, 1000) as ledger:
+        ledger.add(entry(date(2023, 5, 1), 5, "Old"))
+        ledger.add(entry(date(2024, 5, 1), 7, "New"))
+        ledger.delete(1) # The only 2023 entry
+        ledger.compact()
+        assert ledger.add(entry(date(2023, 6, 1), 9, "Again")) == 1
+        assert len(ledger.transactions) == 2
+        assert ledger.balance == 1016
+        assert ledger.verify() == []
+
+    current_balance, _, transactions = load_transactions(filename)
+    assert current_balance == 1016
+    assert [transaction["details"] for transaction in transactions] == ["New", "Again"]
+
+def test_failed_add_leaves_no_partition_behind(tmp_path):
+    filename = str(tmp_path / "ledger.manifest")
+    with Ledger.create(filename, 1000) as ledger:
+        ledger.add(entry(date(2024, 5, 1), 7, "New"))
+        with pytest.raises(ValueError):
+            ledger.transactions.add(entry(date(2019, 1, 1), 2 ** 63, "Too large"))
+        ledger.add(entry(date(2024, 6, 1), 3, "Newer"))
+        ledger.compact()
+
+    _, _, transactions = load_transactions(filename)
+    assert len(transactions) == 2
+    assert not any(name.startswith("2019") for name in os.listdir(partition_directory(filename)))
@@ -0,0 +1,499 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from itertools import compress
+
+INCOME = ord("I")
+EXPENSE = ord("E")
+# bytes.translate tables that turn the category column into 0/1 selectors for itertools.compress
+INCOME_MASK = bytes(1 if code == INCOME else 0 for code in range(256))
+EXPENSE_MASK = bytes(1 if code == EXPENSE else 0 for code in range(256))
+TOKEN_PATTERN = re.compile(r"\w+") # Words in details, for the search index
+FEW_STRINGS = 16 # Up to this many matching details strings, search() looks their ids up with bytes.find
+MAX_AMOUNT = 2 ** 63 - 1 # Largest magnitude, in centavos, that the array("q") amount column holds
+
+### Transaction Store ###
+class TransactionStore:
+    """Keeps the ledger in compact parallel columns instead of one dictionary per transaction.
+
+    Entries are indexed newest first, exactly like the old list of dictionaries, and
+    are handed out as dictionaries built on demand so callers can keep using
+    transaction["date"], transaction["category"] and so on. Internally the columns
+    are stored oldest first, so recording today's expense is an append and any
+    other date is a binary search plus one insert, never a full re-sort.
+    """
+
+    def __init__(self, transactions=()):
+        self._dates = array("i")       # date.toordinal() of every entry
+        self._categories = bytearray() # b"I" or b"E" per entry
+        self._amounts = array("q")     # amount in centavos (int)
+        self._details = array("i")     # index into self._strings
+        self._strings = []             # string table shared by equal details
+        self._string_ids = {}          # details string -> index in self._strings
+        self._token_ids = {}           # search index: lowercase token -> ids of the strings containing it
+        self._tokens = []              # search index: every token, sorted before prefix lookups
+        self._tokens_sorted = True
+        self._indexed_strings = 0      # search index: how many of self._strings it covers (built on the first search)
+        self._month_counts = {}        # date index: (year, month) -> number of entries
+        self._buckets = None           # date index: cached (year, month) -> (start, stop) offsets
+        self._totals = new_rollup()    # aggregates: [income, expenses, income count, expense count] in centavos
+        self._month_totals = {}        # aggregates: (year, month) -> rollup
+        self._year_totals = {}         # aggregates: year -> rollup
+        self._bucket_versions = {}     # (year, month) or year -> version of the last change to that rollup
+        self.version = 0               # bumped by every change, so callers can tell when cached views are stale
+
+        for transaction in transactions:
+            self._append(transaction)
+        # Ledger files list the newest entry first, so flip the columns into storage order
+        self._dates.reverse()
+        self._categories.reverse()
+        self._amounts.reverse()
+        self._details.reverse()
+        self._sort()
+        self._count_months()
+        self._build_rollups()
+
+    @classmethod
+    def from_columns(cls, dates, categories, amounts, details, strings):
+        """Builds a store directly from oldest-first columns, as returned by columns()."""
+        store = cls()
+        store._dates = dates
+        store._categories = categories
+        store._amounts = amounts
+        store._details = details
+        store._strings = list(strings)
+        store._string_ids = {string: string_id for string_id, string in enumerate(store._strings)}
+        store._sort()
+        store._count_months()
+        store._build_rollups()
+        return store
+
+    def __len__(self):
+        return len(self._dates)
+
+    def __bool__(self):
+        return len(self._dates) > 0
+
+    def __iter__(self):
+        for position in range(len(self._dates) - 1, -1, -1):
+            yield self._row(position)
+
+    def __getitem__(self, index):
+        """Returns a copy of the entry at index; change it with update() rather than in place."""
+        return self._row(self._position(index))
+
+    def add(self, transaction):
+        """Adds a transaction in date order (after existing entries on the same date) and returns its index."""
+        ordinal = transaction["date"].toordinal()
+        check_entry(transaction)
+        self.version += 1
+        self._index_date(ordinal, 1)
+        self._roll(ordinal, ord(transaction["category"]), transaction["amount"], 1)
+        dates = self._dates
+        if not dates or ordinal > dates[-1]:
+            self._append(transaction) # Newest entry so far: plain append
+            return 0
+
+        position = bisect_left(dates, ordinal)
+        dates.insert(position, ordinal)
+        self._categories.insert(position, ord(transaction["category"]))
+        self._amounts.insert(position, transaction["amount"])
+        self._details.insert(position, self._intern(transaction["details"]))
+        return len(dates) - 1 - position
+
+    def insert(self, index, transaction):
+        """Puts a transaction back at exactly index (e.g. to undo a delete); raises ValueError if that breaks the date order."""
+        ordinal = transaction["date"].toordinal()
+        dates = self._dates
+        if not 0 <= index <= len(dates):
+            raise IndexError("transaction index out of range")
+        position = len(dates) - index
+        if (position > 0 and dates[position - 1] > ordinal) or (position < len(dates) and dates[position] < ordinal):
+            raise ValueError(f"a transaction dated {transaction['date']} cannot go at index {index}")
+        check_entry(transaction)
+
+        self.version += 1
+        self._index_date(ordinal, 1)
+        self._roll(ordinal, ord(transaction["category"]), transaction["amount"], 1)
+        dates.insert(position, ordinal)
+        self._categories.insert(position, ord(transaction["category"]))
+        self._amounts.insert(position, transaction["amount"])
+        self._details.insert(position, self._intern(transaction["details"]))
+        return index
+
+    def delete(self, index):
+        """Removes the transaction at index and returns it."""
+        position = self._position(index)
+        deleted_entry = self._row(position)
+        self.version += 1
+        self._index_date(self._dates[position], -1)
+        self._roll(self._dates[position], self._categories[position], self._amounts[position], -1)
+        del self._dates[position]
+        del self._categories[position]
+        del self._amounts[position]
+        del self._details[position]
+        return deleted_entry
+
+    def update(self, index, transaction):
+        """Replaces the transaction at index and returns its new index; only a changed date moves the entry."""
+        position = self._position(index)
+        check_entry(transaction)
+        if transaction["date"].toordinal() != self._dates[position]:
+            self.delete(index)
+            return self.add(transaction)
+
+        self.version += 1
+        self._roll(self._dates[position], self._categories[position], self._amounts[position], -1)
+        self._roll(self._dates[position], ord(transaction["category"]), transaction["amount"], 1)
+        self._categories[position] = ord(transaction["category"])
+        self._amounts[position] = transaction["amount"]
+        self._details[position] = self._intern(transaction["details"])
+        return len(self._dates) - 1 - position
+
+    def merge(self, other):
+        """Adds every entry of another store in one linear pass.
+
+        The result is the same as calling add() for each of other's entries in the
+        order other lists them: on equal dates the merged entries are placed after
+        the existing ones. Use it for bulk imports instead of thousands of add() calls.
+        """
+        other_dates, other_categories, other_amounts, other_details, other_strings = other.columns()
+        string_ids = [self._intern(string) for string in other_strings]
+        other_details = array("i", map(string_ids.__getitem__, other_details))
+
+        dates, categories, amounts, details = array("i"), bytearray(), array("q"), array("i")
+        start = 0
+        run = 0
+        while run < len(other_dates):
+            # Copy the existing entries dated before this run of equal dates, then the run itself
+            ordinal = other_dates[run]
+            run_end = bisect_right(other_dates, ordinal, run)
+            position = bisect_left(self._dates, ordinal, start)
+            for column, existing, new in ((dates, self._dates, other_dates), (categories, self._categories, other_categories),
+                                          (amounts, self._amounts, other_amounts), (details, self._details, other_details)):
+                column += existing[start:position]
+                column += new[run:run_end]
+            start = position
+            run = run_end
+        dates += self._dates[start:]
+        categories += self._categories[start:]
+        amounts += self._amounts[start:]
+        details += self._details[start:]
+
+        self._dates, self._categories, self._amounts, self._details = dates, categories, amounts, details
+        self.version += 1
+        self._count_months()
+        self._build_rollups()
+
+    def select(self, start=None, end=None, year=None, month=None, day=None, category=None):
+        """Returns the entries that match every given criterion, newest first.
+
+        start and end are inclusive dates, year/month/day match that part of the
+        date (month and day across all years, like filter_entries), and category
+        is "I" or "E". Date criteria are answered from the date index with binary
+        searches; only the category test looks at individual entries.
+        """
+        entries = []
+        for lo, hi in reversed(self._ranges(start, end, year, month, day)):
+            entries.extend(self._row(position) for position in reversed(self._positions(lo, hi, category)))
+        return entries
+
+    def search(self, text, start=None, end=None, year=None, month=None, day=None, category=None):
+        """Returns the indices (newest first) of the entries whose details match text.
+
+        Every word of text must start a word of the details, ignoring case, so
+        "sal" finds "Salary" and "rent jan" finds "Rent for January". The words
+        are looked up in the search index; the date and category criteria work
+        as in select(), so only entries inside those date ranges are checked.
+        """
+        string_ids = self._match_tokens(text)
+        if string_ids is not None and not string_ids:
+            return [] # No details string has these words
+
+        details = self._details
+        last = len(details) - 1
+        indices = []
+        for lo, hi in reversed(self._ranges(start, end, year, month, day)):
+            if string_ids is not None and len(string_ids) <= FEW_STRINGS:
+                positions = self._find_details(lo, hi, string_ids)
+                if category is not None:
+                    positions = [position for position in positions if self._categories[position] == ord(category)]
+            else:
+                positions = self._positions(lo, hi, category)
+                if string_ids is not None and isinstance(positions, range):
+                    positions = compress(positions, map(string_ids.__contains__, details[lo:hi]))
+                elif string_ids is not None:
+                    positions = [position for position in positions if details[position] in string_ids]
+            indices.extend(last - position for position in reversed(list(positions)))
+        return indices
+
+    def columns(self):
+        """Returns the oldest-first columns (dates, categories, amounts, details ids) and the string table they refer to."""
+        return self._dates, self._categories, self._amounts, self._details, self._strings
+
+    def totals(self, year=None, month=None):
+        """Returns income, expenses (as a negative sum) in centavos and entry counts for the whole ledger, a year or a month."""
+        if month is not None:
+            rollup = self._month_totals.get((year, month), ZERO_ROLLUP)
+        elif year is not None:
+            rollup = self._year_totals.get(year, ZERO_ROLLUP)
+        else:
+            rollup = self._totals
+        income, expenses, income_count, expense_count = rollup
+        return {"income": income, "expenses": expenses, "income_count": income_count, "expense_count": expense_count}
+
+    def net_total(self):
+        """Returns the sum of all income and expense amounts in centavos."""
+        return self._totals[0] + self._totals[1]
+
+    def month_totals(self):
+        """Returns the (year, month) rollups in date order."""
+        return [(key, self.totals(*key)) for key in sorted(self._month_totals)]
+
+    def year_totals(self):
+        """Returns the yearly rollups in date order."""
+        return [(year, self.totals(year)) for year in sorted(self._year_totals)]
+
+    def bucket_version(self, year, month=None):
+        """Returns the store version that last changed a month's (or a year's) rollup, so cached reports can be rebuilt per bucket."""
+        return self._bucket_versions.get(year if month is None else (year, month), 0)
+
+    def verify(self):
+        """Recomputes every aggregate from the entries and returns a description of each one that has drifted."""
+        totals = new_rollup()
+        month_totals = {}
+        year_totals = {}
+        for ordinal, category, amount in zip(self._dates, self._categories, self._amounts):
+            entry_date = date.fromordinal(ordinal)
+            for rollup in (totals, month_totals.setdefault((entry_date.year, entry_date.month), new_rollup()), year_totals.setdefault(entry_date.year, new_rollup())):
+                add_to_rollup(rollup, category, amount, 1)
+
+        problems = []
+        if totals != self._totals:
+            problems.append(f"ledger totals {self._totals} should be {totals}")
+        for key in sorted(set(month_totals) | set(self._month_totals)):
+            if month_totals.get(key, ZERO_ROLLUP) != self._month_totals.get(key, ZERO_ROLLUP):
+                problems.append(f"{key[0]}-{key[1]:02d} totals {self._month_totals.get(key, ZERO_ROLLUP)} should be {month_totals.get(key, ZERO_ROLLUP)}")
+        for key in sorted(set(year_totals) | set(self._year_totals)):
+            if year_totals.get(key, ZERO_ROLLUP) != self._year_totals.get(key, ZERO_ROLLUP):
+                problems.append(f"{key} totals {self._year_totals.get(key, ZERO_ROLLUP)} should be {year_totals.get(key, ZERO_ROLLUP)}")
+        return problems
+
+    ### Internal Helpers ###
+    def _position(self, index):
+        # Converts a newest-first index into a position in the oldest-first columns
+        count = len(self._dates)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError("transaction index out of range")
+        return count - 1 - index
+
+    def _ranges(self, start, end, year, month, day):
+        # Oldest-first position ranges that satisfy the date criteria, from the date index
+        dates = self._dates
+        if year is None and month is None and day is None:
+            ranges = [(0, len(dates))]
+        else:
+            ranges = []
+            for (bucket_year, bucket_month), (lo, hi) in self._month_buckets():
+                if (year is not None and bucket_year != year) or (month is not None and bucket_month != month):
+                    continue
+                if day is not None:
+                    try:
+                        ordinal = date(bucket_year, bucket_month, day).toordinal()
+                    except ValueError:
+                        continue # This month has no such day (e.g. February 30)
+                    lo, hi = bisect_left(dates, ordinal, lo, hi), bisect_right(dates, ordinal, lo, hi)
+                ranges.append((lo, hi))
+
+        if start is not None or end is not None:
+            low = 0 if start is None else bisect_left(dates, start.toordinal())
+            high = len(dates) if end is None else bisect_right(dates, end.toordinal())
+            ranges = [(max(lo, low), min(hi, high)) for lo, hi in ranges]
+
+        return [(lo, hi) for lo, hi in ranges if lo < hi]
+
+    def _match_tokens(self, text):
+        # Ids of the details strings with a word starting with each word of text (None: no words, so no filter)
+        for string_id in range(self._indexed_strings, len(self._strings)):
+            self._index_tokens(string_id, self._strings[string_id])
+        self._indexed_strings = len(self._strings)
+        if not self._tokens_sorted:
+            self._tokens.sort()
+            self._tokens_sorted = True
+
+        matched = None
+        for word in TOKEN_PATTERN.findall(text.lower()):
+            string_ids = set()
+            position = bisect_left(self._tokens, word)
+            while position < len(self._tokens) and self._tokens[position].startswith(word):
+                string_ids |= self._token_ids[self._tokens[position]]
+                position += 1
+            matched = string_ids if matched is None else matched & string_ids
+        return matched
+
+    def _index_tokens(self, string_id, string):
+        # Adds a new details string to the search index
+        for token in set(TOKEN_PATTERN.findall(string.lower())):
+            string_ids = self._token_ids.get(token)
+            if string_ids is None:
+                string_ids = self._token_ids[token] = set()
+                self._tokens.append(token)
+                self._tokens_sorted = False
+            string_ids.add(string_id)
+
+    def _find_details(self, lo, hi, string_ids):
+        # Sorted positions in [lo, hi) using one of string_ids, found with C-speed byte searches
+        data = self._details[lo:hi].tobytes()
+        positions = []
+        for string_id in string_ids:
+            pattern = array("i", [string_id]).tobytes()
+            offset = data.find(pattern)
+            while offset != -1:
+                if offset % len(pattern) == 0: # Skip matches that straddle two entries
+                    positions.append(lo + offset // len(pattern))
+                    offset = data.find(pattern, offset + len(pattern))
+                else:
+                    offset = data.find(pattern, offset + 1)
+        positions.sort()
+        return positions
+
+    def _positions(self, lo, hi, category):
+        # Positions in [lo, hi) whose category matches; the category column doubles as a byte mask
+        if category is None:
+            return range(lo, hi)
+        code = ord(category)
+        categories = self._categories
+        positions = []
+        position = categories.find(code, lo, hi)
+        while position != -1:
+            positions.append(position)
+            position = categories.find(code, position + 1, hi)
+        return positions
+
+    def _index_date(self, ordinal, change):
+        # Keeps the per-month entry counts current; bucket offsets are rebuilt on the next query
+        entry_date = date.fromordinal(ordinal)
+        key = (entry_date.year, entry_date.month)
+        count = self._month_counts.get(key, 0) + change
+        if count:
+            self._month_counts[key] = count
+        else:
+            self._month_counts.pop(key, None)
+        self._buckets = None
+
+    def _count_months(self):
+        # Builds the date index with one binary search per month instead of one date per entry
+        dates = self._dates
+        self._month_counts = {}
+        self._buckets = None
+        position = 0
+        while position < len(dates):
+            first = date.fromordinal(dates[position])
+            if first.month == 12:
+                next_month = date(first.year + 1, 1, 1)
+            else:
+                next_month = date(first.year, first.month + 1, 1)
+            stop = bisect_left(dates, next_month.toordinal(), position)
+            self._month_counts[(first.year, first.month)] = stop - position
+            position = stop
+
+    def _roll(self, ordinal, category, amount, change):
+        # O(1) update of the ledger, month and year aggregates for one entry (change is 1 or -1)
+        entry_date = date.fromordinal(ordinal)
+        month_key = (entry_date.year, entry_date.month)
+        for totals, key in ((self._month_totals, month_key), (self._year_totals, entry_date.year)):
+            self._bucket_versions[key] = self.version
+            rollup = totals.setdefault(key, new_rollup())
+            add_to_rollup(rollup, category, amount, change)
+            if rollup == ZERO_ROLLUP:
+                del totals[key]
+        add_to_rollup(self._totals, category, amount, change)
+
+    def _build_rollups(self):
+        # Sums each month bucket with C-level slicing instead of visiting entries one by one
+        self._totals = new_rollup()
+        self._month_totals = {}
+        self._year_totals = {}
+        self._bucket_versions = {}
+        for key, (lo, hi) in self._month_buckets():
+            amounts = self._amounts[lo:hi]
+            categories = self._categories[lo:hi]
+            incomes = list(compress(amounts, categories.translate(INCOME_MASK)))
+            expenses = list(compress(amounts, categories.translate(EXPENSE_MASK)))
+            rollup = [sum(incomes), sum(expenses), len(incomes), len(expenses)]
+            self._month_totals[key] = rollup
+            self._bucket_versions[key] = self._bucket_versions[key[0]] = self.version
+            year_rollup = self._year_totals.setdefault(key[0], new_rollup())
+            for slot in range(4):
+                year_rollup[slot] += rollup[slot]
+                self._totals[slot] += rollup[slot]
+
+    def _month_buckets(self):
+        # (year, month) -> (start, stop) offsets, derived from the month counts in date order
+        if self._buckets is None:
+            self._buckets = []
+            start = 0
+            for key in sorted(self._month_counts):
+                stop = start + self._month_counts[key]
+                self._buckets.append((key, (start, stop)))
+                start = stop
+        return self._buckets
+
+    def _row(self, position):
+        return {
+            "date": date.fromordinal(self._dates[position]),
+            "category": chr(self._categories[position]),
+            "amount": self._amounts[position],
+            "details": self._strings[self._details[position]],
+        }
+
+    def _intern(self, details):
+        string_id = self._string_ids.get(details)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings.append(details)
+            self._string_ids[details] = string_id
+        return string_id
+
+    def _append(self, transaction):
+        self._dates.append(transaction["date"].toordinal())
+        self._categories.append(ord(transaction["category"]))
+        self._amounts.append(transaction["amount"])
+        self._details.append(self._intern(transaction["details"]))
+
+    def _sort(self):
+        # Only needed once, for ledger files that were edited out of order by hand
+        dates = self._dates
+        if all(dates[i] <= dates[i + 1] for i in range(len(dates) - 1)):
+            return # Already in order
+        order = sorted(range(len(dates)), key=dates.__getitem__) # Stable, so same-date entries keep their order
+        self._dates = array("i", [dates[i] for i in order])
+        self._categories = bytearray(self._categories[i] for i in order)
+        self._amounts = array("q", [self._amounts[i] for i in order])
+        self._details = array("i", [self._details[i] for i in order])
+
+### Helper Functions ###
+ZERO_ROLLUP = [0, 0, 0, 0]
+
+def new_rollup():
+    """Returns an empty [income, expenses, income count, expense count] rollup."""
+    return [0, 0, 0, 0]
+
+def add_to_rollup(rollup, category, amount, change):
+    """Adds (change=1) or removes (change=-1) one entry's amount in a rollup."""
+    if category == INCOME:
+        rollup[0] += change * amount
+        rollup[2] += change
+    elif category == EXPENSE:
+        rollup[1] += change * amount
+        rollup[3] += change
+
+def check_entry(transaction):
+    """Raises ValueError, before a store changes anything, for a category other than "I"/"E" or an amount too large for the amount column."""
+    if transaction["category"] not in ("I", "E"):
+        raise ValueError(f"category {transaction['category']!r} is not I or E")
+    if abs(transaction["amount"]) > MAX_AMOUNT:
+        raise ValueError(f"amount {transaction['amount']} is out of range (at most {MAX_AMOUNT} centavos either way)")
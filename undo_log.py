@@ -0,0 +1,185 @@
+import json
+import os
+from collections import deque
+from datetime import date
+
+# A step describes one edit by what it changed, never by a copy of the ledger:
+#   ("A", index, entry)                   entry was added at index
+#   ("D", index, entry)                   entry was deleted from index
+#   ("U", index, new_index, changes)      the entry at index was edited and now sits at new_index;
+#                                         changes maps each edited field to (before, after)
+# Undoing or redoing a step turns it into journal-style operations (operation, index, entry):
+# "A" add, "D" delete, "U" update in place and "I" insert at exactly index.
+UNDO_LIMIT = 1000 # Oldest steps are forgotten beyond this many
+FIELDS = ("date", "category", "amount", "details")
+
+### Undo Log ###
+class UndoLog:
+    """Undo and redo stacks of ledger edits, optionally kept in a file so they survive restarts.
+
+    Every step costs the same memory and time whatever the size of the ledger.
+    When a path is given, each change to the stacks is appended to it as one
+    JSON line and the file is only rewritten by compact().
+    """
+
+    def __init__(self, path=None, limit=UNDO_LIMIT):
+        self.path = path
+        self.limit = limit
+        self._undo = deque(maxlen=limit)
+        self._redo = []
+        self._events = 0 # Lines in the history file
+        if path is not None and os.path.isfile(path):
+            self._load()
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def record(self, step):
+        """Remembers a new edit; it replaces whatever could have been redone."""
+        self._undo.append(step)
+        self._redo.clear()
+        self._write(["do", encode_step(step)])
+
+    def undo(self, transactions):
+        """Moves the latest step to the redo stack and returns it with the operations that reverse it.
+
+        Raises ValueError (and forgets the history) if the ledger no longer looks
+        the way the step left it, e.g. because the file was changed elsewhere.
+        """
+        step = self._undo[-1]
+        operations = self._checked(transactions, undo_operations, step)
+        self._redo.append(self._undo.pop())
+        self._write(["undo"])
+        return step, operations
+
+    def redo(self, transactions):
+        """Moves the latest undone step back to the undo stack and returns it with the operations that repeat it."""
+        step = self._redo[-1]
+        operations = self._checked(transactions, redo_operations, step)
+        self._undo.append(self._redo.pop())
+        self._write(["redo"])
+        return step, operations
+
+    def clear(self):
+        """Forgets every step and empties the history file."""
+        self._undo.clear()
+        self._redo.clear()
+        if self.path is not None and os.path.isfile(self.path):
+            os.remove(self.path)
+        self._events = 0
+
+    def compact(self):
+        """Rewrites the history file with only the steps that can still be undone or redone."""
+        if self.path is None or self._events <= len(self._undo) + 2 * len(self._redo):
+            return # Nothing to drop
+
+        # Replaying "do" for every step and then "undo" for the redo stack rebuilds both stacks
+        steps = list(self._undo) + self._redo[::-1]
+        events = [["do", encode_step(step)] for step in steps] + [["undo"]] * len(self._redo)
+        with open(self.path + ".tmp", "w") as file:
+            for event in events:
+                file.write(json.dumps(event) + "\n")
+        os.replace(self.path + ".tmp", self.path)
+        self._events = len(events)
+
+    def _checked(self, transactions, operations_for, step):
+        try:
+            return operations_for(transactions, step)
+        except (ValueError, IndexError):
+            self.clear()
+            raise ValueError("the undo history no longer matches the ledger, so it was cleared")
+
+    def _write(self, event):
+        if self.path is None:
+            return
+        with open(self.path, "a") as file:
+            file.write(json.dumps(event) + "\n")
+        self._events += 1
+
+    def _load(self):
+        with open(self.path, "r") as file:
+            for line in file:
+                if not line.endswith("\n"):
+                    break # Ignore a partially written last event
+                event = json.loads(line)
+                if event[0] == "do":
+                    self._undo.append(decode_step(event[1]))
+                    self._redo.clear()
+                elif event[0] == "undo" and self._undo:
+                    self._redo.append(self._undo.pop())
+                elif event[0] == "redo" and self._redo:
+                    self._undo.append(self._redo.pop())
+                self._events += 1
+
+### Step Helpers ###
+def changed_fields(before, after):
+    """Returns {field: (before, after)} for the fields that differ between two versions of an entry."""
+    return {field: (before[field], after[field]) for field in FIELDS if before[field] != after[field]}
+
+def undo_operations(transactions, step):
+    """Returns the operations that reverse a step, checking that the ledger is in the state the step left it in."""
+    if step[0] == "A":
+        _, index, entry = step
+        expect_entry(transactions, index, entry)
+        return [("D", index, None)]
+    if step[0] == "D":
+        _, index, entry = step
+        if not 0 <= index <= len(transactions):
+            raise IndexError("transaction index out of range")
+        return [("I", index, entry)]
+
+    _, index, new_index, changes = step
+    entry = transactions[new_index]
+    expect_entry(transactions, new_index, {field: after for field, (_, after) in changes.items()})
+    entry.update({field: before for field, (before, _) in changes.items()})
+    if "date" in changes:
+        return [("D", new_index, None), ("I", index, entry)] # Back to exactly where it was
+    return [("U", new_index, entry)]
+
+def redo_operations(transactions, step):
+    """Returns the operations that repeat an undone step, checking that the ledger is in the state before it."""
+    if step[0] == "A":
+        return [("A", None, step[2])]
+    if step[0] == "D":
+        _, index, entry = step
+        expect_entry(transactions, index, entry)
+        return [("D", index, None)]
+
+    _, index, new_index, changes = step
+    entry = transactions[index]
+    expect_entry(transactions, index, {field: before for field, (before, _) in changes.items()})
+    entry.update({field: after for field, (_, after) in changes.items()})
+    return [("U", index, entry)]
+
+def expect_entry(transactions, index, fields):
+    """Raises ValueError unless the entry at index has the given field values."""
+    entry = transactions[index]
+    if any(entry[field] != value for field, value in fields.items()):
+        raise ValueError(f"entry {index + 1} has changed")
+
+def encode_step(step):
+    """Turns a step into JSON-friendly lists (dates as YYYY-MM-DD)."""
+    if step[0] in ("A", "D"):
+        operation, index, entry = step
+        return [operation, index, [encode_value(entry[field]) for field in FIELDS]]
+    operation, index, new_index, changes = step
+    return [operation, index, new_index, {field: [encode_value(before), encode_value(after)] for field, (before, after) in changes.items()}]
+
+def decode_step(encoded):
+    """Reverses encode_step."""
+    if encoded[0] in ("A", "D"):
+        operation, index, values = encoded
+        entry = dict(zip(FIELDS, values))
+        entry["date"] = date.fromisoformat(entry["date"])
+        return operation, index, entry
+    operation, index, new_index, changes = encoded
+    return operation, index, new_index, {
+        field: tuple(date.fromisoformat(value) for value in values) if field == "date" else tuple(values)
+        for field, values in changes.items()
+    }
+
+def encode_value(value):
+    return value.isoformat() if isinstance(value, date) else value
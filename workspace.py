@@ -0,0 +1,134 @@
+"""A directory of ledgers that several processes can read and edit at once.
+
+Every ledger keeps the usual files next to it (journal, undo history) plus
+the lock files from file_lock: readers share <ledger>.lock, writers take it
+exclusively, and only the process holding <ledger>.session may edit.
+
+Run from the repository root:  python workspace.py <directory> totals --workers 4
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
+import ExpensesTracker as tracker
+from binary_snapshot import BINARY_SUFFIX, is_binary_snapshot
+from file_lock import hold_session, locked
+from partitioned_store import PARTITIONED_SUFFIX, is_partitioned_ledger
+from sqlite_store import SQLITE_SUFFIXES, is_sqlite_ledger
+from transaction_store import TransactionStore
+
+LEDGER_SUFFIXES = (".txt", BINARY_SUFFIX, PARTITIONED_SUFFIX) + SQLITE_SUFFIXES
+TOTAL_FIELDS = ("entries", "balance", "income", "expenses", "income_count", "expense_count")
+
+### Workspace ###
+class Workspace:
+    """Manages the ledgers (text, binary, SQLite or partitioned) kept in one directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def ledgers(self):
+        """Returns the names of the ledgers in the workspace, sorted."""
+        return sorted(
+            entry.name for entry in os.scandir(self.directory)
+            if entry.is_file() and entry.name.endswith(LEDGER_SUFFIXES) and is_ledger(entry.path)
+        )
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def create(self, name, initial_balance=0):
+        """Creates an empty ledger (binary, SQLite or partitioned if the name's suffix says so); raises FileExistsError if it exists."""
+        path = self.path(name)
+        with locked(path):
+            if os.path.exists(path):
+                raise FileExistsError(f"ledger '{name}' already exists")
+            tracker.save_transactions(path, initial_balance, initial_balance, TransactionStore())
+        return path
+
+    def read(self, name):
+        """Loads a ledger under a shared lock; returns (current balance, initial balance, transactions)."""
+        return tracker.load_transactions(self.path(name))
+
+    @contextmanager
+    def edit(self, name):
+        """Loads a ledger for editing and saves it (atomically, journal folded in) when the block ends.
+
+        Yields (initial balance, transactions). Raises BlockingIOError if another
+        process has the ledger open for editing. Nothing is saved if the block
+        raises.
+        """
+        path = self.path(name)
+        with hold_session(path):
+            _, initial_balance, transactions = tracker.load_transactions(path)
+            yield initial_balance, transactions
+            with locked(path):
+                tracker.compact_journal(path, tracker.ledger_balance(initial_balance, transactions), initial_balance, transactions)
+                if os.path.isfile(tracker.undo_filename(path)):
+                    os.remove(tracker.undo_filename(path)) # The undo history refers to the ledger before these edits
+
+    def totals(self, names=None, workers=None, processes=False):
+        """Reads ledgers in parallel and returns ({name: totals}, combined totals).
+
+        Each ledger is loaded under its shared lock by a thread pool, or by a
+        process pool when processes is set (worth it for large text ledgers,
+        whose parsing holds the interpreter lock). Amounts are in centavos.
+        """
+        names = self.ledgers() if names is None else names
+        pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with pool(max_workers=workers) as executor:
+            results = dict(zip(names, executor.map(ledger_totals, map(self.path, names))))
+
+        combined = dict.fromkeys(TOTAL_FIELDS, 0)
+        for totals in results.values():
+            for field in TOTAL_FIELDS:
+                combined[field] += totals[field]
+        return results, combined
+
+### Helper Functions ###
+def is_ledger(path):
+    """Returns True for binary snapshots, SQLite ledgers, partition manifests and text files that start with a ledger header."""
+    if is_binary_snapshot(path) or is_sqlite_ledger(path) or is_partitioned_ledger(path):
+        return True
+    try:
+        with open(path, "r") as file:
+            return file.readline().startswith("Current Balance:")
+    except (OSError, UnicodeDecodeError):
+        return False
+
+def ledger_totals(path):
+    """Loads one ledger and returns its entry count, balance and income/expense totals (runs in a pool worker)."""
+    _, initial_balance, transactions = tracker.load_transactions(path)
+    totals = transactions.totals()
+    return {
+        "entries": len(transactions),
+        "balance": tracker.ledger_balance(initial_balance, transactions),
+        "income": totals["income"],
+        "expenses": totals["expenses"],
+        "income_count": totals["income_count"],
+        "expense_count": totals["expense_count"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="List the ledgers of a workspace or total them in parallel.")
+    parser.add_argument("directory", help="workspace directory")
+    parser.add_argument("command", choices=["list", "totals"])
+    parser.add_argument("--workers", type=int, help="pool size (default: one per CPU)")
+    parser.add_argument("--processes", action="store_true", help="read the ledgers in a process pool instead of threads")
+    options = parser.parse_args()
+
+    workspace = Workspace(options.directory)
+    if options.command == "list":
+        for name in workspace.ledgers():
+            print(name)
+        return
+
+    results, combined = workspace.totals(workers=options.workers, processes=options.processes)
+    print(f"{'Ledger':<40} {'Entries':>10} {'Income':>18} {'Expenses':>18} {'Balance':>18}")
+    for name, totals in list(results.items()) + [("All ledgers", combined)]:
+        print(f"{name:<40} {totals['entries']:>10,} {tracker.format_currency(totals['income']):>18} "
+              f"{tracker.format_currency(totals['expenses']):>18} {tracker.format_currency(totals['balance']):>18}")
+
+if __name__ == "__main__":
+    main()